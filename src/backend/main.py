@@ -1,18 +1,32 @@
 """
 Main FastAPI application
 """
+import time
+_import_started = time.perf_counter()
+
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import os
 from datetime import datetime
-import time
+from typing import Optional
+from utils.concurrency import run_io, get_io_executor, shutdown_executors
+from services import write_behind
+from services.counter_service import CounterService
+from services.stats_service import StatsService
+from services.alert_service import notification_queue
+from services.live_service import LiveService
+from services.response_cache import response_cache
+from services.hot_tier import hot_tier
+from services.reading_service import ReadingService
 
 # Import routes
 from routes.sensors import router as sensors_router
 from routes.readings import router as readings_router
 from routes.anomalies import router as anomalies_router
 from routes.alerts import router as alerts_router
+from routes.stream import router as stream_router
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -38,6 +52,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Resolution", "ETag", "Content-Disposition"],
 )
 
 # Health check endpoint
@@ -50,31 +65,35 @@ async def health_check():
         "service": "AquaGuard API"
     }
 
+def _collect_system_stats(sensor_id: Optional[str] = None) -> dict:
+    """Read system (or one sensor's) statistics from the maintained counters"""
+    if sensor_id:
+        counts = CounterService.get_sensor_counts(sensor_id)
+        return {
+            'sensor_id': sensor_id,
+            'total_readings': counts['readings'],
+            'total_anomalies': counts['anomalies'],
+            'active_alerts': counts['unacknowledged_alerts'],
+        }
+    
+    counts = CounterService.get_counts()
+    return {
+        'total_sensors': counts['sensors'],
+        'total_readings': counts['readings'],
+        'total_anomalies': counts['anomalies'],
+        'active_alerts': counts['unacknowledged_alerts'],
+    }
+
 # Stats endpoint
 @app.get("/api/stats")
-async def system_stats():
-    """Get system statistics"""
+async def system_stats(sensor_id: Optional[str] = None):
+    """Get system statistics, or counters for one sensor"""
     try:
-        from services.sensor_service import SensorService
-        from services.alert_service import AlertService
-        
-        sensors = SensorService.list_sensors()
-        alerts = AlertService.get_alerts(limit=1000)
-        
-        total_readings = 0
-        total_anomalies = 0
-        
-        for sensor in sensors:
-            from services.reading_service import ReadingService
-            readings = ReadingService.get_readings(sensor['id'], limit=10000)
-            total_readings += len(readings)
-            total_anomalies += sum(1 for r in readings if r.get('is_anomaly', False))
-        
+        started = time.perf_counter()
+        stats = await run_io(_collect_system_stats, sensor_id)
         return {
-            'total_sensors': len(sensors),
-            'total_readings': total_readings,
-            'total_anomalies': total_anomalies,
-            'active_alerts': len([a for a in alerts if not a.get('is_acknowledged', False)]),
+            **stats,
+            'processing_time_ms': round((time.perf_counter() - started) * 1000, 3),
             'timestamp': datetime.now().isoformat()
         }
     except Exception as e:
@@ -83,11 +102,22 @@ async def system_stats():
             'timestamp': datetime.now().isoformat()
         }
 
+@app.get("/api/stats/cache")
+async def cache_stats():
+    """Response cache hits, misses and 304s"""
+    return response_cache.get_metrics()
+
+@app.get("/api/stats/hot-tier")
+async def hot_tier_stats():
+    """Sensors and readings held by the hot tier, its memory use and hit counts"""
+    return hot_tier.get_metrics()
+
 # Include routers
 app.include_router(sensors_router)
 app.include_router(readings_router)
 app.include_router(anomalies_router)
 app.include_router(alerts_router)
+app.include_router(stream_router)
 
 # Root endpoint
 @app.get("/")
@@ -100,6 +130,19 @@ async def root():
         "health": "/api/health"
     }
 
+NOTIFY_RETENTION_DAYS = float(os.getenv('NOTIFY_RETENTION_DAYS', 7))
+
+async def prune_notifications(interval: float = 3600):
+    """Every interval, forget delivery records and failed notifications older than NOTIFY_RETENTION_DAYS"""
+    while True:
+        try:
+            await run_io(notification_queue.prune, NOTIFY_RETENTION_DAYS * 86400)
+        except Exception as e:
+            print(f"Error pruning the notification queue: {e}")
+        await asyncio.sleep(interval)
+
+_app_ready = time.perf_counter()
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
@@ -109,7 +152,30 @@ async def startup_event():
     print("=" * 50)
     print(f"Started at {datetime.now()}")
     print(f"Debug Mode: {os.getenv('DEBUG', 'False')}")
+    print(f"Imports took {(_app_ready - _import_started) * 1000:.0f} ms (python -m utils.import_budget for details)")
     print("=" * 50)
+    
+    if os.getenv('ROLLUP_BACKFILL_ON_STARTUP', 'False').lower() == 'true':
+        get_io_executor().submit(StatsService.backfill_missing)
+    
+    if hot_tier.enabled and os.getenv('HOT_TIER_WARM_ON_STARTUP', 'True').lower() == 'true':
+        get_io_executor().submit(ReadingService.warm_hot_tier)
+    
+    # Deliver notifications left in the queue by the previous run
+    notification_queue.start()
+    
+    app.state.stats_ticker = asyncio.create_task(LiveService.run_stats_ticker())
+    app.state.notification_pruner = asyncio.create_task(prune_notifications())
+
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Handle shutdown"""
+    app.state.stats_ticker.cancel()
+    app.state.notification_pruner.cancel()
+    notification_queue.stop()
+    write_behind.stop_all()
+    shutdown_executors()
 
 if __name__ == "__main__":
     import uvicorn
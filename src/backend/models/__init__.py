@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -28,6 +28,10 @@ class ReadingCreate(BaseModel):
     timestamp: Optional[datetime] = None
 
 
+class ReadingBatch(BaseModel):
+    readings: List[ReadingCreate] = Field(..., min_length=1, max_length=10000)
+
+
 class Reading(ReadingCreate):
     id: str
     is_anomaly: bool = False
@@ -50,6 +54,11 @@ class Alert(AlertCreate):
     is_acknowledged: bool = False
     acknowledged_at: Optional[datetime] = None
     notified_via: List[str] = []  # ["sms", "email", "push"]
+    status: Optional[str] = None  # "open" while the breach continues, then "closed"
+    reading_count: Optional[int] = None
+    peak_value: Optional[float] = None
+    last_seen_at: Optional[datetime] = None
+    closed_at: Optional[datetime] = None
     created_at: datetime
 
 
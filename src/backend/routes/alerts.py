@@ -1,18 +1,36 @@
 """
 Alerts API routes
 """
-from fastapi import APIRouter, HTTPException, Query
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import List, Optional, Tuple
 from services.alert_service import AlertService
+from services.response_cache import cached_response
+from utils.concurrency import run_io
+from utils.fast_json import json_response
+from utils.pagination import NEXT_CURSOR_HEADER, cursor_query
 
 router = APIRouter(prefix="/api/alerts", tags=["alerts"])
 
 @router.get("", response_model=List[dict])
-async def get_alerts(limit: int = Query(50, ge=1, le=1000)):
-    """Get recent alerts"""
+async def get_alerts(
+    response: Response,
+    limit: int = Query(50, ge=1, le=1000),
+    after: Optional[Tuple[str, str]] = Depends(cursor_query)
+):
+    """Get recent alerts, a page at a time (next page cursor in X-Next-Cursor)"""
     try:
-        alerts = AlertService.get_alerts(limit)
-        return alerts
+        alerts, next_cursor = await run_io(AlertService.get_alerts_page, limit, after)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return json_response(alerts, response)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/notifications")
+async def get_notification_metrics():
+    """Notification delivery counts, latency and queue depth per channel"""
+    try:
+        return await run_io(AlertService.get_notification_metrics)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -20,27 +38,23 @@ async def get_alerts(limit: int = Query(50, ge=1, le=1000)):
 async def acknowledge_alert(alert_id: str):
     """Mark alert as acknowledged"""
     try:
-        AlertService.acknowledge_alert(alert_id)
+        await run_io(AlertService.acknowledge_alert, alert_id)
         return {"message": "Alert acknowledged successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/sensor/{sensor_id}")
-async def get_sensor_alerts(sensor_id: str, limit: int = Query(50, ge=1, le=1000)):
-    """Get alerts for a specific sensor"""
+async def get_sensor_alerts(request: Request, sensor_id: str, limit: int = Query(50, ge=1, le=1000)):
+    """Get alerts for a specific sensor (ETag; 304 when unchanged)"""
     try:
-        all_alerts = AlertService.get_alerts(limit * 2)
-        sensor_alerts = [a for a in all_alerts if a.get('sensor_id') == sensor_id]
-        return sensor_alerts[:limit]
+        return await cached_response(request, ['alerts'], AlertService.get_sensor_alerts, sensor_id, limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/unacknowledged")
-async def get_unacknowledged_alerts(limit: int = Query(50, ge=1, le=1000)):
-    """Get unacknowledged alerts"""
+async def get_unacknowledged_alerts(request: Request, limit: int = Query(50, ge=1, le=1000)):
+    """Get unacknowledged alerts (ETag; 304 when unchanged)"""
     try:
-        all_alerts = AlertService.get_alerts(limit * 2)
-        unacknowledged = [a for a in all_alerts if not a.get('is_acknowledged', False)]
-        return unacknowledged[:limit]
+        return await cached_response(request, ['alerts'], AlertService.get_unacknowledged_alerts, limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,10 +1,14 @@
 """
 Anomaly Detection API routes
 """
+import json
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import List
 from services.anomaly_service import AnomalyDetectionService
 from services.sensor_service import SensorService
+from services.model_registry import model_registry
+from utils.concurrency import run_io
 
 router = APIRouter(prefix="/api/anomalies", tags=["anomalies"])
 
@@ -12,11 +16,13 @@ router = APIRouter(prefix="/api/anomalies", tags=["anomalies"])
 async def detect_anomalies(sensor_id: str = Query(...), hours: int = Query(24, ge=1, le=720)):
     """Detect anomalies for a sensor"""
     try:
-        sensor = SensorService.get_sensor(sensor_id)
+        sensor = await run_io(SensorService.get_sensor, sensor_id)
         if not sensor:
             raise HTTPException(status_code=404, detail="Sensor not found")
         
-        anomaly_ids, anomaly_details = AnomalyDetectionService.detect_anomalies(sensor_id, hours)
+        anomaly_ids, anomaly_details = await run_io(
+            AnomalyDetectionService.detect_anomalies, sensor_id, hours
+        )
         
         return {
             'sensor_id': sensor_id,
@@ -33,11 +39,11 @@ async def detect_anomalies(sensor_id: str = Query(...), hours: int = Query(24, g
 async def get_anomaly_stats(sensor_id: str = Query(...), hours: int = Query(24, ge=1, le=720)):
     """Get anomaly statistics for a sensor"""
     try:
-        sensor = SensorService.get_sensor(sensor_id)
+        sensor = await run_io(SensorService.get_sensor, sensor_id)
         if not sensor:
             raise HTTPException(status_code=404, detail="Sensor not found")
         
-        stats = AnomalyDetectionService.get_anomaly_statistics(sensor_id, hours)
+        stats = await run_io(AnomalyDetectionService.get_anomaly_statistics, sensor_id, hours)
         
         return {
             'sensor_id': sensor_id,
@@ -49,20 +55,38 @@ async def get_anomaly_stats(sensor_id: str = Query(...), hours: int = Query(24,
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/all-stats")
-async def get_all_anomaly_stats(hours: int = Query(24, ge=1, le=720)):
+async def get_all_anomaly_stats(
+    hours: int = Query(24, ge=1, le=720),
+    stream: bool = Query(False, description="Stream one NDJSON line per sensor as it finishes")
+):
     """Get anomaly statistics for all sensors"""
     try:
-        sensors = SensorService.list_sensors()
-        all_stats = []
+        sensors = await run_io(SensorService.list_sensors)
+        names = {sensor['id']: sensor.get('name') for sensor in sensors}
         
-        for sensor in sensors:
-            stats = AnomalyDetectionService.get_anomaly_statistics(sensor['id'], hours)
-            all_stats.append({
-                'sensor_id': sensor['id'],
-                'sensor_name': sensor.get('name'),
-                **stats
-            })
+        def rows():
+            for sensor_id, stats in AnomalyDetectionService.iter_fleet_statistics(list(names), hours):
+                yield {
+                    'sensor_id': sensor_id,
+                    'sensor_name': names[sensor_id],
+                    **stats
+                }
         
-        return {'sensors': all_stats}
+        if stream:
+            return StreamingResponse(
+                (json.dumps(row) + "\n" for row in rows()),
+                media_type="application/x-ndjson"
+            )
+        
+        results = {row['sensor_id']: row for row in await run_io(lambda: list(rows()))}
+        return {'sensors': [results[sensor['id']] for sensor in sensors]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/models")
+async def get_cached_models():
+    """List cached anomaly models and their training windows"""
+    return {
+        'models': model_registry.describe(),
+        'total_bytes': model_registry.size_bytes
+    }
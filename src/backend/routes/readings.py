@@ -1,61 +1,179 @@
 """
 Readings API routes
 """
-from fastapi import APIRouter, HTTPException, Query
-from typing import List
-from models import ReadingCreate
+import asyncio
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
+from models import ReadingCreate, ReadingBatch
 from services.reading_service import ReadingService
+from services.sensor_service import SensorService
+from services.alert_service import AlertService
+from services.export_service import FORMATS, ExportService
+from services.response_cache import cached_response
+from utils.fast_json import json_response
+from utils.concurrency import run_io
+from utils.pagination import NEXT_CURSOR_HEADER, cursor_query
 
 router = APIRouter(prefix="/api/readings", tags=["readings"])
 
+STATS_CACHE_TTL = float(os.getenv('STATS_CACHE_TTL_SECONDS', 10))
+
 @router.post("", response_model=dict)
 async def create_reading(reading: ReadingCreate):
     """Submit a sensor reading"""
     try:
-        result = ReadingService.save_reading(reading)
+        result = await run_io(ReadingService.save_reading, reading)
         
         # Check for alerts after saving reading
-        from services.alert_service import AlertService
-        AlertService.check_and_create_alerts(result)
+        await run_io(AlertService.check_and_create_alerts, result)
         
         return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/batch", response_model=dict)
+async def create_readings_batch(batch: ReadingBatch):
+    """Submit many sensor readings, possibly from many sensors, in one request"""
+    try:
+        results = await run_io(ReadingService.save_readings_batch, batch.readings)
+        
+        alerts = await run_io(AlertService.check_and_create_alerts_batch, results)
+        
+        return {
+            'count': len(results),
+            'reading_ids': [r['id'] for r in results],
+            'alerts_created': len(alerts)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/sensor/{sensor_id}", response_model=List[dict])
-async def get_sensor_readings(sensor_id: str, limit: int = Query(100, ge=1, le=1000)):
-    """Get readings for a sensor"""
+async def get_sensor_readings(
+    sensor_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[Tuple[str, str]] = Depends(cursor_query)
+):
+    """Get readings for a sensor, newest first, a page at a time (next page cursor in X-Next-Cursor)"""
     try:
-        readings = ReadingService.get_readings(sensor_id, limit)
-        return readings
+        readings, next_cursor = await run_io(ReadingService.get_readings_page, sensor_id, limit, after)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return json_response(readings, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/sensor/{sensor_id}/range", response_model=List[dict])
-async def get_readings_by_time(sensor_id: str, hours: int = Query(24, ge=1, le=720)):
-    """Get readings within time range"""
+async def get_readings_by_time(
+    sensor_id: str,
+    response: Response,
+    hours: int = Query(24, ge=1, le=720),
+    start: Optional[datetime] = Query(None, description="Range start; overrides hours"),
+    end: Optional[datetime] = Query(None, description="Range end; defaults to now"),
+    limit: Optional[int] = Query(None, ge=1),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    max_points: Optional[int] = Query(None, ge=1, le=10000, description="Downsample to rollups above this many points"),
+    after: Optional[Tuple[str, str]] = Depends(cursor_query)
+):
+    """
+    Get readings within time range.
+    With max_points, windows holding more readings are served from the
+    1m/1h/1d rollups instead (see the X-Resolution header).
+    With a limit the window is paged: X-Next-Cursor holds the cursor for ?after=.
+    """
     try:
-        readings = ReadingService.get_readings_by_time_range(sensor_id, hours)
-        return readings
+        if max_points is not None and after is None:
+            series = await run_io(
+                ReadingService.get_downsampled_range,
+                sensor_id,
+                hours,
+                start=start,
+                end=end,
+                max_points=max_points,
+                descending=order == "desc"
+            )
+            if series is not None:
+                resolution, points = series
+                response.headers['X-Resolution'] = str(resolution)
+                return json_response(points, response)
+        
+        response.headers['X-Resolution'] = 'raw'
+        if limit is not None or after is not None:
+            readings, next_cursor = await run_io(
+                ReadingService.get_readings_page,
+                sensor_id,
+                limit or 1000,
+                after,
+                start=start or datetime.now() - timedelta(hours=hours),
+                end=end,
+                descending=order == "desc"
+            )
+            if next_cursor:
+                response.headers[NEXT_CURSOR_HEADER] = next_cursor
+            return json_response(readings, response)
+        
+        readings = await run_io(
+            ReadingService.get_readings_by_time_range,
+            sensor_id,
+            hours,
+            start=start,
+            end=end,
+            descending=order == "desc"
+        )
+        return json_response(readings, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/export")
+async def export_readings(
+    sensor_id: Optional[List[str]] = Query(None, description="Sensor to export (repeatable); default all sensors"),
+    start: Optional[datetime] = Query(None, description="Range start; default the first reading"),
+    end: Optional[datetime] = Query(None, description="Range end; default now"),
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$"),
+    gzip: bool = Query(False, description="Gzip the file")
+):
+    """
+    Stream every raw reading of the sensors in the range, oldest first per sensor.
+    Walks keyset pages through storage and the cold tier, so memory use stays
+    flat however long the range is.
+    """
+    try:
+        chunks = await run_io(ExportService.stream, sensor_id, start, end, fmt, gzip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return StreamingResponse(
+        chunks,
+        media_type='application/gzip' if gzip else FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{ExportService.filename(fmt, gzip)}"'}
+    )
+
+async def _collect_all_stats() -> dict:
+    sensors = await run_io(SensorService.list_sensors)
+    results = await asyncio.gather(*[
+        run_io(ReadingService.get_statistics, sensor['id'])
+        for sensor in sensors
+    ])
+    
+    all_stats = []
+    for sensor, stats in zip(sensors, results):
+        all_stats.append({
+            'sensor_id': sensor['id'],
+            'sensor_name': sensor.get('name'),
+            **stats
+        })
+    
+    return {'sensors': all_stats}
+
 @router.get("/stats/all", response_model=dict)
-async def get_all_stats():
-    """Get statistics for all sensors"""
+async def get_all_stats(request: Request):
+    """Get statistics for all sensors (cached for up to STATS_CACHE_TTL_SECONDS; new sensors show at once)"""
     try:
-        from services.sensor_service import SensorService
-        sensors = SensorService.list_sensors()
-        
-        all_stats = []
-        for sensor in sensors:
-            stats = ReadingService.get_statistics(sensor['id'])
-            all_stats.append({
-                'sensor_id': sensor['id'],
-                'sensor_name': sensor.get('name'),
-                **stats
-            })
-        
-        return {'sensors': all_stats}
+        return await cached_response(request, ['sensors'], _collect_all_stats, ttl=STATS_CACHE_TTL)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,29 +1,33 @@
 """
 Sensor API routes
 """
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
+import os
 from typing import List
 from models import Sensor, SensorCreate
 from services.sensor_service import SensorService
 from services.reading_service import ReadingService
+from services.response_cache import cached_response
+from utils.concurrency import run_io
 
 router = APIRouter(prefix="/api/sensors", tags=["sensors"])
 
+STATS_CACHE_TTL = float(os.getenv('STATS_CACHE_TTL_SECONDS', 10))
+
 @router.post("", response_model=dict)
 async def create_sensor(sensor: SensorCreate):
     """Create a new sensor"""
     try:
-        result = SensorService.create_sensor(sensor)
+        result = await run_io(SensorService.create_sensor, sensor)
         return {"id": result['id'], **result}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("", response_model=List[dict])
-async def list_sensors():
-    """Get all sensors"""
+async def list_sensors(request: Request):
+    """Get all sensors (ETag; last_reading_at may lag by up to STATS_CACHE_TTL_SECONDS)"""
     try:
-        sensors = SensorService.list_sensors()
-        return sensors
+        return await cached_response(request, ['sensors'], SensorService.list_sensors, ttl=STATS_CACHE_TTL)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -31,7 +35,7 @@ async def list_sensors():
 async def get_sensor(sensor_id: str):
     """Get sensor by ID"""
     try:
-        sensor = SensorService.get_sensor(sensor_id)
+        sensor = await run_io(SensorService.get_sensor, sensor_id)
         if not sensor:
             raise HTTPException(status_code=404, detail="Sensor not found")
         return sensor
@@ -44,8 +48,8 @@ async def get_sensor(sensor_id: str):
 async def update_sensor(sensor_id: str, updates: dict):
     """Update sensor"""
     try:
-        SensorService.update_sensor_status(sensor_id, updates.get('status', 'active'))
-        sensor = SensorService.get_sensor(sensor_id)
+        await run_io(SensorService.update_sensor_status, sensor_id, updates.get('status', 'active'))
+        sensor = await run_io(SensorService.get_sensor, sensor_id)
         if not sensor:
             raise HTTPException(status_code=404, detail="Sensor not found")
         return sensor
@@ -55,14 +59,15 @@ async def update_sensor(sensor_id: str, updates: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{sensor_id}/stats", response_model=dict)
-async def get_sensor_stats(sensor_id: str, hours: int = Query(24, ge=1, le=720)):
-    """Get sensor statistics"""
+async def get_sensor_stats(request: Request, sensor_id: str, hours: int = Query(24, ge=1, le=720)):
+    """Get sensor statistics (cached for up to STATS_CACHE_TTL_SECONDS)"""
     try:
-        stats = ReadingService.get_statistics(sensor_id, hours)
-        return {
-            'sensor_id': sensor_id,
-            **stats
-        }
+        return await cached_response(
+            request,
+            [],
+            lambda: {'sensor_id': sensor_id, **ReadingService.get_statistics(sensor_id, hours)},
+            ttl=STATS_CACHE_TTL
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -70,7 +75,7 @@ async def get_sensor_stats(sensor_id: str, hours: int = Query(24, ge=1, le=720))
 async def delete_sensor(sensor_id: str):
     """Delete sensor"""
     try:
-        SensorService.update_sensor_status(sensor_id, 'deleted')
+        await run_io(SensorService.update_sensor_status, sensor_id, 'deleted')
         return {"message": "Sensor deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,36 @@
+"""
+Live stream API route (Server-Sent Events)
+"""
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import os
+from services.event_bus import event_bus
+
+router = APIRouter(prefix="/api/stream", tags=["stream"])
+
+HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', 15))
+
+@router.get("")
+async def stream_events(request: Request, sensor_id: Optional[List[str]] = Query(None)):
+    """
+    Server-Sent Events of new readings, alerts and statistics for the given
+    sensors (all sensors by default). Events: readings, alerts, stats, system,
+    sensor, and resync when a slow client missed events and should refetch.
+    """
+    subscription = event_bus.subscribe(sensor_id)
+
+    async def events():
+        try:
+            yield 'retry: 5000\n\n'
+            while not await request.is_disconnected():
+                frame = await subscription.next_frame(HEARTBEAT_SECONDS)
+                yield frame if frame is not None else ': keep-alive\n\n'
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,184 @@
+"""
+Alert episodes: one alert record per sustained rule breach instead of one per reading.
+An episode keyed by (sensor_id, alert_type) opens on the first breach, tracks its
+reading count and peak while the condition holds, escalates its severity if it
+lasts, and closes once the sensor has reported clear readings for clear_seconds.
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+from datetime import datetime
+import time
+from services.alert_rules import AlertRule
+
+SEVERITY_LEVELS = ['low', 'medium', 'high', 'critical']
+
+class Episode:
+    """State of one open (or just closed) alert episode"""
+
+    def __init__(
+        self,
+        sensor_id: str,
+        rule: AlertRule,
+        value: float,
+        message: str,
+        now: float,
+        alert_id: Optional[str] = None
+    ):
+        self.sensor_id = sensor_id
+        self.alert_type = rule.alert_type
+        self.severity = rule.severity
+        self.lower_is_worse = rule.op in ('<', '<=')
+        self.alert_id = alert_id
+        self.peak_value = value
+        self.message = message
+        self.reading_count = 1
+        self.opened_at = now
+        self.last_breach_at = now
+        self.escalated_at = now
+        self.clear_since: Optional[float] = None
+        self.closed_at: Optional[float] = None
+
+    def breach(self, value: float, message: str, now: float):
+        self.reading_count += 1
+        self.last_breach_at = now
+        self.clear_since = None
+        worse = value < self.peak_value if self.lower_is_worse else value > self.peak_value
+        if worse:
+            self.peak_value = value
+            self.message = message
+
+    def escalate(self, now: float) -> bool:
+        """Raise the severity one level; False when already critical"""
+        level = SEVERITY_LEVELS.index(self.severity) if self.severity in SEVERITY_LEVELS else 1
+        if level >= len(SEVERITY_LEVELS) - 1:
+            return False
+        self.severity = SEVERITY_LEVELS[level + 1]
+        self.escalated_at = now
+        return True
+
+    @property
+    def is_open(self) -> bool:
+        return self.closed_at is None
+
+    def fields(self) -> Dict[str, Any]:
+        """Alert record fields kept up to date while the episode runs"""
+        fields = {
+            'message': self.message,
+            'severity': self.severity,
+            'status': 'open' if self.is_open else 'closed',
+            'reading_count': self.reading_count,
+            'peak_value': self.peak_value,
+            'last_seen_at': datetime.fromtimestamp(self.last_breach_at).isoformat(),
+        }
+        if not self.is_open:
+            fields['closed_at'] = datetime.fromtimestamp(self.closed_at).isoformat()
+        return fields
+
+class Transitions(NamedTuple):
+    """What one observe call changed"""
+    opened: List[Tuple[int, Episode]]  # (reading index of the first breach, episode)
+    updated: List[Episode]  # already stored episodes whose fields changed
+    escalated: List[Episode]
+    closed: List[Episode]
+
+class EpisodeTracker:
+    """
+    Open episodes by (sensor_id, alert_type). Not thread-safe: callers
+    serialize observe with the save of the episodes it opens.
+    """
+
+    def __init__(self, clear_seconds: float = 300, escalate_seconds: float = 1800):
+        self.clear_seconds = clear_seconds
+        self.escalate_seconds = escalate_seconds
+        self.episodes: Dict[Tuple[str, str], Episode] = {}
+        self._by_sensor: Dict[str, Set[str]] = {}
+
+    def _add(self, episode: Episode):
+        self.episodes[(episode.sensor_id, episode.alert_type)] = episode
+        self._by_sensor.setdefault(episode.sensor_id, set()).add(episode.alert_type)
+
+    def _remove(self, episode: Episode):
+        del self.episodes[(episode.sensor_id, episode.alert_type)]
+        open_types = self._by_sensor[episode.sensor_id]
+        open_types.discard(episode.alert_type)
+        if not open_types:
+            del self._by_sensor[episode.sensor_id]
+
+    def restore(self, alert: Dict[str, Any], rule: AlertRule):
+        """Resume an episode from its stored open alert record"""
+        def epoch(value: Optional[str]) -> float:
+            try:
+                return datetime.fromisoformat(value).timestamp()
+            except (TypeError, ValueError):
+                return time.time()
+
+        episode = Episode(
+            alert['sensor_id'],
+            rule,
+            alert.get('peak_value') or 0.0,
+            alert.get('message', ''),
+            epoch(alert.get('created_at')),
+            alert_id=alert['id']
+        )
+        episode.severity = alert.get('severity') or rule.severity
+        episode.reading_count = alert.get('reading_count') or 1
+        episode.last_breach_at = epoch(alert.get('last_seen_at') or alert.get('created_at'))
+        self._add(episode)
+
+    def observe(
+        self,
+        readings: Sequence[Dict[str, Any]],
+        fired: Sequence[Tuple[int, AlertRule, str, float]],
+        now: Optional[float] = None
+    ) -> Transitions:
+        """Advance episodes with a batch of readings and the (row, rule, message, value) rules they fired"""
+        now = time.time() if now is None else now
+        hits: Dict[int, List[Tuple[AlertRule, str, float]]] = {}
+        for row, rule, message, value in fired:
+            hits.setdefault(row, []).append((rule, message, value))
+
+        result = Transitions([], [], [], [])
+        opened: Set[Tuple[str, str]] = set()
+        updated: Dict[Tuple[str, str], Episode] = {}
+        for row, reading in enumerate(readings):
+            sensor_id = reading.get('sensor_id')
+            row_hits = hits.get(row)
+            if not row_hits and sensor_id not in self._by_sensor:
+                continue
+
+            breached = set()
+            for rule, message, value in row_hits or ():
+                key = (sensor_id, rule.alert_type)
+                breached.add(rule.alert_type)
+                episode = self.episodes.get(key)
+                if episode is None:
+                    episode = Episode(sensor_id, rule, value, message, now)
+                    self._add(episode)
+                    opened.add(key)
+                    result.opened.append((row, episode))
+                    continue
+                episode.breach(value, message, now)
+                if key not in opened:
+                    updated[key] = episode
+                if (
+                    self.escalate_seconds > 0
+                    and now - episode.escalated_at >= self.escalate_seconds
+                    and episode.escalate(now)
+                ):
+                    result.escalated.append(episode)
+
+            for alert_type in list(self._by_sensor.get(sensor_id, ())):
+                if alert_type in breached:
+                    continue
+                key = (sensor_id, alert_type)
+                episode = self.episodes[key]
+                if episode.clear_since is None:
+                    episode.clear_since = now
+                if now - episode.clear_since >= self.clear_seconds:
+                    episode.closed_at = now
+                    self._remove(episode)
+                    result.closed.append(episode)
+                    if key not in opened:
+                        updated[key] = episode
+
+        result.updated.extend(updated.values())
+        return result
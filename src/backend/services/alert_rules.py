@@ -0,0 +1,155 @@
+"""
+Threshold alert rules compiled into a table and evaluated for whole batches of readings
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import json
+import operator
+import os
+import numpy as np
+
+class AlertRule(NamedTuple):
+    """Raise alert_type when `reading[field] <op> threshold`, optionally only for one device_type"""
+    alert_type: str
+    field: str
+    op: str
+    threshold: float
+    severity: str
+    message: str  # format string; gets {value}, {score} and the reading's fields
+    device_type: Optional[str] = None
+
+DEFAULT_RULES = [
+    AlertRule('ph_high', 'ph_level', '>', 8.5, 'high', 'High pH detected: {value:.2f} (safe range: 6.5-8.5)'),
+    AlertRule('ph_low', 'ph_level', '<', 6.5, 'high', 'Low pH detected: {value:.2f} (safe range: 6.5-8.5)'),
+    AlertRule('tds_high', 'tds_level', '>', 500, 'high', 'High TDS detected: {value:.0f} ppm (safe: <500 ppm)'),
+    AlertRule('turbidity_high', 'turbidity', '>', 5, 'medium', 'High turbidity detected: {value:.2f} NTU (safe: <5 NTU)'),
+    AlertRule('anomaly', 'is_anomaly', '==', 1, 'high', 'Anomalous reading detected (score: {score:.3f})'),
+]
+
+# Values used when a reading lacks the field (matches the old per-reading checks)
+FIELD_DEFAULTS = {'ph_level': 7.0, 'tds_level': 0.0, 'turbidity': 0.0, 'is_anomaly': 0.0}
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+}
+
+def load_rules() -> List[AlertRule]:
+    """Rules from the JSON list in ALERT_RULES_FILE, or the defaults"""
+    path = os.getenv('ALERT_RULES_FILE')
+    if not path:
+        return list(DEFAULT_RULES)
+    with open(path) as f:
+        return [AlertRule(**rule) for rule in json.load(f)]
+
+class RuleEngine:
+    """
+    Rules compiled into per-rule field, operator and threshold arrays.
+    A rule with a device_type replaces the generic rule of the same
+    alert_type for sensors of that type.
+    """
+
+    def __init__(self, rules: Sequence[AlertRule]):
+        for rule in rules:
+            if rule.op not in OPERATORS:
+                raise ValueError(f"Unknown operator {rule.op!r} in rule {rule.alert_type}")
+        self.rules = list(rules)
+        self.fields = sorted({rule.field for rule in self.rules})
+        self.field_index = np.array([self.fields.index(rule.field) for rule in self.rules], dtype=np.intp)
+        self.thresholds = np.array([rule.threshold for rule in self.rules], dtype=np.float64)
+        self.ops = [
+            (OPERATORS[op], np.array([i for i, rule in enumerate(self.rules) if rule.op == op], dtype=np.intp))
+            for op in OPERATORS
+            if any(rule.op == op for rule in self.rules)
+        ]
+
+        # applies[d, r]: rule r is active for device code d (the last code is "other")
+        self.device_types = sorted({rule.device_type for rule in self.rules if rule.device_type})
+        self.device_codes = {device_type: d for d, device_type in enumerate(self.device_types)}
+        overridden = {(rule.device_type, rule.alert_type) for rule in self.rules if rule.device_type}
+        self.applies = np.zeros((len(self.device_types) + 1, len(self.rules)), dtype=bool)
+        for r, rule in enumerate(self.rules):
+            for d, device_type in enumerate(self.device_types + [None]):
+                if rule.device_type is not None:
+                    self.applies[d, r] = rule.device_type == device_type
+                else:
+                    self.applies[d, r] = (device_type, rule.alert_type) not in overridden
+
+    @property
+    def uses_device_type(self) -> bool:
+        return bool(self.device_types)
+
+    def _values(self, readings: Sequence[Dict[str, Any]]) -> np.ndarray:
+        n = len(readings)
+        values = np.empty((n, len(self.fields)), dtype=np.float64)
+        for column, field in enumerate(self.fields):
+            default = FIELD_DEFAULTS.get(field, np.nan)
+            values[:, column] = np.fromiter(
+                (default if r.get(field) is None else r[field] for r in readings),
+                dtype=np.float64,
+                count=n
+            )
+        return values
+
+    def matches(
+        self,
+        readings: Sequence[Dict[str, Any]],
+        device_types: Optional[Sequence[Optional[str]]] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(reading index, rule index, value) of every rule that fires, by reading then rule order"""
+        values = self._values(readings)
+        compared = values[:, self.field_index]
+        fired = np.zeros(compared.shape, dtype=bool)
+        for compare, columns in self.ops:
+            fired[:, columns] = compare(compared[:, columns], self.thresholds[columns])
+        if self.uses_device_type and device_types is not None:
+            other = len(self.device_types)
+            codes = np.fromiter(
+                (self.device_codes.get(d, other) for d in device_types),
+                dtype=np.intp,
+                count=len(readings)
+            )
+        else:
+            codes = np.full(len(readings), len(self.device_types), dtype=np.intp)
+        fired &= self.applies[codes]
+        rows, rules = np.nonzero(fired)
+        return rows, rules, compared[rows, rules]
+
+    def fire(
+        self,
+        readings: Sequence[Dict[str, Any]],
+        device_types: Optional[Sequence[Optional[str]]] = None
+    ) -> List[Tuple[int, AlertRule, str, float]]:
+        """(reading index, rule, message, value) for every rule that fires; messages are only formatted for these"""
+        if not readings:
+            return []
+        rows, rules, values = self.matches(readings, device_types)
+        fired = []
+        for row, r, value in zip(rows.tolist(), rules.tolist(), values.tolist()):
+            reading = readings[row]
+            rule = self.rules[r]
+            message = rule.message.format(**{**reading, 'value': value, 'score': reading.get('anomaly_score') or 0})
+            fired.append((row, rule, message, value))
+        return fired
+
+    def evaluate(
+        self,
+        readings: Sequence[Dict[str, Any]],
+        device_types: Optional[Sequence[Optional[str]]] = None
+    ) -> List[Tuple[int, AlertRule, str]]:
+        """(reading index, rule, message) for every rule that fires"""
+        return [(row, rule, message) for row, rule, message, _ in self.fire(readings, device_types)]
+
+    def rule_for(self, alert_type: str, device_type: Optional[str] = None) -> Optional[AlertRule]:
+        """The rule raising alert_type for a device type (the generic rule by default)"""
+        generic = None
+        for rule in self.rules:
+            if rule.alert_type != alert_type:
+                continue
+            if rule.device_type is not None and rule.device_type == device_type:
+                return rule
+            if rule.device_type is None and generic is None:
+                generic = rule
+        return generic
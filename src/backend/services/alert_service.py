@@ -1,96 +1,128 @@
 """
 Alert management and notification service
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
-from services.firebase_service import FirebaseService
+import threading
+from services.storage_service import get_storage
+from services.counter_service import CounterService
+from services.alert_rules import AlertRule, RuleEngine, load_rules
+from services.alert_episodes import Episode, EpisodeTracker
+from services.notification_queue import NotificationQueue
+from services.live_service import LiveService
+from services.response_cache import response_cache
+from services.write_behind import WriteBehindBuffer
+from utils.pagination import paginate
 import os
 
-firebase_service = FirebaseService()
+storage = get_storage()
+rule_engine = RuleEngine(load_rules())
+episode_tracker = EpisodeTracker(
+    clear_seconds=float(os.getenv('ALERT_CLEAR_SECONDS', 300)),
+    escalate_seconds=float(os.getenv('ALERT_ESCALATE_SECONDS', 1800))
+)
+_episode_lock = threading.Lock()
+_episodes_restored = False
 
 class AlertService:
     """Manage alerts and notifications"""
     
+    # Thresholds and severities of the active rules, by alert type
     ALERT_TYPES = {
-        'ph_high': {'threshold': 8.5, 'severity': 'high'},
-        'ph_low': {'threshold': 6.5, 'severity': 'high'},
-        'tds_high': {'threshold': 500, 'severity': 'high'},
-        'turbidity_high': {'threshold': 5, 'severity': 'medium'},
-        'anomaly': {'threshold': 0.3, 'severity': 'high'},
+        rule.alert_type: {'threshold': rule.threshold, 'severity': rule.severity}
+        for rule in rule_engine.rules
+        if rule.device_type is None
     }
     
     @staticmethod
     def check_and_create_alerts(reading: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Check reading against thresholds and create alerts if needed"""
-        alerts = []
-        sensor_id = reading.get('sensor_id')
-        reading_id = reading.get('id')
-        
-        # Check pH levels
-        ph = reading.get('ph_level', 7.0)
-        if ph > 8.5:
-            alert = AlertService._create_alert(
-                sensor_id=sensor_id,
-                alert_type='ph_high',
-                message=f'High pH detected: {ph:.2f} (safe range: 6.5-8.5)',
-                severity='high',
-                reading_id=reading_id
-            )
-            alerts.append(alert)
-        
-        elif ph < 6.5:
-            alert = AlertService._create_alert(
-                sensor_id=sensor_id,
-                alert_type='ph_low',
-                message=f'Low pH detected: {ph:.2f} (safe range: 6.5-8.5)',
-                severity='high',
-                reading_id=reading_id
-            )
-            alerts.append(alert)
-        
-        # Check TDS levels
-        tds = reading.get('tds_level', 0)
-        if tds > 500:
-            alert = AlertService._create_alert(
-                sensor_id=sensor_id,
-                alert_type='tds_high',
-                message=f'High TDS detected: {tds:.0f} ppm (safe: <500 ppm)',
-                severity='high',
-                reading_id=reading_id
-            )
-            alerts.append(alert)
+        return AlertService.check_and_create_alerts_batch([reading])
+    
+    @staticmethod
+    def check_and_create_alerts_batch(readings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Advance alert episodes with a batch of readings; returns the alerts it opened"""
+        fired = AlertService._evaluate_readings(readings)
         
-        # Check turbidity
-        turbidity = reading.get('turbidity', 0)
-        if turbidity > 5:
-            alert = AlertService._create_alert(
-                sensor_id=sensor_id,
-                alert_type='turbidity_high',
-                message=f'High turbidity detected: {turbidity:.2f} NTU (safe: <5 NTU)',
-                severity='medium',
-                reading_id=reading_id
-            )
-            alerts.append(alert)
+        with _episode_lock:
+            AlertService._restore_episodes()
+            transitions = episode_tracker.observe(readings, fired)
+            alerts = [
+                {
+                    **AlertService._create_alert(
+                        sensor_id=episode.sensor_id,
+                        alert_type=episode.alert_type,
+                        message=episode.message,
+                        severity=episode.severity,
+                        reading_id=readings[row].get('id')
+                    ),
+                    **episode.fields()
+                }
+                for row, episode in transitions.opened
+            ]
+            if alerts:
+                alert_ids = storage.save_alerts(alerts)
+                for alert, (_, episode), alert_id in zip(alerts, transitions.opened, alert_ids):
+                    alert['id'] = episode.alert_id = alert_id
         
-        # Check for anomalies
-        if reading.get('is_anomaly', False):
-            score = reading.get('anomaly_score', 0)
-            alert = AlertService._create_alert(
-                sensor_id=sensor_id,
-                alert_type='anomaly',
-                message=f'Anomalous reading detected (score: {score:.3f})',
-                severity='high',
-                reading_id=reading_id
-            )
-            alerts.append(alert)
+        # Running episodes are updated in place, coalesced with their other pending updates
+        for episode in transitions.updated:
+            if episode.alert_id:
+                alert_buffer.put(episode.alert_id, episode.fields())
+        if alerts or transitions.updated:
+            response_cache.bump('alerts')
         
-        # Save alerts to database
-        for alert in alerts:
-            AlertService._save_alert(alert)
-            AlertService._notify_users(alert)
+        notices = alerts + [
+            AlertService._episode_notice(episode, f'Escalated to {episode.severity}')
+            for episode in transitions.escalated
+        ] + [
+            AlertService._episode_notice(episode, 'Cleared')
+            for episode in transitions.closed
+        ]
+        if notices:
+            AlertService._notify_users(notices)
+            LiveService.publish_alerts(notices)
+        if alerts:
+            CounterService.record_alerts(alerts)
         
         return alerts
     
+    @staticmethod
+    def _evaluate_readings(readings: List[Dict[str, Any]]) -> List[Tuple[int, AlertRule, str, float]]:
+        """(reading index, rule, message, value) of every rule breached, with one vectorized evaluation"""
+        device_types = None
+        if rule_engine.uses_device_type:
+            sensors = {}
+            for sensor_id in {r.get('sensor_id') for r in readings}:
+                sensors[sensor_id] = storage.get_sensor(sensor_id) or {}
+            device_types = [sensors[r.get('sensor_id')].get('device_type') for r in readings]
+        
+        return rule_engine.fire(readings, device_types)
+    
+    @staticmethod
+    def _restore_episodes():
+        """Resume the episodes left open by the previous run (once, under _episode_lock)"""
+        global _episodes_restored
+        if _episodes_restored:
+            return
+        _episodes_restored = True
+        for alert in storage.get_open_alerts():
+            rule = rule_engine.rule_for(alert.get('alert_type'))
+            key = (alert.get('sensor_id'), alert.get('alert_type'))
+            if rule is not None and key not in episode_tracker.episodes:
+                episode_tracker.restore(alert, rule)
+    
+    @staticmethod
+    def _episode_notice(episode: Episode, prefix: str) -> Dict[str, Any]:
+        """Notification payload for an escalated or cleared episode"""
+        return {
+            'id': episode.alert_id,
+            'sensor_id': episode.sensor_id,
+            'alert_type': episode.alert_type,
+            'severity': episode.severity,
+            'message': f'{prefix}: {episode.message} ({episode.reading_count} readings)',
+        }
+    
     @staticmethod
     def _create_alert(
         sensor_id: str,
@@ -112,64 +144,117 @@ class AlertService:
         }
     
     @staticmethod
-    def _save_alert(alert: Dict[str, Any]) -> str:
-        """Save alert to database"""
-        alert_id = firebase_service.save_alert(alert)
-        return alert_id
+    def _notify_users(alerts: List[Dict[str, Any]]):
+        """Queue notifications for saved alerts; delivery happens on the notification workers"""
+        jobs = []
+        for alert in alerts:
+            # SMS notification for critical alerts
+            channels = ['sms', 'email', 'push'] if alert.get('severity') in ['high', 'critical'] else ['email', 'push']
+            for channel in channels:
+                for recipient in RECIPIENTS[channel]:
+                    jobs.append((channel, recipient, alert))
+        try:
+            notification_queue.enqueue(jobs)
+        except Exception as e:
+            print(f"Error queueing notifications: {e}")
     
     @staticmethod
-    def _notify_users(alert: Dict[str, Any]):
-        """Send notifications through multiple channels"""
-        notified = []
-        
-        # SMS notification for critical alerts
-        if alert.get('severity') in ['high', 'critical']:
-            AlertService._send_sms(alert)
-            notified.append('sms')
-        
-        # Email notification
-        AlertService._send_email(alert)
-        notified.append('email')
-        
-        # Push notification
-        AlertService._send_push_notification(alert)
-        notified.append('push')
-        
-        alert['notified_via'] = notified
+    def _digest(alerts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """One alert, or a summary standing in for several"""
+        if len(alerts) == 1:
+            return alerts[0]
+        shown = '; '.join(a['message'] for a in alerts[:5])
+        more = f' (+{len(alerts) - 5} more)' if len(alerts) > 5 else ''
+        return {**alerts[-1], 'message': f'{len(alerts)} alerts: {shown}{more}'}
     
     @staticmethod
-    def _send_sms(alert: Dict[str, Any]):
+    def _send_sms(recipient: str, alerts: List[Dict[str, Any]]):
         """Send SMS alert (mock implementation)"""
-        try:
-            api_key = os.getenv('SMS_API_KEY')
-            if api_key:
-                # In production, use Twilio or similar
-                print(f"[SMS] Alert sent: {alert['message']}")
-        except Exception as e:
-            print(f"Error sending SMS: {e}")
+        alert = AlertService._digest(alerts)
+        api_key = os.getenv('SMS_API_KEY')
+        if api_key:
+            # In production, use Twilio or similar
+            print(f"[SMS] Alert sent: {alert['message']}")
     
     @staticmethod
-    def _send_email(alert: Dict[str, Any]):
+    def _send_email(recipient: str, alerts: List[Dict[str, Any]]):
         """Send email alert (mock implementation)"""
-        try:
-            print(f"[EMAIL] Alert sent: {alert['message']}")
-        except Exception as e:
-            print(f"Error sending email: {e}")
+        alert = AlertService._digest(alerts)
+        print(f"[EMAIL] Alert sent: {alert['message']}")
     
     @staticmethod
-    def _send_push_notification(alert: Dict[str, Any]):
+    def _send_push_notification(recipient: str, alerts: List[Dict[str, Any]]):
         """Send push notification (mock implementation)"""
-        try:
-            print(f"[PUSH] Alert sent: {alert['message']}")
-        except Exception as e:
-            print(f"Error sending push notification: {e}")
+        alert = AlertService._digest(alerts)
+        print(f"[PUSH] Alert sent: {alert['message']}")
+    
+    @staticmethod
+    def get_notification_metrics() -> Dict[str, Any]:
+        """Per-channel delivery counts, latency and queue depth"""
+        return notification_queue.get_metrics()
     
     @staticmethod
     def get_alerts(limit: int = 50) -> List[Dict[str, Any]]:
         """Get recent alerts"""
-        return firebase_service.get_alerts(limit)
+        return [alert_buffer.overlay(alert.get('id'), alert) for alert in storage.get_alerts(limit)]
+    
+    @staticmethod
+    def get_alerts_page(limit: int = 50, after: Optional[Tuple[str, str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of alerts, newest first, and the cursor of the next page"""
+        alerts, next_cursor = paginate(storage.get_alerts_page, limit, after)
+        return [alert_buffer.overlay(alert.get('id'), alert) for alert in alerts], next_cursor
+    
+    @staticmethod
+    def get_sensor_alerts(sensor_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get a sensor's recent alerts"""
+        return [
+            alert_buffer.overlay(alert.get('id'), alert)
+            for alert in storage.get_alerts_by_sensor(sensor_id, limit)
+        ]
+    
+    @staticmethod
+    def get_unacknowledged_alerts(limit: int = 50) -> List[Dict[str, Any]]:
+        """Get recent unacknowledged alerts"""
+        return [
+            alert_buffer.overlay(alert.get('id'), alert)
+            for alert in storage.get_unacknowledged_alerts(limit)
+        ]
     
     @staticmethod
     def acknowledge_alert(alert_id: str):
         """Mark alert as acknowledged"""
-        firebase_service.acknowledge_alert(alert_id)
+        alert = storage.acknowledge_alert(alert_id)
+        response_cache.bump('alerts')
+        if alert:
+            CounterService.record_acknowledged(alert)
+
+
+def _recipients(channel: str) -> List[str]:
+    return [r.strip() for r in os.getenv(f'NOTIFY_{channel.upper()}_TO', 'default').split(',') if r.strip()]
+
+RECIPIENTS = {channel: _recipients(channel) for channel in ('sms', 'email', 'push')}
+
+# Episode progress and notified_via (every channel delivered so far), coalesced per alert
+alert_buffer = WriteBehindBuffer(
+    storage.update_alerts,
+    interval_ms=int(os.getenv('ALERT_FLUSH_MS', 1000))
+)
+
+def _record_delivered(channels: Dict[str, List[str]]):
+    for alert_id, via in channels.items():
+        alert_buffer.put(alert_id, {'notified_via': via})
+    response_cache.bump('alerts')
+
+notification_queue = NotificationQueue(
+    os.getenv('NOTIFY_QUEUE_PATH', 'notifications.db'),
+    senders={
+        'sms': AlertService._send_sms,
+        'email': AlertService._send_email,
+        'push': AlertService._send_push_notification,
+    },
+    on_delivered=_record_delivered,
+    workers_per_channel=int(os.getenv('NOTIFY_WORKERS_PER_CHANNEL', 2)),
+    digest_seconds=float(os.getenv('NOTIFY_DIGEST_SECONDS', 5)),
+    max_attempts=int(os.getenv('NOTIFY_MAX_ATTEMPTS', 5)),
+    claim_timeout_seconds=float(os.getenv('NOTIFY_CLAIM_TIMEOUT_SECONDS', 300))
+)
@@ -1,14 +1,21 @@
 """
 Anomaly detection service using Machine Learning
 """
-from typing import List, Dict, Any, Tuple
-import pandas as pd
-from sklearn.ensemble import IsolationForest
+from typing import List, Dict, Any, Tuple, Optional, Iterator, Union
+from concurrent.futures import as_completed
 import numpy as np
-from datetime import datetime, timedelta
-from services.firebase_service import FirebaseService
+from services.storage_service import get_storage
+from services.stats_service import StatsService
+from services.counter_service import CounterService
+from services.ml_models import CompiledForest, fit_isolation_forest, score_isolation_forest
+from services.model_registry import ModelEntry, model_registry
+from services.hot_tier import ReadingWindow, hot_tier, to_micros
+from services.cold_storage import cold_storage, merge_cold
+from utils import get_date_range
+from utils.features import FeatureBuffer, extract_features
+from utils.concurrency import run_cpu, submit_cpu
 
-firebase_service = FirebaseService()
+storage = get_storage()
 
 class AnomalyDetectionService:
     """Detect anomalies in sensor data using Isolation Forest"""
@@ -17,6 +24,20 @@ class AnomalyDetectionService:
     CONTAMINATION_RATE = 0.1  # Assume 10% of data might be anomalous
     MIN_SAMPLES = 5  # Minimum samples needed for detection
     
+    @staticmethod
+    def _load_window(sensor_id: str, start) -> Union[ReadingWindow, List[Dict]]:
+        """Readings since start (newest first), as hot tier arrays when it covers them"""
+        window = hot_tier.window(sensor_id, start)
+        if window is not None:
+            return window
+        return merge_cold(storage.get_readings_range(sensor_id, start), cold_storage.read_range(sensor_id, start))
+    
+    @staticmethod
+    def _features(readings: Union[ReadingWindow, List[Dict]], buffer: Optional[FeatureBuffer] = None) -> np.ndarray:
+        if isinstance(readings, ReadingWindow):
+            return readings.feature_matrix()
+        return extract_features(readings, buffer).X
+    
     @staticmethod
     def detect_anomalies(sensor_id: str, hours: int = 24) -> Tuple[List[str], List[Dict]]:
         """
@@ -24,58 +45,85 @@ class AnomalyDetectionService:
         Returns tuple of (anomaly_ids, anomaly_details)
         """
         try:
-            readings = firebase_service.get_readings(sensor_id, limit=1000)
-            
-            # Filter by time
-            now = datetime.now()
-            cutoff = now - timedelta(hours=hours)
-            
-            filtered_readings = []
-            for reading in readings:
-                try:
-                    created = datetime.fromisoformat(reading.get('created_at', ''))
-                    if created >= cutoff:
-                        filtered_readings.append(reading)
-                except:
-                    pass
-            
+            start, _ = get_date_range(hours)
+            readings = AnomalyDetectionService._load_window(sensor_id, start)
+        except Exception as e:
+            print(f"Error detecting anomalies: {e}")
+            return [], []
+        return AnomalyDetectionService._detect(sensor_id, readings, hours)
+    
+    @staticmethod
+    def _new_entry(model: Any, readings: Union[ReadingWindow, List[Dict]]) -> ModelEntry:
+        """Registry entry for a model fitted on readings (newest first)"""
+        return ModelEntry(
+            model,
+            n_samples=len(readings),
+            window_start=readings[-1].get('created_at'),
+            window_end=readings[0].get('created_at'),
+            scorer=CompiledForest(model)
+        )
+    
+    @staticmethod
+    def _get_model(sensor_id: str, hours: int, X: np.ndarray, readings: Union[ReadingWindow, List[Dict]]) -> Optional[ModelEntry]:
+        """Cached model for the sensor's window, retrained when stale"""
+        def train() -> ModelEntry:
+            # Training runs on the ML process pool so it never holds this process's GIL
+            model = run_cpu(
+                fit_isolation_forest,
+                X,
+                AnomalyDetectionService.CONTAMINATION_RATE,
+                random_state=42,
+                n_estimators=100
+            )
+            return AnomalyDetectionService._new_entry(model, readings)
+        return model_registry.get_or_train((sensor_id, hours), train)
+    
+    @staticmethod
+    def _detect(
+        sensor_id: str,
+        filtered_readings: Union[ReadingWindow, List[Dict]],
+        hours: int,
+        buffer: Optional[FeatureBuffer] = None
+    ) -> Tuple[List[str], List[Dict]]:
+        """Score already loaded readings (newest first) and flag the anomalies"""
+        try:
             if len(filtered_readings) < AnomalyDetectionService.MIN_SAMPLES:
                 return [], []
             
             # Prepare data for anomaly detection
-            df = AnomalyDetectionService._prepare_dataframe(filtered_readings)
+            X = AnomalyDetectionService._features(filtered_readings, buffer)
             
-            if df.empty or len(df) < AnomalyDetectionService.MIN_SAMPLES:
+            # Scoring a cached model is a score_samples call; fitting only happens when stale
+            entry = AnomalyDetectionService._get_model(sensor_id, hours, X, filtered_readings)
+            if entry is None:
                 return [], []
-            
-            # Train and predict
-            features = ['ph_level', 'tds_level', 'turbidity']
-            X = df[features].values
-            
-            model = IsolationForest(
-                contamination=AnomalyDetectionService.CONTAMINATION_RATE,
-                random_state=42,
-                n_estimators=100
-            )
-            
-            predictions = model.fit_predict(X)
-            scores = model.score_samples(X)
+            predictions, scores = score_isolation_forest(entry.model, X)
             
             # Identify anomalies
             anomaly_ids = []
             anomaly_details = []
+            newly_flagged = []
+            flag_updates = {}
+            # Cold segments are immutable: tiered readings are scored, but their flags stay as stored
+            tiered_until = cold_storage.manifest(sensor_id)['tiered_until']
             
             for idx, (pred, score) in enumerate(zip(predictions, scores)):
                 if pred == -1:  # Anomaly detected
                     reading = filtered_readings[idx]
                     reading_id = reading.get('id', f'reading_{idx}')
                     anomaly_ids.append(reading_id)
+                    tiered = tiered_until is not None and (to_micros(reading.get('created_at')) or 0) <= tiered_until
                     
-                    # Update reading with anomaly flag
-                    firebase_service.db.reference(f'readings/{sensor_id}/{reading_id}').update({
-                        'is_anomaly': True,
-                        'anomaly_score': float(score)
-                    })
+                    if not reading.get('is_anomaly', False) and not tiered:
+                        newly_flagged.append(reading.get('created_at'))
+                    
+                    # Only rows whose stored flag or score changed are written back
+                    changed = not reading.get('is_anomaly', False) or reading.get('anomaly_score') != float(score)
+                    if changed and not tiered:
+                        flag_updates[reading_id] = {
+                            'is_anomaly': True,
+                            'anomaly_score': float(score)
+                        }
                     
                     anomaly_details.append({
                         'reading_id': reading_id,
@@ -88,27 +136,18 @@ class AnomalyDetectionService:
                         'severity': AnomalyDetectionService._determine_severity(score)
                     })
             
+            if flag_updates:
+                storage.update_readings(sensor_id, flag_updates)
+                hot_tier.update_flags(sensor_id, flag_updates)
+            StatsService.record_anomalies(sensor_id, newly_flagged)
+            CounterService.record_anomalies(sensor_id, len(newly_flagged))
+            
             return anomaly_ids, anomaly_details
         
         except Exception as e:
             print(f"Error detecting anomalies: {e}")
             return [], []
     
-    @staticmethod
-    def _prepare_dataframe(readings: List[Dict]) -> pd.DataFrame:
-        """Prepare dataframe from readings"""
-        data = []
-        for reading in readings:
-            data.append({
-                'id': reading.get('id'),
-                'ph_level': reading.get('ph_level', 7.0),
-                'tds_level': reading.get('tds_level', 0),
-                'turbidity': reading.get('turbidity', 0),
-                'created_at': reading.get('created_at')
-            })
-        
-        return pd.DataFrame(data)
-    
     @staticmethod
     def _determine_severity(score: float) -> str:
         """Determine severity based on anomaly score"""
@@ -127,25 +166,21 @@ class AnomalyDetectionService:
         hours: int = 24
     ) -> Dict[str, Any]:
         """Get anomaly statistics for a sensor"""
-        anomaly_ids, anomaly_details = AnomalyDetectionService.detect_anomalies(
-            sensor_id,
-            hours
-        )
-        
-        readings = firebase_service.get_readings(sensor_id, limit=1000)
+        start, _ = get_date_range(hours)
+        readings = AnomalyDetectionService._load_window(sensor_id, start)
+        return AnomalyDetectionService._window_statistics(sensor_id, readings, hours)
+    
+    @staticmethod
+    def _window_statistics(
+        sensor_id: str,
+        readings: Union[ReadingWindow, List[Dict]],
+        hours: int,
+        buffer: Optional[FeatureBuffer] = None
+    ) -> Dict[str, Any]:
+        """Anomaly statistics for an already loaded window"""
+        anomaly_ids, anomaly_details = AnomalyDetectionService._detect(sensor_id, readings, hours, buffer)
         
-        # Filter by time
-        now = datetime.now()
-        cutoff = now - timedelta(hours=hours)
-        
-        total_in_range = 0
-        for reading in readings:
-            try:
-                created = datetime.fromisoformat(reading.get('created_at', ''))
-                if created >= cutoff:
-                    total_in_range += 1
-            except:
-                pass
+        total_in_range = len(readings)
         
         anomaly_percentage = (len(anomaly_ids) / total_in_range * 100) if total_in_range > 0 else 0
         
@@ -160,3 +195,58 @@ class AnomalyDetectionService:
                 4
             )
         }
+    
+    @staticmethod
+    def iter_fleet_statistics(sensor_ids: List[str], hours: int = 24) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Anomaly statistics for many sensors, yielded as each sensor finishes.
+        All windows are loaded in bulk and stale models are refitted
+        concurrently on the ML process pool.
+        """
+        start, _ = get_date_range(hours)
+        windows = {}
+        for sensor_id in sensor_ids:
+            window = hot_tier.window(sensor_id, start)
+            if window is not None:
+                windows[sensor_id] = window
+        missing = [sensor_id for sensor_id in sensor_ids if sensor_id not in windows]
+        if missing:
+            for sensor_id, readings in storage.get_readings_ranges(missing, start).items():
+                windows[sensor_id] = merge_cold(readings, cold_storage.read_range(sensor_id, start))
+        
+        buffer = FeatureBuffer()
+        training = {}
+        ready = []
+        for sensor_id in sensor_ids:
+            readings = windows.get(sensor_id, [])
+            if (
+                len(readings) < AnomalyDetectionService.MIN_SAMPLES
+                or model_registry.is_fresh(model_registry.get((sensor_id, hours)))
+            ):
+                ready.append(sensor_id)
+                continue
+            # Fresh arrays: the pool pickles them after submit returns
+            X = AnomalyDetectionService._features(readings)
+            future = submit_cpu(
+                fit_isolation_forest,
+                X,
+                AnomalyDetectionService.CONTAMINATION_RATE,
+                random_state=42,
+                n_estimators=100
+            )
+            training[future] = sensor_id
+        
+        # Sensors with fresh models are scored while the rest train
+        for sensor_id in ready:
+            yield sensor_id, AnomalyDetectionService._window_statistics(
+                sensor_id, windows.get(sensor_id, []), hours, buffer
+            )
+        
+        for future in as_completed(training):
+            sensor_id = training[future]
+            readings = windows[sensor_id]
+            try:
+                model_registry.put((sensor_id, hours), AnomalyDetectionService._new_entry(future.result(), readings))
+            except Exception as e:
+                print(f"Error training model for {sensor_id}: {e}")
+            yield sensor_id, AnomalyDetectionService._window_statistics(sensor_id, readings, hours, buffer)
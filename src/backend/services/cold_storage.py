@@ -0,0 +1,405 @@
+"""
+Cold tier: readings older than COLD_TIER_AFTER_DAYS moved out of storage into
+immutable, compressed, columnar segment files per sensor and day.
+
+Layout: COLD_STORAGE_DIR/<sensor_id>/manifest.json lists each segment with its
+row count, time span and min/max of the measurements, so range queries only
+open overlapping segments. A segment is a fixed binary header followed by one
+zlib block per column:
+  micros  - first timestamp then int64 deltas
+  floats  - float64, byte-shuffled so similar bytes compress together
+            (segments written before float64 hold float32 and still read)
+  flags   - uint8 (anomaly flag and quality status, as in the hot tier)
+  id      - newline-separated UTF-8
+Segments are read through mmap, so scans never parse JSON rows.
+
+Move old readings (from src/backend): python -m services.cold_storage [days]
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import json
+import mmap
+import os
+import struct
+import threading
+import uuid
+import zlib
+import numpy as np
+from services.storage_service import get_storage
+from utils import to_local_naive
+from services.hot_tier import COLUMNS, FLOAT_FIELDS, ReadingWindow, to_columns, to_micros
+
+storage = get_storage()
+
+MAGIC = b'AQSEG001'
+HEADER = struct.Struct('<8sII')  # magic, rows, columns
+COLUMN_ENTRY = struct.Struct('<16sQQ')  # column name, offset, compressed length
+COMPRESSION_LEVEL = 6
+DAY_MICROS = 86_400_000_000
+PAGE_SIZE = 20000
+RANGE_FIELDS = ('ph_level', 'tds_level', 'turbidity')
+# Fields a reading must read back unchanged before storage may forget it
+KEPT_FIELDS = ('sensor_id', 'created_at', *FLOAT_FIELDS, 'is_anomaly', 'quality_status')
+
+def _encode(name: str, column: np.ndarray) -> bytes:
+    if name == 'micros':
+        data = np.diff(column, prepend=0).astype('<i8').tobytes()
+    elif name == 'id':
+        data = '\n'.join(column.tolist()).encode()
+    elif column.dtype.kind == 'f':
+        width = column.dtype.itemsize
+        data = column.astype(f'<f{width}').view(np.uint8).reshape(-1, width).T.tobytes()
+    else:
+        data = column.tobytes()
+    return zlib.compress(data, COMPRESSION_LEVEL)
+
+def _decode(name: str, raw: memoryview, rows: int) -> np.ndarray:
+    data = zlib.decompress(raw)
+    if name == 'micros':
+        return np.cumsum(np.frombuffer(data, dtype='<i8'))
+    if name == 'id':
+        ids = np.empty(rows, dtype=object)
+        ids[:] = data.decode().split('\n') if rows else []
+        return ids
+    if np.dtype(COLUMNS[name]).kind == 'f':
+        width = len(data) // rows if rows else 8
+        shuffled = np.frombuffer(data, dtype=np.uint8).reshape(width, rows)
+        return shuffled.T.copy().view(f'<f{width}').ravel().astype(np.float64)
+    return np.frombuffer(data, dtype=COLUMNS[name])
+
+def write_segment(path: str, columns: Dict[str, np.ndarray]):
+    """Write columns (sorted by time) as a segment file"""
+    blocks = [(name, _encode(name, columns[name])) for name in COLUMNS]
+    offset = HEADER.size + COLUMN_ENTRY.size * len(blocks)
+    entries = []
+    for name, block in blocks:
+        entries.append(COLUMN_ENTRY.pack(name.encode(), offset, len(block)))
+        offset += len(block)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(columns['micros']), len(blocks)))
+        f.writelines(entries)
+        f.writelines(block for _, block in blocks)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class Segment:
+    """A segment file mapped into memory; columns are decompressed on access"""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, self.rows, count = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f'Not a segment file: {path}')
+        self._blocks: Dict[str, Tuple[int, int]] = {}
+        for i in range(count):
+            name, offset, length = COLUMN_ENTRY.unpack_from(self._map, HEADER.size + i * COLUMN_ENTRY.size)
+            self._blocks[name.rstrip(b'\0').decode()] = (offset, length)
+
+    def column(self, name: str) -> np.ndarray:
+        offset, length = self._blocks[name]
+        return _decode(name, self._view[offset:offset + length], self.rows)
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> 'Segment':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _bound(value: Any) -> int:
+    """Microseconds for a query bound (datetime or ISO string); aware times are read as local time"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    micros = to_micros(to_local_naive(value) if isinstance(value, datetime) else value)
+    if micros is None:
+        raise ValueError(f'Unsupported time bound: {value!r}')
+    return micros
+
+def _same(original: Dict[str, Any], stored: Dict[str, Any]) -> bool:
+    return all(original.get(field) == stored.get(field) for field in KEPT_FIELDS)
+
+def _sorted(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Columns ordered by (timestamp, id), the keyset order of paged queries"""
+    micros, ids = columns['micros'].tolist(), columns['id'].tolist()
+    order = sorted(range(len(micros)), key=lambda i: (micros[i], ids[i]))
+    return {name: column[order] for name, column in columns.items()}
+
+def merge_cold(
+    readings: List[Dict[str, Any]],
+    cold: Optional[ReadingWindow],
+    limit: Optional[int] = None,
+    descending: bool = True
+) -> List[Dict[str, Any]]:
+    """Storage readings plus a cold tier window, in (created_at, id) order"""
+    if cold is None:
+        return readings
+    seen = {r['id'] for r in readings}
+    merged = readings + [r for r in cold.rows() if r['id'] not in seen]
+    merged.sort(key=lambda r: (r.get('created_at') or '', r['id']), reverse=descending)
+    return merged if limit is None else merged[:limit]
+
+class ColdStorage:
+    """Segment files and their manifests, one directory per sensor"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._manifests: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, sensor_id: str, name: str = '') -> str:
+        return os.path.join(self.root, sensor_id, name)
+
+    def manifest(self, sensor_id: str) -> Dict[str, Any]:
+        """The sensor's manifest, reloaded when another process (the tiering job) rewrote it"""
+        path = self._path(sensor_id, 'manifest.json')
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return {'tiered_until': None, 'segments': []}
+        # Manifests are replaced, never edited, so a new inode means a new version
+        version = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._manifests.get(sensor_id)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        with open(path) as f:
+            manifest = json.load(f)
+        with self._lock:
+            self._manifests[sensor_id] = (version, manifest)
+        return manifest
+
+    def _save_manifest(self, sensor_id: str, manifest: Dict[str, Any]):
+        path = self._path(sensor_id, 'manifest.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(manifest, f, separators=(',', ':'))
+        os.replace(f'{path}.tmp', path)
+
+    def write(self, sensor_id: str, columns: Dict[str, np.ndarray], tiered_until: int):
+        """Write one segment per day of columns and record them, with the new tiered_until, in the manifest"""
+        os.makedirs(self._path(sensor_id), exist_ok=True)
+        manifest = self.manifest(sensor_id)
+        segments = list(manifest['segments'])
+        days = columns['micros'] // DAY_MICROS
+        for day in np.unique(days):
+            part = _sorted({name: column[days == day] for name, column in columns.items()})
+            name = f"{datetime(1970, 1, 1) + timedelta(days=int(day)):%Y%m%d}-{uuid.uuid4().hex[:8]}.seg"
+            write_segment(self._path(sensor_id, name), part)
+            segments.append({
+                'file': name,
+                'rows': len(part['micros']),
+                'start': int(part['micros'][0]),
+                'end': int(part['micros'][-1]),
+                'min': {field: float(np.nanmin(part[field])) for field in RANGE_FIELDS},
+                'max': {field: float(np.nanmax(part[field])) for field in RANGE_FIELDS},
+            })
+        segments.sort(key=lambda segment: segment['start'])
+        previous = manifest['tiered_until']
+        self._save_manifest(sensor_id, {
+            'tiered_until': tiered_until if previous is None else max(previous, tiered_until),
+            'segments': segments,
+        })
+
+    def _scan(
+        self,
+        sensor_id: str,
+        start: Optional[int],
+        end: Optional[int],
+        limit: Optional[int],
+        descending: bool,
+        after: Optional[Tuple[int, str]] = None
+    ) -> Optional[ReadingWindow]:
+        """Rows with start <= micros <= end (and past the keyset after), in (micros, id) order"""
+        if after is not None:
+            # Pages only need the segments beyond the cursor
+            if descending:
+                end = after[0] if end is None else min(end, after[0])
+            else:
+                start = after[0] if start is None else max(start, after[0])
+        segments = [
+            segment for segment in self.manifest(sensor_id)['segments']
+            if (start is None or segment['end'] >= start) and (end is None or segment['start'] <= end)
+        ]
+        if not segments:
+            return None
+        if descending:
+            segments.sort(key=lambda segment: segment['end'], reverse=True)
+
+        parts: List[Dict[str, np.ndarray]] = []
+        kept = []
+        for segment in segments:
+            if limit is not None and sum(len(part['micros']) for part in parts) >= limit:
+                # Segments lying wholly past the limit-th row can't contribute
+                bound = np.sort(np.concatenate([part['micros'] for part in parts]))
+                if descending and segment['end'] < bound[-limit]:
+                    break
+                if not descending and segment['start'] > bound[limit - 1]:
+                    break
+            with Segment(self._path(sensor_id, segment['file'])) as seg:
+                micros = seg.column('micros')
+                mask = np.ones(len(micros), dtype=bool)
+                if start is not None:
+                    mask &= micros >= start
+                if end is not None:
+                    mask &= micros <= end
+                ids = None
+                if after is not None:
+                    after_micros, after_id = after
+                    past = micros < after_micros if descending else micros > after_micros
+                    ties = micros == after_micros
+                    if ties.any():
+                        ids = seg.column('id')
+                        past[ties] = ids[ties] < after_id if descending else ids[ties] > after_id
+                    mask &= past
+                if not mask.any():
+                    continue
+                part = {'micros': micros[mask]}
+                for name in COLUMNS:
+                    if name == 'micros':
+                        continue
+                    column = ids if name == 'id' and ids is not None else seg.column(name)
+                    part[name] = column[mask]
+            parts.append(part)
+            kept.append(segment)
+
+        if not parts:
+            return None
+        # Each segment is in (micros, id) order, so disjoint ones only need concatenating in time order
+        spans = sorted((segment['start'], segment['end']) for segment in kept)
+        disjoint = all(spans[i][1] < spans[i + 1][0] for i in range(len(spans) - 1))
+        if disjoint:
+            parts.sort(key=lambda part: part['micros'][0])
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+        if not disjoint:
+            columns = _sorted(columns)
+        if descending:
+            columns = {name: column[::-1] for name, column in columns.items()}
+        if limit is not None:
+            columns = {name: column[:limit] for name, column in columns.items()}
+        return ReadingWindow(sensor_id, columns)
+
+    def read_range(
+        self,
+        sensor_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        descending: bool = True
+    ) -> Optional[ReadingWindow]:
+        """Cold readings with start <= created_at <= end, or None when no segment overlaps"""
+        return self._scan(
+            sensor_id,
+            None if start is None else _bound(start),
+            None if end is None else _bound(end),
+            limit,
+            descending
+        )
+
+    def read_page(
+        self,
+        sensor_id: str,
+        limit: int,
+        after: Optional[Tuple[str, str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        descending: bool = True
+    ) -> Optional[ReadingWindow]:
+        """Keyset page of cold readings, ordered like storage.get_readings_page"""
+        return self._scan(
+            sensor_id,
+            None if start is None else _bound(start),
+            None if end is None else _bound(end),
+            limit,
+            descending,
+            None if after is None else (_bound(after[0]), after[1])
+        )
+
+    def tier_sensor(self, sensor_id: str, older_than: datetime, page_size: int = PAGE_SIZE) -> int:
+        """
+        Move a sensor's readings created before older_than from storage into
+        segments, a page at a time; returns how many were moved. Each page is
+        recorded in the manifest before it is deleted from storage, so a run
+        that stops halfway is finished by the next one without duplicates.
+        A reading is only deleted once its segment copy reads back identical;
+        any other reading stays in storage.
+        """
+        moved = 0
+        after = None
+        end = older_than - timedelta(microseconds=1)  # storage ranges include their end
+        while True:
+            rows = storage.get_readings_page(sensor_id, page_size, after, None, end, False)
+            if not rows:
+                break
+            after = (rows[-1]['created_at'], rows[-1]['id'])
+            rows = [row for row in rows if to_micros(row.get('created_at')) is not None]
+            if not rows:
+                continue
+            columns = to_columns(rows)
+            page_start, page_end = int(columns['micros'][0]), int(columns['micros'][-1])
+            by_id = {row['id']: row for row in rows}
+
+            # Only readings the segment format reproduces exactly are moved
+            decoded = ReadingWindow(sensor_id, {
+                name: _decode(name, memoryview(_encode(name, column)), len(column))
+                for name, column in columns.items()
+            })
+            exact = np.fromiter((_same(by_id[row['id']], row) for row in decoded.rows()), dtype=bool, count=len(decoded))
+            columns = {name: column[exact] for name, column in columns.items()}
+
+            tiered_until = self.manifest(sensor_id)['tiered_until']
+            if tiered_until is not None and page_start <= tiered_until:
+                # Already moved by an interrupted run, unless it arrived late with an old timestamp
+                held = self._scan(sensor_id, page_start, tiered_until, None, False)
+                held_ids = set(held.columns['id'].tolist()) if held is not None else set()
+                fresh = np.fromiter((reading_id not in held_ids for reading_id in columns['id']), dtype=bool)
+                columns = {name: column[fresh] for name, column in columns.items()}
+
+            if len(columns['micros']):
+                self.write(sensor_id, columns, page_end)
+                moved += len(columns['micros'])
+
+            # Forget only readings whose segment copy reads back identical
+            stored = self._scan(sensor_id, page_start, page_end, None, False)
+            kept = [row['id'] for row in stored.rows() if row['id'] in by_id and _same(by_id[row['id']], row)] if stored else []
+            if kept:
+                storage.delete_readings(sensor_id, kept)
+        return moved
+
+    def describe(self, sensor_id: str) -> Dict[str, Any]:
+        """Segment count, rows and bytes on disk for a sensor"""
+        manifest = self.manifest(sensor_id)
+        return {
+            'segments': len(manifest['segments']),
+            'rows': sum(segment['rows'] for segment in manifest['segments']),
+            'bytes': sum(os.path.getsize(self._path(sensor_id, segment['file'])) for segment in manifest['segments']),
+            'tiered_until': manifest['tiered_until'],
+        }
+
+
+TIER_AFTER_DAYS = float(os.getenv('COLD_TIER_AFTER_DAYS', 30))
+
+cold_storage = ColdStorage(os.getenv('COLD_STORAGE_DIR', 'cold_storage'))
+
+
+if __name__ == "__main__":
+    import sys
+    from services.sensor_service import SensorService
+    days = float(sys.argv[1]) if len(sys.argv) > 1 else TIER_AFTER_DAYS
+    older_than = datetime.now() - timedelta(days=days)
+    for sensor in SensorService.list_sensors():
+        moved = cold_storage.tier_sensor(sensor['id'], older_than)
+        if moved:
+            info = cold_storage.describe(sensor['id'])
+            print(f"Moved {moved} readings of {sensor['id']} to cold storage "
+                  f"({info['segments']} segments, {info['bytes']} bytes)")
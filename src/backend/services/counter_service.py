@@ -0,0 +1,136 @@
+"""
+Global and per-sensor counters maintained on the write paths,
+so system statistics are a constant-time lookup
+"""
+from typing import Dict, Any, Iterable
+import os
+from services.storage_service import get_storage
+from services.write_behind import WriteBehindBuffer
+
+storage = get_storage()
+
+GLOBAL = 'global'
+COUNTER_NAMES = ('sensors', 'readings', 'anomalies', 'unacknowledged_alerts')
+
+def _sum_counters(a: Dict[str, int], b: Dict[str, int]) -> Dict[str, int]:
+    merged = dict(a)
+    for name, delta in b.items():
+        merged[name] = merged.get(name, 0) + delta
+    return merged
+
+def sensor_group(sensor_id: str) -> str:
+    """Counter group of a sensor"""
+    return f'sensors/{sensor_id}'
+
+# Increments are coalesced in memory and applied together
+counter_buffer = WriteBehindBuffer(
+    storage.increment_counters,
+    interval_ms=int(os.getenv('COUNTERS_FLUSH_MS', 1000)),
+    merge_fn=_sum_counters
+)
+
+class CounterService:
+    """Maintain and read reading, anomaly and alert counters"""
+
+    @staticmethod
+    def _add(sensor_id: str, name: str, delta: int):
+        if not delta:
+            return
+        counter_buffer.put(GLOBAL, {name: delta})
+        if sensor_id:
+            counter_buffer.put(sensor_group(sensor_id), {name: delta})
+
+    @staticmethod
+    def record_sensor_created():
+        """Count a new sensor"""
+        counter_buffer.put(GLOBAL, {'sensors': 1})
+
+    @staticmethod
+    def record_readings(readings: Iterable[Dict[str, Any]]):
+        """Count saved readings and those already flagged anomalous"""
+        per_sensor: Dict[str, Dict[str, int]] = {}
+        for reading in readings:
+            counts = per_sensor.setdefault(reading.get('sensor_id'), {'readings': 0, 'anomalies': 0})
+            counts['readings'] += 1
+            if reading.get('is_anomaly', False):
+                counts['anomalies'] += 1
+        for sensor_id, counts in per_sensor.items():
+            CounterService._add(sensor_id, 'readings', counts['readings'])
+            CounterService._add(sensor_id, 'anomalies', counts['anomalies'])
+
+    @staticmethod
+    def record_anomalies(sensor_id: str, count: int):
+        """Count readings newly flagged as anomalous"""
+        CounterService._add(sensor_id, 'anomalies', count)
+
+    @staticmethod
+    def record_alerts(alerts: Iterable[Dict[str, Any]]):
+        """Count newly saved, unacknowledged alerts"""
+        for alert in alerts:
+            CounterService._add(alert.get('sensor_id'), 'unacknowledged_alerts', 1)
+
+    @staticmethod
+    def record_acknowledged(alert: Dict[str, Any]):
+        """Count an alert leaving the unacknowledged state"""
+        CounterService._add(alert.get('sensor_id'), 'unacknowledged_alerts', -1)
+
+    @staticmethod
+    def get_counts(group: str = GLOBAL) -> Dict[str, int]:
+        """Stored counters of a group plus pending increments"""
+        counts = {name: 0 for name in COUNTER_NAMES}
+        counts.update(storage.get_counters(group))
+        for name, delta in (counter_buffer.get(group) or {}).items():
+            counts[name] = counts.get(name, 0) + delta
+        return counts
+
+    @staticmethod
+    def get_sensor_counts(sensor_id: str) -> Dict[str, int]:
+        """Counters of one sensor"""
+        counts = CounterService.get_counts(sensor_group(sensor_id))
+        counts.pop('sensors', None)
+        return counts
+
+    @staticmethod
+    def rebuild():
+        """
+        Recompute every counter from stored sensors, rollups and alerts (backfill).
+        Run while ingest is paused.
+        """
+        from datetime import datetime
+        from services.stats_service import StatsService, bucket_buffer
+        from services.sensor_service import SensorService
+        from utils.aggregates import RESOLUTIONS, empty_aggregate, merge_aggregates
+
+        counter_buffer.flush()
+        bucket_buffer.flush()
+        sensors = SensorService.list_sensors()
+        values = {GLOBAL: {name: 0 for name in COUNTER_NAMES}}
+        values[GLOBAL]['sensors'] = len(sensors)
+
+        for sensor in sensors:
+            agg = empty_aggregate()
+            for _, day in StatsService.get_buckets(sensor['id'], RESOLUTIONS[-1], datetime.min, datetime.max):
+                agg = merge_aggregates(agg, day)
+            values[sensor_group(sensor['id'])] = {
+                'readings': agg['count'],
+                'anomalies': agg['anomaly_count'],
+                'unacknowledged_alerts': 0,
+            }
+            values[GLOBAL]['readings'] += agg['count']
+            values[GLOBAL]['anomalies'] += agg['anomaly_count']
+
+        for alert in storage.get_unacknowledged_alerts(limit=1000000):
+            group = values.setdefault(
+                sensor_group(alert.get('sensor_id')),
+                {'readings': 0, 'anomalies': 0, 'unacknowledged_alerts': 0}
+            )
+            group['unacknowledged_alerts'] += 1
+            values[GLOBAL]['unacknowledged_alerts'] += 1
+
+        storage.set_counters(values)
+
+
+if __name__ == "__main__":
+    # Backfill: python -m services.counter_service
+    CounterService.rebuild()
+    print(CounterService.get_counts())
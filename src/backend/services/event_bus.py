@@ -0,0 +1,103 @@
+"""
+In-process pub/sub fanning ingest events out to live stream subscribers.
+Publishers can be on any thread; each event is encoded once as a
+Server-Sent Events frame and handed to every subscriber's event loop.
+Events without a sensor (the sensor list, system counters) go to everyone.
+"""
+from typing import Any, Dict, Iterable, Optional, Set
+import asyncio
+import json
+import os
+import threading
+
+ALL = '*'  # subscribers to every sensor
+MAX_QUEUED = int(os.getenv('STREAM_QUEUE_SIZE', 256))
+
+def sse_frame(event_type: str, data: Any) -> str:
+    """Encode one Server-Sent Events message"""
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str, separators=(',', ':'))}\n\n"
+
+class Subscription:
+    """
+    Bounded queue of frames for one client. When a slow client falls behind,
+    the oldest frames are dropped and the client is told to resync.
+    """
+
+    def __init__(self, sensor_ids: Optional[Iterable[str]], max_queued: int = MAX_QUEUED):
+        self.topics: Set[str] = set(sensor_ids) if sensor_ids else {ALL}
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self.dropped = 0
+
+    def _put(self, frame: str):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+    async def next_frame(self, timeout: float) -> Optional[str]:
+        """Next frame, a resync notice after drops, or None when nothing arrived within timeout"""
+        try:
+            frame = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            return sse_frame('resync', {'dropped': dropped}) + frame
+        return frame
+
+class EventBus:
+    """Topic (sensor id) to subscriptions"""
+
+    def __init__(self):
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._subscriptions: Set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, sensor_ids: Optional[Iterable[str]] = None) -> Subscription:
+        """Subscribe the running event loop to some sensors (or all of them)"""
+        subscription = Subscription(sensor_ids)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            for topic in subscription.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._topics[topic]
+
+    def has_subscribers(self, sensor_id: Optional[str] = None) -> bool:
+        """Whether anyone receives sensor_id's events (or, with no sensor, anyone at all)"""
+        with self._lock:
+            if sensor_id is None:
+                return bool(self._subscriptions)
+            return ALL in self._topics or sensor_id in self._topics
+
+    def publish(self, event_type: str, sensor_id: Optional[str], data: Any):
+        """
+        Send data to the subscribers of sensor_id and of all sensors, or to
+        everyone when sensor_id is None; free when nobody listens
+        """
+        with self._lock:
+            if sensor_id is None:
+                targets = set(self._subscriptions)
+            else:
+                targets = self._topics.get(ALL, set()) | self._topics.get(sensor_id, set())
+        if not targets:
+            return
+        frame = sse_frame(event_type, {'sensor_id': sensor_id, 'data': data})
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, frame)
+            except RuntimeError:
+                # The subscriber's loop is closed
+                self.unsubscribe(subscription)
+
+event_bus = EventBus()
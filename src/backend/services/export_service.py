@@ -0,0 +1,173 @@
+"""
+Streaming bulk export of raw readings as CSV, NDJSON or Parquet.
+Readings are walked a keyset page at a time (storage and cold tier) and
+encoded page by page, so memory use doesn't depend on the size of the range.
+
+CLI (from src/backend):
+  python -m services.export_service --sensor ID [--sensor ID ...] --start 2024-01-01 \
+      [--end 2024-06-30] [--format csv|ndjson|parquet] [--gzip] [-o FILE]
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from datetime import datetime
+import csv
+import io
+import os
+import zlib
+from services.reading_service import ReadingService
+from services.sensor_service import SensorService
+from utils.fast_json import dumps
+from utils.pagination import decode_cursor
+
+PAGE_SIZE = int(os.getenv('EXPORT_PAGE_SIZE', 5000))
+FIELDS = (
+    'sensor_id', 'id', 'created_at', 'ph_level', 'tds_level', 'turbidity',
+    'temperature', 'is_anomaly', 'anomaly_score', 'quality_status'
+)
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+class ExportService:
+    """Encode readings of many sensors as a stream of byte chunks"""
+
+    @staticmethod
+    def check_format(fmt: str):
+        """Raise ValueError for an unknown format or Parquet without pyarrow"""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}' (expected one of {', '.join(FORMATS)})")
+        if fmt == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ValueError('Parquet export requires pyarrow (pip install pyarrow)')
+
+    @staticmethod
+    def iter_pages(
+        sensor_ids: Iterable[str],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        page_size: int = PAGE_SIZE
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Each sensor's readings, oldest first, one keyset page at a time"""
+        for sensor_id in sensor_ids:
+            after = None
+            while True:
+                page, cursor = ReadingService.get_readings_page(
+                    sensor_id, page_size, after, start=start, end=end, descending=False
+                )
+                if page:
+                    yield page
+                if cursor is None:
+                    break
+                after = decode_cursor(cursor)
+
+    @staticmethod
+    def _csv(pages: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(FIELDS)
+        for page in pages:
+            writer.writerows([reading.get(field) for field in FIELDS] for reading in page)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    @staticmethod
+    def _ndjson(pages: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+        for page in pages:
+            yield b''.join(dumps({field: reading.get(field) for field in FIELDS}) + b'\n' for reading in page)
+
+    @staticmethod
+    def _parquet(pages: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+        """One row group per page, written to a sink that is drained after each"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ('sensor_id', pa.string()),
+            ('id', pa.string()),
+            ('created_at', pa.string()),
+            ('ph_level', pa.float64()),
+            ('tds_level', pa.float64()),
+            ('turbidity', pa.float64()),
+            ('temperature', pa.float64()),
+            ('is_anomaly', pa.bool_()),
+            ('anomaly_score', pa.float64()),
+            ('quality_status', pa.string()),
+        ])
+        sink = io.BytesIO()
+
+        def drain() -> bytes:
+            data = sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+            return data
+
+        with pq.ParquetWriter(sink, schema, compression='zstd') as writer:
+            for page in pages:
+                writer.write_table(pa.Table.from_pylist(
+                    [{field: reading.get(field) for field in FIELDS} for reading in page], schema=schema
+                ))
+                yield drain()
+        yield drain()
+
+    @staticmethod
+    def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip container
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    @staticmethod
+    def stream(
+        sensor_ids: Optional[List[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        fmt: str = 'csv',
+        gzip: bool = False,
+        page_size: int = PAGE_SIZE
+    ) -> Iterator[bytes]:
+        """Encoded chunks of every reading of sensor_ids (default all sensors) in [start, end]"""
+        ExportService.check_format(fmt)
+        if not sensor_ids:
+            sensor_ids = [sensor['id'] for sensor in SensorService.list_sensors()]
+        pages = ExportService.iter_pages(sensor_ids, start, end, page_size)
+        encode = {'csv': ExportService._csv, 'ndjson': ExportService._ndjson, 'parquet': ExportService._parquet}[fmt]
+        chunks = (chunk for chunk in encode(pages) if chunk)
+        return ExportService._gzip(chunks) if gzip else chunks
+
+    @staticmethod
+    def filename(fmt: str, gzip: bool = False) -> str:
+        return f"readings-{datetime.now():%Y%m%d-%H%M%S}.{fmt}{'.gz' if gzip else ''}"
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Export raw readings')
+    parser.add_argument('--sensor', action='append', dest='sensor_ids', help='Sensor id (repeatable, default all)')
+    parser.add_argument('--start', type=datetime.fromisoformat, help='Range start (ISO date/time)')
+    parser.add_argument('--end', type=datetime.fromisoformat, help='Range end (ISO date/time)')
+    parser.add_argument('--format', choices=list(FORMATS), default='csv')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('-o', '--output', help='Output file (default stdout)')
+    args = parser.parse_args()
+
+    try:
+        chunks = ExportService.stream(args.sensor_ids, args.start, args.end, args.format, args.gzip)
+    except ValueError as e:
+        parser.error(str(e))
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
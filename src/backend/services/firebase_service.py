@@ -1,23 +1,79 @@
 """
 Firebase service for database operations
 """
-import firebase_admin
-from firebase_admin import credentials, db, auth
 import os
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.storage_service import StorageBackend
+from utils.aggregates import merge_aggregates
 
-class FirebaseService:
+PUSH_CHARS = '-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+_push_lock = threading.Lock()
+_last_push_time = 0
+_last_rand_chars = [0] * 12
+
+def _encode_time(timestamp_ms: int) -> str:
+    time_chars = []
+    for _ in range(8):
+        time_chars.append(PUSH_CHARS[timestamp_ms % 64])
+        timestamp_ms //= 64
+    return ''.join(reversed(time_chars))
+
+def generate_push_id(timestamp_ms: Optional[int] = None) -> str:
+    """
+    Generate a chronologically ordered Firebase push key locally,
+    so batched writes can address new children without a round trip.
+    With timestamp_ms the key sorts by that time instead of now.
+    """
+    global _last_push_time
+    with _push_lock:
+        now = int(time.time() * 1000) if timestamp_ms is None else timestamp_ms
+        duplicate = now == _last_push_time
+        _last_push_time = now
+        
+        if not duplicate:
+            for i in range(12):
+                _last_rand_chars[i] = random.randrange(64)
+        else:
+            i = 11
+            while i >= 0 and _last_rand_chars[i] == 63:
+                _last_rand_chars[i] = 0
+                i -= 1
+            _last_rand_chars[i] += 1
+        
+        return _encode_time(now) + ''.join(PUSH_CHARS[c] for c in _last_rand_chars)
+
+def push_id_bound(moment: datetime, upper: bool = False) -> str:
+    """Lowest (or highest) push key that can be generated at moment, for key range scans"""
+    return _encode_time(int(moment.timestamp() * 1000)) + (PUSH_CHARS[-1] if upper else PUSH_CHARS[0]) * 12
+
+class FirebaseService(StorageBackend):
     """Handle all Firebase Realtime Database operations"""
     
     def __init__(self):
-        self.db = db
-        self._initialize_firebase()
+        self._db = None
+        self._connect_lock = threading.Lock()
+    
+    @property
+    def db(self):
+        """firebase_admin.db, imported and initialized on first use so startup stays fast"""
+        if self._db is None:
+            with self._connect_lock:
+                if self._db is None:
+                    from firebase_admin import db
+                    self._initialize_firebase()
+                    self._db = db
+        return self._db
     
     def _initialize_firebase(self):
         """Initialize Firebase Admin SDK"""
         try:
+            import firebase_admin
             if not firebase_admin._apps:
                 # Try to load Firebase credentials from environment
                 firebase_key = os.getenv('FIREBASE_PROJECT_ID')
@@ -69,6 +125,20 @@ class FirebaseService:
         except Exception as e:
             print(f"Error updating sensor: {e}")
     
+    def update_sensors(self, updates: Dict[str, Dict[str, Any]]):
+        """Update several sensors with one multi-path update"""
+        try:
+            paths = {
+                f'sensors/{sensor_id}/{field}': value
+                for sensor_id, data in updates.items()
+                for field, value in data.items()
+            }
+            if paths:
+                self.db.reference().update(paths)
+        except Exception as e:
+            print(f"Error updating sensors: {e}")
+            raise  # the write-behind buffer keeps the updates for its next flush
+    
     # Reading operations
     def save_reading(self, reading_data: Dict[str, Any]) -> str:
         """Save sensor reading"""
@@ -82,49 +152,365 @@ class FirebaseService:
             import uuid
             return str(uuid.uuid4())
     
+    def save_readings(self, readings: List[Dict[str, Any]]) -> List[str]:
+        """
+        Save many readings, possibly for many sensors, with one multi-path update.
+        Keys are generated from created_at, so key order is time order even for backfilled readings.
+        """
+        now = datetime.now().isoformat()
+        keys = []
+        try:
+            paths = {}
+            for reading_data in readings:
+                reading_data.setdefault('created_at', now)
+                key = generate_push_id(int(datetime.fromisoformat(reading_data['created_at']).timestamp() * 1000))
+                keys.append(key)
+                paths[f"readings/{reading_data.get('sensor_id')}/{key}"] = reading_data
+            if paths:
+                self.db.reference().update(paths)
+        except Exception as e:
+            print(f"Error saving readings: {e}")
+        return keys
+    
     def get_readings(self, sensor_id: str, limit: int = 100) -> List[Dict]:
         """Get readings for a sensor"""
         try:
+            # Requires ".indexOn": "created_at" on readings/$sensor_id
             ref = self.db.reference(f'readings/{sensor_id}')
-            data = ref.get()
+            data = ref.order_by_child('created_at').limit_to_last(limit).get()
             if data:
                 readings = [{'id': k, **v} for k, v in data.items()]
-                return sorted(readings, key=lambda x: x.get('created_at', ''), reverse=True)[:limit]
+                return sorted(readings, key=lambda x: x.get('created_at', ''), reverse=True)
             return []
         except:
             return []
     
+    def get_readings_range(
+        self,
+        sensor_id: str,
+        start: datetime,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        descending: bool = True
+    ) -> List[Dict]:
+        """Get readings within a time range using an ordered-child query"""
+        try:
+            query = self.db.reference(f'readings/{sensor_id}').order_by_child('created_at')
+            query = query.start_at(start.isoformat())
+            if end is not None:
+                query = query.end_at(end.isoformat())
+            if limit is not None:
+                query = query.limit_to_last(limit) if descending else query.limit_to_first(limit)
+            data = query.get()
+            if data:
+                readings = [{'id': k, **v} for k, v in data.items()]
+                return sorted(readings, key=lambda x: x.get('created_at', ''), reverse=descending)
+            return []
+        except:
+            return []
+    
+    def get_readings_page(
+        self,
+        sensor_id: str,
+        limit: int,
+        after: Optional[Tuple[str, str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        descending: bool = True
+    ) -> List[Dict]:
+        """
+        Page of readings by push key, which is generated from created_at,
+        with the time window mapped onto key bounds
+        """
+        try:
+            low = push_id_bound(start) if start is not None else None
+            high = push_id_bound(end, upper=True) if end is not None else None
+            if after is not None:
+                if descending:
+                    high = after[1]
+                else:
+                    low = after[1]
+            return self._get_key_page(f'readings/{sensor_id}', limit, low, high, after, descending)
+        except Exception as e:
+            print(f"Error getting readings page: {e}")
+            return []
+    
+    def _get_key_page(
+        self,
+        path: str,
+        limit: int,
+        low: Optional[str],
+        high: Optional[str],
+        after: Optional[Tuple[str, str]],
+        descending: bool
+    ) -> List[Dict]:
+        """limit children of path between keys low and high, skipping the (inclusive) cursor key"""
+        query = self.db.reference(path).order_by_key()
+        if low is not None:
+            query = query.start_at(low)
+        if high is not None:
+            query = query.end_at(high)
+        # One extra child because the cursor key itself is included by start_at/end_at
+        fetch = limit + 1 if after is not None else limit
+        data = (query.limit_to_last(fetch) if descending else query.limit_to_first(fetch)).get() or {}
+        records = [{'id': k, **v} for k, v in data.items() if after is None or k != after[1]]
+        records.sort(key=lambda x: x['id'], reverse=descending)
+        return records[:limit]
+    
+    def get_readings_ranges(
+        self,
+        sensor_ids: List[str],
+        start: datetime,
+        end: Optional[datetime] = None
+    ) -> Dict[str, List[Dict]]:
+        """Readings of many sensors, fetched with concurrent per-sensor range queries"""
+        if not sensor_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(16, len(sensor_ids))) as pool:
+            windows = pool.map(lambda sensor_id: self.get_readings_range(sensor_id, start, end), sensor_ids)
+            return dict(zip(sensor_ids, windows))
+
+    def update_reading(self, sensor_id: str, reading_id: str, data: Dict[str, Any]):
+        """Update fields of a stored reading"""
+        try:
+            ref = self.db.reference(f'readings/{sensor_id}/{reading_id}')
+            ref.update(data)
+        except Exception as e:
+            print(f"Error updating reading: {e}")
+    
+    def update_readings(self, sensor_id: str, updates: Dict[str, Dict[str, Any]]):
+        """Update several readings with one multi-path update"""
+        try:
+            paths = {
+                f'readings/{sensor_id}/{reading_id}/{field}': value
+                for reading_id, data in updates.items()
+                for field, value in data.items()
+            }
+            if paths:
+                self.db.reference().update(paths)
+        except Exception as e:
+            print(f"Error updating readings: {e}")
+    
+    def delete_readings(self, sensor_id: str, reading_ids: List[str]):
+        """Delete readings with one multi-path update"""
+        try:
+            if reading_ids:
+                self.db.reference().update({f'readings/{sensor_id}/{reading_id}': None for reading_id in reading_ids})
+        except Exception as e:
+            print(f"Error deleting readings: {e}")
+    
     # Alert operations
+    @staticmethod
+    def _alert_index_paths(alert_id: str, alert_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Secondary index entries for an alert, valued by created_at:
+        alert_index/by_sensor/{sensor_id}/{alert_id} and alert_index/unacknowledged/{alert_id}
+        """
+        paths = {f"alert_index/by_sensor/{alert_data.get('sensor_id')}/{alert_id}": alert_data['created_at']}
+        if not alert_data.get('is_acknowledged', False):
+            paths[f'alert_index/unacknowledged/{alert_id}'] = alert_data['created_at']
+        return paths
+    
     def save_alert(self, alert_data: Dict[str, Any]) -> str:
         """Save alert"""
+        return self.save_alerts([alert_data])[0]
+    
+    def save_alerts(self, alerts: List[Dict[str, Any]]) -> List[str]:
+        """Save many alerts and their index entries with one multi-path update"""
+        now = datetime.now().isoformat()
+        keys = [generate_push_id() for _ in alerts]
         try:
-            ref = self.db.reference('alerts').push()
-            alert_data['created_at'] = datetime.now().isoformat()
-            ref.set(alert_data)
-            return ref.key
-        except:
-            import uuid
-            return str(uuid.uuid4())
+            paths = {}
+            for key, alert_data in zip(keys, alerts):
+                alert_data['created_at'] = now
+                paths[f'alerts/{key}'] = alert_data
+                paths.update(self._alert_index_paths(key, alert_data))
+            if paths:
+                self.db.reference().update(paths)
+        except Exception as e:
+            print(f"Error saving alerts: {e}")
+        return keys
+    
+    def update_alerts(self, updates: Dict[str, Dict[str, Any]]):
+        """Update several alerts with one multi-path update"""
+        try:
+            paths = {
+                f'alerts/{alert_id}/{field}': value
+                for alert_id, data in updates.items()
+                for field, value in data.items()
+            }
+            if paths:
+                self.db.reference().update(paths)
+        except Exception as e:
+            print(f"Error updating alerts: {e}")
+            raise  # the write-behind buffer keeps the updates for its next flush
     
     def get_alerts(self, limit: int = 50) -> List[Dict]:
         """Get recent alerts"""
         try:
+            # Requires ".indexOn": "created_at" on alerts
             ref = self.db.reference('alerts')
-            data = ref.get()
+            data = ref.order_by_child('created_at').limit_to_last(limit).get()
             if data:
                 alerts = [{'id': k, **v} for k, v in data.items()]
-                return sorted(alerts, key=lambda x: x.get('created_at', ''), reverse=True)[:limit]
+                return sorted(alerts, key=lambda x: x.get('created_at', ''), reverse=True)
             return []
         except:
             return []
     
-    def acknowledge_alert(self, alert_id: str):
-        """Mark alert as acknowledged"""
+    def _get_indexed_alerts(self, index_path: str, limit: int) -> List[Dict]:
+        """Newest `limit` alerts listed under an alert_index node, fetched concurrently"""
+        # Requires ".indexOn": ".value" on the alert_index nodes
+        entries = self.db.reference(index_path).order_by_value().limit_to_last(limit).get() or {}
+        if not entries:
+            return []
+        with ThreadPoolExecutor(max_workers=min(16, len(entries))) as pool:
+            records = pool.map(lambda alert_id: self.db.reference(f'alerts/{alert_id}').get(), list(entries))
+            alerts = [{'id': alert_id, **record} for alert_id, record in zip(entries, records) if record]
+        return sorted(alerts, key=lambda x: (x.get('created_at', ''), x['id']), reverse=True)
+    
+    def get_alerts_page(self, limit: int, after: Optional[Tuple[str, str]] = None) -> List[Dict]:
+        """Page of alerts by push key (keys are generated when the alert is saved)"""
+        try:
+            high = after[1] if after is not None else None
+            return self._get_key_page('alerts', limit, None, high, after, True)
+        except Exception as e:
+            print(f"Error getting alerts page: {e}")
+            return []
+    
+    def get_alerts_by_sensor(self, sensor_id: str, limit: int = 50) -> List[Dict]:
+        """Get a sensor's recent alerts through alert_index/by_sensor"""
+        try:
+            return self._get_indexed_alerts(f'alert_index/by_sensor/{sensor_id}', limit)
+        except Exception as e:
+            print(f"Error getting sensor alerts: {e}")
+            return []
+    
+    def get_unacknowledged_alerts(self, limit: int = 50) -> List[Dict]:
+        """Get recent unacknowledged alerts through alert_index/unacknowledged"""
+        try:
+            return self._get_indexed_alerts('alert_index/unacknowledged', limit)
+        except Exception as e:
+            print(f"Error getting unacknowledged alerts: {e}")
+            return []
+    
+    def rebuild_alert_index(self):
+        """Rewrite alert_index from the stored alerts (backfill for alerts saved before it existed)"""
+        alerts = self.db.reference('alerts').get() or {}
+        paths = {}
+        for alert_id, alert_data in alerts.items():
+            paths.update(self._alert_index_paths(alert_id, alert_data))
+        self.db.reference('alert_index').delete()
+        if paths:
+            self.db.reference().update(paths)
+    
+    def get_open_alerts(self) -> List[Dict]:
+        """Alerts whose episode is still open"""
         try:
-            ref = self.db.reference(f'alerts/{alert_id}')
-            ref.update({
+            # Requires ".indexOn": "status" on alerts
+            data = self.db.reference('alerts').order_by_child('status').equal_to('open').get()
+            return [{'id': k, **v} for k, v in (data or {}).items()]
+        except Exception as e:
+            print(f"Error getting open alerts: {e}")
+            return []
+    
+    def acknowledge_alert(self, alert_id: str) -> Optional[Dict]:
+        """Mark alert as acknowledged"""
+        previous = {}
+        
+        def acknowledge(current):
+            previous.clear()
+            if not current or current.get('is_acknowledged', False):
+                return current
+            previous.update(current)
+            return {
+                **current,
                 'is_acknowledged': True,
                 'acknowledged_at': datetime.now().isoformat()
-            })
+            }
+        
+        try:
+            self.db.reference(f'alerts/{alert_id}').transaction(acknowledge)
+            if previous:
+                self.db.reference(f'alert_index/unacknowledged/{alert_id}').delete()
+            return {'id': alert_id, **previous} if previous else None
         except Exception as e:
             print(f"Error acknowledging alert: {e}")
+            return None
+    
+    # Statistics buckets
+    def merge_stat_buckets(self, deltas: Dict[Tuple[str, int, str], Dict[str, Any]]):
+        """Merge aggregate deltas, one transaction per dirty bucket"""
+        for (sensor_id, resolution, bucket), delta in deltas.items():
+            try:
+                ref = self.db.reference(f'stats/{sensor_id}/{resolution}/{bucket}')
+                ref.transaction(lambda current, delta=delta: merge_aggregates(current, delta))
+            except Exception as e:
+                print(f"Error merging stats bucket: {e}")
+    
+    def get_stat_buckets(
+        self,
+        sensor_id: str,
+        resolution: int,
+        start_bucket: str,
+        end_bucket: str
+    ) -> List[Dict]:
+        """Get buckets within a range using an ordered-key query"""
+        try:
+            ref = self.db.reference(f'stats/{sensor_id}/{resolution}')
+            data = ref.order_by_key().start_at(start_bucket).end_at(end_bucket).get()
+            if data:
+                return [{'bucket': k, **v} for k, v in sorted(data.items())]
+            return []
+        except:
+            return []
+    
+    def delete_stat_buckets(self, sensor_id: str):
+        """Remove every statistics bucket of a sensor"""
+        try:
+            self.db.reference(f'stats/{sensor_id}').delete()
+        except Exception as e:
+            print(f"Error deleting stats buckets: {e}")
+    
+    # Counters
+    def increment_counters(self, deltas: Dict[str, Dict[str, int]]):
+        """Add deltas with server-side increments in one multi-path update"""
+        try:
+            paths = {
+                f'counters/{group}/{name}': {'.sv': {'increment': delta}}
+                for group, counters in deltas.items()
+                for name, delta in counters.items()
+            }
+            if paths:
+                self.db.reference().update(paths)
+        except Exception as e:
+            print(f"Error incrementing counters: {e}")
+            raise  # the write-behind buffer keeps the deltas for its next flush
+    
+    def set_counters(self, values: Dict[str, Dict[str, int]]):
+        """Overwrite counters in one multi-path update"""
+        try:
+            paths = {
+                f'counters/{group}/{name}': value
+                for group, counters in values.items()
+                for name, value in counters.items()
+            }
+            if paths:
+                self.db.reference().update(paths)
+        except Exception as e:
+            print(f"Error setting counters: {e}")
+    
+    def get_counters(self, group: str) -> Dict[str, int]:
+        """Get every counter of a group"""
+        try:
+            data = self.db.reference(f'counters/{group}').get()
+            if isinstance(data, dict):
+                return {k: v for k, v in data.items() if isinstance(v, int)}
+            return {}
+        except:
+            return {}
+
+
+if __name__ == "__main__":
+    # Backfill alert indexes: python -m services.firebase_service
+    FirebaseService().rebuild_alert_index()
@@ -0,0 +1,384 @@
+"""
+Hot tier: each sensor's most recent readings (the last max_readings, no older
+than max_hours) kept in compact typed arrays instead of per-row dicts.
+Saves append to it, startup warms it from storage, and recent-window queries
+read from it when it covers the whole window. Sensors are evicted least
+recently used first when the tier exceeds its memory budget.
+It only sees readings saved by this process.
+"""
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import os
+import threading
+import numpy as np
+
+# Timestamps are microseconds since a naive epoch, matching the naive
+# ISO strings in created_at exactly in both directions
+NAIVE_EPOCH = datetime(1970, 1, 1)
+
+ANOMALY_FLAG = 1
+QUALITY_SHIFT = 1
+QUALITY_CODES = ('good', 'fair', 'poor')
+
+FLOAT_FIELDS = ('ph_level', 'tds_level', 'turbidity', 'temperature', 'anomaly_score')
+COLUMNS = {
+    'micros': np.int64,
+    # float64, so readings come back exactly as they were stored
+    **{field: np.float64 for field in FLOAT_FIELDS},
+    'flags': np.uint8,
+    'id': object,
+}
+# Bytes per slot: the typed columns plus an estimate for the id string it points to
+ID_BYTES = 80
+SLOT_BYTES = sum(np.dtype(dtype).itemsize for dtype in COLUMNS.values()) + ID_BYTES
+MIN_SLOTS = 64
+
+def to_micros(value: Any) -> Optional[int]:
+    """Microseconds for a naive datetime or ISO string; None for anything else"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime) or value.tzinfo is not None:
+        return None
+    return (value - NAIVE_EPOCH) // timedelta(microseconds=1)
+
+def _isoformat(micros: np.ndarray) -> List[str]:
+    """datetime.isoformat() of each timestamp, vectorized"""
+    text = np.datetime_as_string(micros.astype('datetime64[us]'), unit='us')
+    whole = micros % 1_000_000 == 0
+    if whole.any():
+        # isoformat drops a zero microsecond part
+        text = text.astype(object)
+        text[whole] = [value[:-7] for value in text[whole]]
+    return text.tolist()
+
+def to_columns(readings: List[Dict[str, Any]]) -> Optional[Dict[str, np.ndarray]]:
+    """Columns of readings sorted by time, or None if a timestamp can't be stored"""
+    n = len(readings)
+    micros = [to_micros(r.get('created_at')) for r in readings]
+    if None in micros:
+        return None
+    columns = {'micros': np.array(micros, dtype=np.int64)}
+    for field in FLOAT_FIELDS:
+        columns[field] = np.fromiter(
+            (np.nan if r.get(field) is None else r[field] for r in readings),
+            dtype=np.float64,
+            count=n
+        )
+    columns['flags'] = np.fromiter(
+        (
+            (ANOMALY_FLAG if r.get('is_anomaly') else 0)
+            | (QUALITY_CODES.index(r['quality_status']) << QUALITY_SHIFT
+               if r.get('quality_status') in QUALITY_CODES else 0)
+            for r in readings
+        ),
+        dtype=np.uint8,
+        count=n
+    )
+    ids = np.empty(n, dtype=object)
+    ids[:] = [r.get('id') for r in readings]
+    columns['id'] = ids
+    order = np.argsort(columns['micros'], kind='stable')
+    return {name: column[order] for name, column in columns.items()}
+
+def _floats(values: np.ndarray) -> List[Optional[float]]:
+    """Values as Python floats, NaN (a missing value) as None"""
+    result = values.astype(object)
+    result[np.isnan(values)] = None
+    return result.tolist()
+
+class ReadingWindow:
+    """
+    Array views over part of one sensor's hot readings, in query order.
+    Reading dicts are only built for the rows that are accessed.
+    """
+
+    def __init__(self, sensor_id: str, columns: Dict[str, np.ndarray]):
+        self.sensor_id = sensor_id
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns['micros'])
+
+    def _build(self, rows: slice) -> List[Dict[str, Any]]:
+        columns = {name: column[rows] for name, column in self.columns.items()}
+        floats = {field: _floats(columns[field]) for field in FLOAT_FIELDS}
+        flags = columns['flags'].tolist()
+        created_at = _isoformat(columns['micros'])
+        return [
+            {
+                'id': reading_id,
+                'sensor_id': self.sensor_id,
+                **{field: floats[field][i] for field in FLOAT_FIELDS},
+                'is_anomaly': bool(flags[i] & ANOMALY_FLAG),
+                'quality_status': QUALITY_CODES[(flags[i] >> QUALITY_SHIFT) % len(QUALITY_CODES)],
+                'created_at': created_at[i],
+            }
+            for i, reading_id in enumerate(columns['id'].tolist())
+        ]
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        index = range(len(self))[index]
+        return self._build(slice(index, index + 1))[0]
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Every row as a reading dict, as storage would return it"""
+        return self._build(slice(None))
+
+    def feature_matrix(self) -> np.ndarray:
+        """(n, 3) float64 pH, TDS and turbidity, like utils.features.extract_features"""
+        return np.column_stack([
+            np.nan_to_num(self.columns[field], nan=default)
+            for field, default in (('ph_level', 7.0), ('tds_level', 0.0), ('turbidity', 0.0))
+        ]).astype(np.float64)
+
+class SensorRing:
+    """
+    One sensor's readings in time order in columns[lo:hi]. New readings go
+    at hi; when the arrays are full the newest readings are copied to the
+    front (growing the arrays up to max_readings plus slack), so appends
+    cost amortized O(1). Every stored reading at or after complete_from
+    is present.
+    """
+
+    def __init__(self, max_readings: int, complete_from: int):
+        self.max_readings = max_readings
+        self.complete_from = complete_from
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.lo = self.hi = 0
+
+    def __len__(self) -> int:
+        return self.hi - self.lo
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.columns['micros']) * SLOT_BYTES
+
+    def view(self, name: str) -> np.ndarray:
+        return self.columns[name][self.lo:self.hi]
+
+    def insert(self, batch: Dict[str, np.ndarray], cutoff: int):
+        """
+        Add time-sorted columns, skipping readings already held, and drop
+        readings older than cutoff or beyond max_readings
+        """
+        if len(batch['micros']) and len(self) and batch['micros'][0] <= self.columns['micros'][self.hi - 1]:
+            # Only readings at or after the batch's oldest can be duplicates
+            overlap = int(np.searchsorted(self.view('micros'), batch['micros'][0]))
+            held = set(self.view('id')[overlap:].tolist())
+            keep = np.fromiter((reading_id not in held for reading_id in batch['id']), dtype=bool, count=len(batch['id']))
+            batch = {name: column[keep] for name, column in batch.items()}
+        n = len(batch['micros'])
+        if not n:
+            self._trim(cutoff)
+            return
+        in_order = not len(self) or batch['micros'][0] >= self.columns['micros'][self.hi - 1]
+        if in_order and self.hi + n <= len(self.columns['micros']):
+            for name, column in batch.items():
+                self.columns[name][self.hi:self.hi + n] = column
+            self.hi += n
+        else:
+            merged = {name: np.concatenate([self.view(name), batch[name]]) for name in COLUMNS}
+            if not in_order:
+                order = np.argsort(merged['micros'], kind='stable')
+                merged = {name: column[order] for name, column in merged.items()}
+            self._replace(merged)
+        self._trim(cutoff)
+
+    def _replace(self, merged: Dict[str, np.ndarray]):
+        size = len(merged['micros'])
+        if size > self.max_readings:
+            self.complete_from = max(self.complete_from, int(merged['micros'][size - self.max_readings - 1]) + 1)
+            merged = {name: column[size - self.max_readings:] for name, column in merged.items()}
+            size = self.max_readings
+        slots = max(size, min(max(MIN_SLOTS, 2 * len(self.columns['micros'])), self.max_readings + self.max_readings // 4))
+        self.columns = {name: np.empty(slots, dtype=dtype) for name, dtype in COLUMNS.items()}
+        for name, column in merged.items():
+            self.columns[name][:size] = column
+        self.lo, self.hi = 0, size
+
+    def _trim(self, cutoff: int):
+        if len(self) > self.max_readings:
+            self.lo = self.hi - self.max_readings
+            self.complete_from = max(self.complete_from, int(self.columns['micros'][self.lo - 1]) + 1)
+        self.lo += int(np.searchsorted(self.view('micros'), cutoff))
+        self.complete_from = max(self.complete_from, cutoff)
+
+    def window(
+        self,
+        start: int,
+        end: Optional[int],
+        limit: Optional[int],
+        descending: bool
+    ) -> Dict[str, np.ndarray]:
+        micros = self.view('micros')
+        lo = int(np.searchsorted(micros, start))
+        hi = len(micros) if end is None else int(np.searchsorted(micros, end, side='right'))
+        hi = max(lo, hi)
+        if limit is not None:
+            lo, hi = (max(lo, hi - limit), hi) if descending else (lo, min(hi, lo + limit))
+        step = -1 if descending else 1
+        return {name: self.view(name)[lo:hi][::step] for name in COLUMNS}
+
+class HotTier:
+    """Per-sensor rings with a shared memory budget; a disabled tier holds nothing and always misses"""
+
+    def __init__(
+        self,
+        max_readings: int = 10000,
+        max_hours: float = 24,
+        max_bytes: int = 64 * 1024 * 1024,
+        enabled: bool = True
+    ):
+        self.enabled = enabled
+        self.max_readings = max_readings
+        self.max_hours = max_hours
+        self.max_bytes = max_bytes
+        self._rings: 'OrderedDict[str, SensorRing]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _cutoff(self) -> int:
+        return to_micros(datetime.now() - timedelta(hours=self.max_hours))
+
+    def _store(self, sensor_id: str, apply: Callable[[SensorRing], None], complete_from: int):
+        """Run apply on the sensor's ring (created if missing) and evict over budget; lock held"""
+        ring = self._rings.pop(sensor_id, None)
+        if ring is None:
+            ring = SensorRing(self.max_readings, complete_from)
+        else:
+            self._bytes -= ring.nbytes
+        apply(ring)
+        self._rings[sensor_id] = ring
+        self._bytes += ring.nbytes
+        while len(self._rings) > 1 and self._bytes > self.max_bytes:
+            _, evicted = self._rings.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._counts['evictions'] += 1
+
+    def _discard(self, sensor_id: str):
+        ring = self._rings.pop(sensor_id, None)
+        if ring is not None:
+            self._bytes -= ring.nbytes
+
+    def append(self, readings: List[Dict[str, Any]]):
+        """Add newly saved readings (with their ids) of any sensors"""
+        if not self.enabled:
+            return
+        by_sensor: Dict[str, List[Dict[str, Any]]] = {}
+        for reading in readings:
+            by_sensor.setdefault(reading['sensor_id'], []).append(reading)
+        cutoff = self._cutoff()
+        for sensor_id, sensor_readings in by_sensor.items():
+            batch = to_columns(sensor_readings)
+            with self._lock:
+                if batch is None:
+                    # Not representable (e.g. a timezone-aware timestamp): leave the sensor to storage
+                    self._discard(sensor_id)
+                    continue
+                # A sensor first seen here is only known to be complete from now on
+                self._store(sensor_id, lambda ring: ring.insert(batch, cutoff), to_micros(datetime.now()))
+
+    def track(self, sensor_id: str):
+        """Start an empty, complete ring for a sensor that has no readings yet"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._store(sensor_id, lambda ring: None, -2 ** 63)
+
+    def load(self, sensor_id: str, readings: List[Dict[str, Any]], complete_from: datetime):
+        """
+        Merge readings loaded from storage that include every reading since
+        complete_from. Readings appended meanwhile are kept, duplicates dropped.
+        """
+        if not self.enabled:
+            return
+        batch = to_columns(readings)
+        complete_from = to_micros(complete_from)
+        if batch is None or complete_from is None:
+            return
+        cutoff = self._cutoff()
+
+        def merge(ring: SensorRing):
+            ring.complete_from = min(ring.complete_from, complete_from)
+            ring.insert(batch, cutoff)
+
+        with self._lock:
+            self._store(sensor_id, merge, complete_from)
+
+    def window(
+        self,
+        sensor_id: str,
+        start: datetime,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        descending: bool = True
+    ) -> Optional[ReadingWindow]:
+        """Readings with start <= created_at <= end, or None when the tier doesn't cover start"""
+        if not self.enabled:
+            return None
+        start_micros = to_micros(start)
+        end_micros = None if end is None else to_micros(end)
+        with self._lock:
+            ring = self._rings.get(sensor_id)
+            if ring is None or start_micros is None or start_micros < ring.complete_from or (
+                end is not None and end_micros is None
+            ):
+                self._counts['misses'] += 1
+                return None
+            self._rings.move_to_end(sensor_id)
+            self._counts['hits'] += 1
+            return ReadingWindow(sensor_id, ring.window(start_micros, end_micros, limit, descending))
+
+    def latest(self, sensor_id: str, limit: int) -> Optional[ReadingWindow]:
+        """Newest limit readings, or None when the tier can't vouch for that many"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            ring = self._rings.get(sensor_id)
+            columns = None if ring is None else ring.window(ring.complete_from, None, limit, True)
+            if columns is None or (len(columns['micros']) < limit and ring.complete_from > -2 ** 63):
+                self._counts['misses'] += 1
+                return None
+            self._rings.move_to_end(sensor_id)
+            self._counts['hits'] += 1
+            return ReadingWindow(sensor_id, columns)
+
+    def update_flags(self, sensor_id: str, updates: Dict[str, Dict[str, Any]]):
+        """Apply anomaly flag and score updates written to storage"""
+        with self._lock:
+            ring = self._rings.get(sensor_id)
+            if ring is None:
+                return
+            flags, scores = ring.view('flags'), ring.view('anomaly_score')
+            for index, reading_id in enumerate(ring.view('id').tolist()):
+                fields = updates.get(reading_id)
+                if fields is None:
+                    continue
+                if 'is_anomaly' in fields:
+                    flags[index] = (flags[index] | ANOMALY_FLAG) if fields['is_anomaly'] else (flags[index] & ~ANOMALY_FLAG)
+                if 'anomaly_score' in fields:
+                    scores[index] = fields['anomaly_score']
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Sensors and readings held, memory used and hit counts"""
+        with self._lock:
+            return {
+                'sensors': len(self._rings),
+                'readings': sum(len(ring) for ring in self._rings.values()),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                **self._counts,
+            }
+
+
+hot_tier = HotTier(
+    max_readings=int(os.getenv('HOT_TIER_MAX_READINGS', 10000)),
+    max_hours=float(os.getenv('HOT_TIER_HOURS', 24)),
+    max_bytes=int(os.getenv('HOT_TIER_MAX_MB', 64)) * 1024 * 1024,
+    enabled=os.getenv('HOT_TIER_ENABLED', 'True').lower() == 'true'
+)
@@ -0,0 +1,79 @@
+"""
+Live updates for the stream endpoint: ingest publishes readings and alerts,
+and a ticker publishes fresh statistics for sensors that changed
+"""
+from typing import Any, Dict, List, Set
+from datetime import datetime, timedelta
+import asyncio
+import os
+import threading
+from services.event_bus import event_bus
+from services.stats_service import StatsService
+from services.counter_service import CounterService
+from utils.concurrency import run_io
+
+STATS_INTERVAL = float(os.getenv('STREAM_STATS_INTERVAL_SECONDS', 5))
+STATS_HOURS = 24
+
+_dirty: Set[str] = set()
+_dirty_lock = threading.Lock()
+
+class LiveService:
+    """Publish ingest events to live subscribers"""
+
+    @staticmethod
+    def publish_readings(readings: List[Dict[str, Any]]):
+        """One readings event per sensor, and mark the sensors' statistics stale"""
+        by_sensor: Dict[str, List[Dict[str, Any]]] = {}
+        for reading in readings:
+            by_sensor.setdefault(reading['sensor_id'], []).append(reading)
+        with _dirty_lock:
+            _dirty.update(by_sensor)
+        for sensor_id, sensor_readings in by_sensor.items():
+            event_bus.publish('readings', sensor_id, sensor_readings)
+
+    @staticmethod
+    def publish_alerts(alerts: List[Dict[str, Any]]):
+        """Opened, escalated and cleared alerts, one event per sensor"""
+        by_sensor: Dict[str, List[Dict[str, Any]]] = {}
+        for alert in alerts:
+            by_sensor.setdefault(alert.get('sensor_id'), []).append(alert)
+        for sensor_id, sensor_alerts in by_sensor.items():
+            event_bus.publish('alerts', sensor_id, sensor_alerts)
+
+    @staticmethod
+    def publish_sensor(sensor: Dict[str, Any]):
+        """A created or updated sensor, sent to every stream so sensor lists see new sensors"""
+        event_bus.publish('sensor', None, sensor)
+
+    @staticmethod
+    def _collect_stats(sensor_ids: Set[str]) -> Dict[str, Any]:
+        start = datetime.now() - timedelta(hours=STATS_HOURS)
+        return {
+            sensor_id: StatsService.get_statistics(sensor_id, start)
+            for sensor_id in sensor_ids
+            if event_bus.has_subscribers(sensor_id)
+        }
+
+    @staticmethod
+    async def run_stats_ticker(interval: float = STATS_INTERVAL):
+        """
+        Every interval, publish the last day's statistics of each sensor that
+        ingested readings, plus the system counters. The cost depends on the
+        number of active sensors, not on the number of open dashboards.
+        """
+        global _dirty
+        while True:
+            await asyncio.sleep(interval)
+            with _dirty_lock:
+                dirty, _dirty = _dirty, set()
+            if not dirty:
+                continue
+            try:
+                stats = await run_io(LiveService._collect_stats, dirty)
+                for sensor_id, sensor_stats in stats.items():
+                    event_bus.publish('stats', sensor_id, sensor_stats)
+                if event_bus.has_subscribers():
+                    event_bus.publish('system', None, await run_io(CounterService.get_counts))
+            except Exception as e:
+                print(f"Error publishing live statistics: {e}")
@@ -0,0 +1,142 @@
+"""
+Cache of fitted anomaly models per sensor and training window
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+class ModelEntry:
+    """A fitted model plus the metadata used to decide when to retrain it"""
+
+    def __init__(self, model: Any, n_samples: int, window_start: str, window_end: str, scorer: Any = None):
+        self.model = model
+        self.scorer = scorer  # fast single-reading scorer used at ingest
+        self.n_samples = n_samples
+        self.window_start = window_start
+        self.window_end = window_end
+        self.trained_at = time.time()
+        self.new_readings = 0
+        self.size_bytes = len(pickle.dumps(model)) + getattr(scorer, 'nbytes', 0)
+
+    def describe(self) -> Dict[str, Any]:
+        """Metadata for API responses"""
+        return {
+            'n_samples': self.n_samples,
+            'window_start': self.window_start,
+            'window_end': self.window_end,
+            'trained_at': self.trained_at,
+            'age_seconds': round(time.time() - self.trained_at, 1),
+            'new_readings': self.new_readings,
+            'size_bytes': self.size_bytes,
+        }
+
+class ModelRegistry:
+    """
+    LRU cache of fitted models keyed by (sensor_id, window).
+    Models are retrained when max_age seconds have passed or at least
+    retrain_min_new readings arrived for the sensor since training.
+    """
+
+    def __init__(
+        self,
+        max_models: int = 256,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age: float = 3600,
+        retrain_min_new: int = 500
+    ):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.retrain_min_new = retrain_min_new
+        self._entries: 'OrderedDict[Hashable, ModelEntry]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._train_locks: Dict[Hashable, threading.Lock] = {}
+
+    def get(self, key: Hashable) -> Optional[ModelEntry]:
+        """Cached entry, marked as recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, entry: ModelEntry):
+        """Cache an entry, evicting least recently used ones over budget"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size_bytes
+            self._entries[key] = entry
+            self._bytes += entry.size_bytes
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_models or self._bytes > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size_bytes
+
+    def is_fresh(self, entry: Optional[ModelEntry]) -> bool:
+        """Whether an entry can be used without retraining"""
+        return (
+            entry is not None
+            and time.time() - entry.trained_at < self.max_age
+            and entry.new_readings < self.retrain_min_new
+        )
+
+    def get_or_train(self, key: Hashable, train: Callable[[], Optional[ModelEntry]]) -> Optional[ModelEntry]:
+        """Fresh cached entry, or train one (only once per key at a time)"""
+        entry = self.get(key)
+        if self.is_fresh(entry):
+            return entry
+        with self._lock:
+            train_lock = self._train_locks.setdefault(key, threading.Lock())
+        with train_lock:
+            entry = self.get(key)
+            if self.is_fresh(entry):
+                return entry
+            entry = train()
+            if entry is not None:
+                self.put(key, entry)
+            return entry
+
+    def latest(self, sensor_id: str) -> Optional[ModelEntry]:
+        """Most recently trained model of a sensor, stale or not"""
+        with self._lock:
+            entries = [entry for key, entry in self._entries.items() if key[0] == sensor_id]
+        return max(entries, key=lambda entry: entry.trained_at) if entries else None
+
+    def note_readings(self, sensor_id: str, count: int = 1):
+        """Record new readings for every cached model of a sensor"""
+        with self._lock:
+            for key, entry in self._entries.items():
+                if key[0] == sensor_id:
+                    entry.new_readings += count
+
+    def invalidate(self, sensor_id: str):
+        """Drop every cached model of a sensor"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == sensor_id]:
+                self._bytes -= self._entries.pop(key).size_bytes
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Metadata of every cached model, most recently used last"""
+        with self._lock:
+            return [
+                {'sensor_id': key[0], 'window_hours': key[1], **entry.describe()}
+                for key, entry in self._entries.items()
+            ]
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+model_registry = ModelRegistry(
+    max_models=int(os.getenv('MODEL_CACHE_SIZE', 256)),
+    max_bytes=int(os.getenv('MODEL_CACHE_MAX_MB', 256)) * 1024 * 1024,
+    max_age=float(os.getenv('MODEL_MAX_AGE_SECONDS', 3600)),
+    retrain_min_new=int(os.getenv('MODEL_RETRAIN_MIN_NEW', 500))
+)
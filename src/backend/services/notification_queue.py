@@ -0,0 +1,276 @@
+"""
+Persistent notification queue delivered by per-channel worker threads.
+Alerts are enqueued in a local SQLite file as one job per (channel, recipient),
+so ingest only pays for that insert. Workers send due jobs with retry and
+exponential backoff, fold everything pending for one recipient into a single
+digest, and report delivered channels so alerts' notified_via can be updated.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    alert_id TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_error TEXT,
+    claimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (channel, status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS deliveries (
+    alert_id TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    delivered_at REAL NOT NULL,
+    PRIMARY KEY (alert_id, channel)
+);
+"""
+
+# A sender gets the recipient and the alerts for it (one, or several as a digest)
+Sender = Callable[[str, List[Dict[str, Any]]], None]
+
+class NotificationQueue:
+    """Durable job queue with a worker pool per channel"""
+
+    def __init__(
+        self,
+        path: str,
+        senders: Dict[str, Sender],
+        on_delivered: Optional[Callable[[Dict[str, List[str]]], None]] = None,
+        workers_per_channel: int = 2,
+        digest_seconds: float = 5.0,
+        digest_max: int = 50,
+        max_attempts: int = 5,
+        backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 300.0,
+        claim_timeout_seconds: float = 300.0
+    ):
+        self.path = path
+        self.senders = senders
+        self.on_delivered = on_delivered
+        self.workers_per_channel = workers_per_channel
+        self.digest_seconds = digest_seconds
+        self.digest_max = digest_max
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.claim_timeout_seconds = claim_timeout_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._wake = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._latencies: Dict[str, Deque[float]] = {channel: deque(maxlen=1000) for channel in senders}
+        self._counts: Dict[str, Dict[str, int]] = {
+            channel: {'delivered': 0, 'retried': 0, 'failed': 0, 'digests': 0} for channel in senders
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._conn is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                conn.row_factory = sqlite3.Row
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+                conn.executescript(SCHEMA)
+                if 'claimed_at' not in {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}:
+                    conn.execute('ALTER TABLE jobs ADD COLUMN claimed_at REAL')
+                self._conn = conn
+            return self._conn
+
+    @contextmanager
+    def _transaction(self, mode: str = ''):
+        conn = self._connection()
+        with self._lock:
+            conn.execute(f'BEGIN {mode}')
+            try:
+                yield conn
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        with self._lock:
+            if self._threads:
+                return
+            self._connection()
+            self._stop.clear()
+            for channel in self.senders:
+                for i in range(self.workers_per_channel):
+                    thread = threading.Thread(
+                        target=self._run,
+                        args=(channel,),
+                        name=f'notify-{channel}-{i}',
+                        daemon=True
+                    )
+                    thread.start()
+                    self._threads.append(thread)
+
+    def stop(self):
+        """Stop the workers; pending jobs stay in the queue file"""
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def enqueue(self, jobs: Iterable[Tuple[str, str, Dict[str, Any]]]):
+        """Persist (channel, recipient, alert) jobs in one transaction and wake the workers"""
+        now = time.time()
+        rows = [
+            (channel, recipient, alert.get('id'), json.dumps(alert, default=str), now + self.digest_seconds, now)
+            for channel, recipient, alert in jobs
+        ]
+        if not rows:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                'INSERT INTO jobs (channel, recipient, alert_id, payload, next_attempt_at, created_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+        self.start()
+        with self._wake:
+            self._wake.notify_all()
+
+    def _claim(self, channel: str) -> List[sqlite3.Row]:
+        """
+        Mark every due job of the first due recipient as sending and return them.
+        Claims older than claim_timeout_seconds belong to a worker that died and
+        are released first; live workers sharing the file keep theirs.
+        """
+        now = time.time()
+        with self._transaction('IMMEDIATE') as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'pending' WHERE channel = ? AND status = 'sending'"
+                ' AND (claimed_at IS NULL OR claimed_at < ?)',
+                (channel, now - self.claim_timeout_seconds)
+            )
+            first = conn.execute(
+                "SELECT recipient FROM jobs WHERE channel = ? AND status = 'pending'"
+                ' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT 1',
+                (channel, now)
+            ).fetchone()
+            if first is None:
+                return []
+            jobs = conn.execute(
+                "SELECT * FROM jobs WHERE channel = ? AND recipient = ? AND status = 'pending'"
+                ' AND next_attempt_at <= ? ORDER BY id LIMIT ?',
+                (channel, first['recipient'], now, self.digest_max)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'sending', claimed_at = ? WHERE id = ?",
+                [(now, job['id']) for job in jobs]
+            )
+        return jobs
+
+    def _next_due(self, channel: str) -> Optional[float]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT MIN(next_attempt_at) FROM jobs WHERE channel = ? AND status = 'pending'",
+                (channel,)
+            ).fetchone()
+        return row[0]
+
+    def _run(self, channel: str):
+        while not self._stop.is_set():
+            try:
+                jobs = self._claim(channel)
+                if jobs:
+                    self._deliver(channel, jobs)
+                    continue
+                next_due = self._next_due(channel)
+            except Exception as e:
+                print(f"Notification worker error ({channel}): {e}")
+                next_due = None
+            timeout = 1.0 if next_due is None else min(1.0, max(0.0, next_due - time.time()))
+            with self._wake:
+                self._wake.wait(timeout)
+
+    def _deliver(self, channel: str, jobs: List[sqlite3.Row]):
+        alerts = [json.loads(job['payload']) for job in jobs]
+        try:
+            self.senders[channel](jobs[0]['recipient'], alerts)
+        except Exception as e:
+            with self._transaction() as conn:
+                for job in jobs:
+                    attempts = job['attempts'] + 1
+                    if attempts >= self.max_attempts:
+                        conn.execute(
+                            "UPDATE jobs SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                            (attempts, str(e), job['id'])
+                        )
+                        self._counts[channel]['failed'] += 1
+                    else:
+                        delay = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (attempts - 1))
+                        conn.execute(
+                            "UPDATE jobs SET status = 'pending', attempts = ?, next_attempt_at = ?,"
+                            ' last_error = ? WHERE id = ?',
+                            (attempts, time.time() + delay, str(e), job['id'])
+                        )
+                        self._counts[channel]['retried'] += 1
+            print(f"Error sending {channel} notification to {jobs[0]['recipient']}: {e}")
+            return
+
+        now = time.time()
+        alert_ids = {job['alert_id'] for job in jobs if job['alert_id']}
+        with self._transaction() as conn:
+            conn.executemany('DELETE FROM jobs WHERE id = ?', [(job['id'],) for job in jobs])
+            conn.executemany(
+                'INSERT OR IGNORE INTO deliveries (alert_id, channel, delivered_at) VALUES (?, ?, ?)',
+                [(alert_id, channel, now) for alert_id in alert_ids]
+            )
+            channels = {}
+            for alert_id in alert_ids:
+                rows = conn.execute(
+                    'SELECT channel FROM deliveries WHERE alert_id = ? ORDER BY delivered_at', (alert_id,)
+                ).fetchall()
+                channels[alert_id] = [row['channel'] for row in rows]
+            self._counts[channel]['delivered'] += len(jobs)
+            if len(jobs) > 1:
+                self._counts[channel]['digests'] += 1
+            self._latencies[channel].extend(now - job['created_at'] for job in jobs)
+
+        if self.on_delivered is not None and channels:
+            self.on_delivered(channels)
+
+    def prune(self, older_than_seconds: float = 7 * 86400):
+        """Forget delivery records and failed jobs older than the cutoff"""
+        cutoff = time.time() - older_than_seconds
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM deliveries WHERE delivered_at < ?', (cutoff,))
+            conn.execute("DELETE FROM jobs WHERE status = 'failed' AND created_at < ?", (cutoff,))
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Per-channel delivery counts, latency (enqueue to delivery) and queue depth"""
+        with self._lock:
+            depth = {channel: {} for channel in self.senders}
+            if self._conn is not None:
+                for row in self._conn.execute('SELECT channel, status, COUNT(*) AS n FROM jobs GROUP BY channel, status'):
+                    depth.setdefault(row['channel'], {})[row['status']] = row['n']
+            metrics = {}
+            for channel in self.senders:
+                latencies = sorted(self._latencies[channel])
+                metrics[channel] = {
+                    **self._counts[channel],
+                    'queued': depth[channel],
+                    'latency_ms': {
+                        'avg': round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+                        'p95': round(latencies[int((len(latencies) - 1) * 0.95)] * 1000, 1) if latencies else None,
+                        'max': round(latencies[-1] * 1000, 1) if latencies else None,
+                    }
+                }
+        return metrics
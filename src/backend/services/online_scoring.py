@@ -0,0 +1,95 @@
+"""
+Ingest-time anomaly scoring.
+New readings are scored with the sensor's cached Isolation Forest, or with a
+z-score against the sensor's recent rollup statistics when no model has been
+trained yet, so anomaly flags and alerts are produced as readings arrive.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta
+import os
+import threading
+import time
+import numpy as np
+from services.model_registry import model_registry
+from services.stats_service import StatsService
+from utils.aggregates import STAT_FIELDS, summarize
+from utils.features import extract_features
+
+ENABLED = os.getenv('ANOMALY_DETECTION_ENABLED', 'True').lower() == 'true'
+Z_THRESHOLD = float(os.getenv('ONLINE_Z_THRESHOLD', 4.0))
+BASELINE_TTL = float(os.getenv('ONLINE_BASELINE_TTL_SECONDS', 300))
+BASELINE_MISS_TTL = float(os.getenv('ONLINE_BASELINE_MISS_TTL_SECONDS', 30))
+BASELINE_HOURS = 24
+MIN_BASELINE_READINGS = 30
+
+STAT_KEYS = {
+    'ph_level': ('avg_ph', 'std_ph'),
+    'tds_level': ('avg_tds', 'std_tds'),
+    'turbidity': ('avg_turbidity', 'std_turbidity'),
+}
+
+_baselines: Dict[str, Tuple[float, Optional[Tuple[np.ndarray, np.ndarray]]]] = {}
+_lock = threading.Lock()
+
+class OnlineScoringService:
+    """Score readings before they are stored"""
+
+    @staticmethod
+    def get_baseline(sensor_id: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        (mean, std) per field over the sensor's last day, cached for BASELINE_TTL seconds.
+        Too little history is cached as None for BASELINE_MISS_TTL seconds, so a new
+        sensor gets a baseline soon without a statistics query on every ingest.
+        """
+        now = time.time()
+        with _lock:
+            cached = _baselines.get(sensor_id)
+        if cached is not None and now - cached[0] < (BASELINE_TTL if cached[1] is not None else BASELINE_MISS_TTL):
+            return cached[1]
+
+        stats = StatsService.get_statistics(sensor_id, datetime.now() - timedelta(hours=BASELINE_HOURS))
+        baseline = None
+        if stats['reading_count'] >= MIN_BASELINE_READINGS:
+            baseline = (
+                np.array([stats[STAT_KEYS[field][0]] for field in STAT_FIELDS]),
+                np.array([stats[STAT_KEYS[field][1]] for field in STAT_FIELDS])
+            )
+        with _lock:
+            _baselines[sensor_id] = (now, baseline)
+        return baseline
+
+    @staticmethod
+    def _zscore(X: np.ndarray, baseline: Tuple[np.ndarray, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        mean, std = baseline
+        z = np.divide(np.abs(X - mean), std, out=np.zeros_like(X), where=std > 0)
+        max_z = z.max(axis=1)
+        # Map onto the Isolation Forest score range: the threshold lands on -0.5
+        scores = -np.minimum(1.0, 0.5 * max_z / Z_THRESHOLD)
+        return np.where(max_z > Z_THRESHOLD, -1, 1), scores
+
+    @staticmethod
+    def score_readings(readings: List[Dict[str, Any]]):
+        """Set is_anomaly and anomaly_score on new readings in place"""
+        if not ENABLED or not readings:
+            return
+        by_sensor: Dict[str, List[Dict[str, Any]]] = {}
+        for reading in readings:
+            by_sensor.setdefault(reading['sensor_id'], []).append(reading)
+
+        for sensor_id, sensor_readings in by_sensor.items():
+            try:
+                X = extract_features(sensor_readings).X
+                entry = model_registry.latest(sensor_id)
+                if entry is not None and entry.scorer is not None:
+                    predictions, scores = entry.scorer.predict(X)
+                else:
+                    baseline = OnlineScoringService.get_baseline(sensor_id)
+                    if baseline is None:
+                        continue
+                    predictions, scores = OnlineScoringService._zscore(X, baseline)
+
+                for reading, pred, score in zip(sensor_readings, predictions, scores):
+                    reading['is_anomaly'] = bool(pred == -1)
+                    reading['anomaly_score'] = float(score)
+            except Exception as e:
+                print(f"Error scoring readings for {sensor_id}: {e}")
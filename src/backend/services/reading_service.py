@@ -1,22 +1,32 @@
 """
 Reading management and data analysis service
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from models import Reading, ReadingCreate
-from services.firebase_service import FirebaseService
+from services.storage_service import get_storage
 from services.sensor_service import SensorService
+from services.stats_service import StatsService
+from services.counter_service import CounterService
+from services.model_registry import model_registry
+from services.online_scoring import OnlineScoringService
+from services.live_service import LiveService
+from services.hot_tier import hot_tier
+from services.cold_storage import cold_storage, merge_cold
+from collections import Counter
 from datetime import datetime, timedelta
+from utils import get_date_range, to_local_naive
+from utils.pagination import paginate
 import uuid
 
-firebase_service = FirebaseService()
+storage = get_storage()
 
 class ReadingService:
     """Manage sensor readings"""
     
     @staticmethod
-    def save_reading(reading_data: ReadingCreate) -> Dict[str, Any]:
-        """Save new reading and analyze quality"""
-        reading = {
+    def _build_reading(reading_data: ReadingCreate) -> Dict[str, Any]:
+        """Build the stored reading record"""
+        return {
             'sensor_id': reading_data.sensor_id,
             'ph_level': reading_data.ph_level,
             'tds_level': reading_data.tds_level,
@@ -29,17 +39,53 @@ class ReadingService:
                 reading_data.tds_level,
                 reading_data.turbidity
             ),
-            'created_at': (reading_data.timestamp or datetime.now()).isoformat()
+            # Device timestamps may carry an offset; every stored time is naive local time
+            'created_at': (to_local_naive(reading_data.timestamp) or datetime.now()).isoformat()
         }
+    
+    @staticmethod
+    def save_reading(reading_data: ReadingCreate) -> Dict[str, Any]:
+        """Save new reading and analyze quality"""
+        reading = ReadingService._build_reading(reading_data)
+        OnlineScoringService.score_readings([reading])
         
-        reading_id = firebase_service.save_reading(reading)
+        reading_id = storage.save_reading(reading)
         reading['id'] = reading_id
+        hot_tier.append([reading])
+        StatsService.record_readings([reading])
+        CounterService.record_readings([reading])
+        model_registry.note_readings(reading_data.sensor_id)
         
         # Update sensor's last reading time
         SensorService.update_sensor_last_reading(reading_data.sensor_id)
+        LiveService.publish_readings([reading])
         
         return reading
     
+    @staticmethod
+    def save_readings_batch(readings_data: List[ReadingCreate]) -> List[Dict[str, Any]]:
+        """
+        Save a batch of readings from any number of sensors.
+        Readings and sensor last-seen stamps are each written with one grouped update.
+        """
+        readings = [ReadingService._build_reading(r) for r in readings_data]
+        OnlineScoringService.score_readings(readings)
+        
+        reading_ids = storage.save_readings(readings)
+        for reading, reading_id in zip(readings, reading_ids):
+            reading['id'] = reading_id
+        hot_tier.append(readings)
+        StatsService.record_readings(readings)
+        CounterService.record_readings(readings)
+        for sensor_id, count in Counter(r['sensor_id'] for r in readings).items():
+            model_registry.note_readings(sensor_id, count)
+        
+        sensor_ids = {r['sensor_id'] for r in readings}
+        SensorService.update_sensors_last_reading(sensor_ids)
+        LiveService.publish_readings(readings)
+        
+        return readings
+    
     @staticmethod
     def _assess_quality(ph: float, tds: float, turbidity: float) -> str:
         """Assess water quality based on readings"""
@@ -50,60 +96,124 @@ class ReadingService:
         return "good"
     
     @staticmethod
-    def get_readings(sensor_id: str, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get readings for a sensor"""
-        return firebase_service.get_readings(sensor_id, limit)
+    def _latest(sensor_id: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        A sensor's newest limit readings in (created_at, id) order from the hot
+        tier, or None when it doesn't hold enough of them
+        """
+        # One past the page, to spot a timestamp tie across its edge that only storage can order by id
+        window = hot_tier.latest(sensor_id, limit + 1)
+        if window is None:
+            return None
+        readings = window.rows()
+        if len(readings) > limit and readings[limit]['created_at'] == readings[limit - 1]['created_at']:
+            return None
+        readings = readings[:limit]
+        readings.sort(key=lambda r: (r['created_at'], r['id']), reverse=True)
+        return readings
+    
+    @staticmethod
+    def get_readings_page(
+        sensor_id: str,
+        limit: int = 100,
+        after: Optional[Tuple[str, str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        descending: bool = True
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of a sensor's readings and the cursor of the next page.
+        The newest page comes from the hot tier when it holds it; other pages
+        merge storage and the cold tier.
+        """
+        start, end = to_local_naive(start), to_local_naive(end)
+        
+        def fetch(n: int, cursor: Optional[Tuple[str, str]]) -> List[Dict[str, Any]]:
+            if cursor is None and start is None and end is None and descending:
+                readings = ReadingService._latest(sensor_id, n)
+                if readings is not None:
+                    return readings
+            return merge_cold(
+                storage.get_readings_page(sensor_id, n, cursor, start, end, descending),
+                cold_storage.read_page(sensor_id, n, cursor, start, end, descending),
+                n,
+                descending
+            )
+        
+        return paginate(fetch, limit, after)
     
     @staticmethod
     def get_readings_by_time_range(
         sensor_id: str,
-        hours: int = 24
+        hours: int = 24,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        descending: bool = True
     ) -> List[Dict[str, Any]]:
-        """Get readings within time range"""
-        readings = firebase_service.get_readings(sensor_id, limit=1000)
-        now = datetime.now()
-        cutoff = now - timedelta(hours=hours)
+        """
+        Get readings within time range.
+        Defaults to the last `hours` when no explicit start is given.
+        Served from the hot tier when it covers the window; otherwise storage
+        and the cold tier are merged, and recent windows are loaded into the hot tier.
+        """
+        start = to_local_naive(start) or get_date_range(hours)[0]
+        end = to_local_naive(end)
+        window = hot_tier.window(sensor_id, start, end, limit, descending)
+        if window is not None:
+            return window.rows()
         
-        filtered = []
-        for reading in readings:
+        readings = storage.get_readings_range(sensor_id, start, end, limit, descending)
+        readings = merge_cold(
+            readings, cold_storage.read_range(sensor_id, start, end, limit, descending), limit, descending
+        )
+        if end is None and limit is None and start > datetime.now() - timedelta(hours=hot_tier.max_hours + 1):
+            hot_tier.load(sensor_id, readings, start)
+        return readings
+    
+    @staticmethod
+    def warm_hot_tier():
+        """Load every sensor's recent readings into the hot tier"""
+        start = datetime.now() - timedelta(hours=hot_tier.max_hours)
+        for sensor in SensorService.list_sensors():
             try:
-                created = datetime.fromisoformat(reading.get('created_at', ''))
-                if created >= cutoff:
-                    filtered.append(reading)
-            except:
-                pass
-        
-        return filtered
+                readings = storage.get_readings_range(sensor['id'], start, limit=hot_tier.max_readings)
+                complete_from = start
+                if len(readings) >= hot_tier.max_readings:
+                    # Truncated: complete only after the oldest reading loaded
+                    complete_from = datetime.fromisoformat(readings[-1]['created_at']) + timedelta(microseconds=1)
+                hot_tier.load(sensor['id'], readings, complete_from)
+            except Exception as e:
+                print(f"Error warming hot tier for {sensor['id']}: {e}")
     
     @staticmethod
-    def get_statistics(sensor_id: str, hours: int = 24) -> Dict[str, Any]:
-        """Calculate statistics for sensor"""
-        readings = ReadingService.get_readings_by_time_range(sensor_id, hours)
-        
-        if not readings:
-            return {
-                'reading_count': 0,
-                'avg_ph': 0,
-                'avg_tds': 0,
-                'avg_turbidity': 0,
-                'anomaly_count': 0
-            }
+    def get_downsampled_range(
+        sensor_id: str,
+        hours: int = 24,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        max_points: int = 500,
+        descending: bool = True
+    ) -> Optional[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Rollup series for a window whose raw readings exceed max_points.
+        Returns (resolution_seconds, points) at the finest resolution that fits,
+        or None when the raw readings already fit.
+        """
+        start = to_local_naive(start) or get_date_range(hours)[0]
+        end = to_local_naive(end) or datetime.now()
         
-        ph_levels = [r.get('ph_level', 7.0) for r in readings if 'ph_level' in r]
-        tds_levels = [r.get('tds_level', 0) for r in readings if 'tds_level' in r]
-        turbidity_levels = [r.get('turbidity', 0) for r in readings if 'turbidity' in r]
-        anomalies = sum(1 for r in readings if r.get('is_anomaly', False))
+        if StatsService.get_window_aggregate(sensor_id, start, end)['count'] <= max_points:
+            return None
         
-        return {
-            'reading_count': len(readings),
-            'avg_ph': sum(ph_levels) / len(ph_levels) if ph_levels else 0,
-            'avg_tds': sum(tds_levels) / len(tds_levels) if tds_levels else 0,
-            'avg_turbidity': sum(turbidity_levels) / len(turbidity_levels) if turbidity_levels else 0,
-            'anomaly_count': anomalies,
-            'min_ph': min(ph_levels) if ph_levels else 0,
-            'max_ph': max(ph_levels) if ph_levels else 14,
-            'min_tds': min(tds_levels) if tds_levels else 0,
-            'max_tds': max(tds_levels) if tds_levels else 0,
-            'min_turbidity': min(turbidity_levels) if turbidity_levels else 0,
-            'max_turbidity': max(turbidity_levels) if turbidity_levels else 0,
-        }
+        resolution = StatsService.choose_resolution(start, end, max_points)
+        points = StatsService.get_series(sensor_id, start, end, resolution)
+        if descending:
+            points.reverse()
+        return resolution, points
+    
+    @staticmethod
+    def get_statistics(sensor_id: str, hours: int = 24) -> Dict[str, Any]:
+        """Calculate statistics for sensor from the incrementally maintained buckets"""
+        start, end = get_date_range(hours)
+        return StatsService.get_statistics(sensor_id, start, end)
@@ -0,0 +1,125 @@
+"""
+Version-based ETags and response caching for read endpoints.
+Write paths bump the version of each scope they change (the sensor list,
+alerts); a response's ETag is derived from the versions of the scopes it
+depends on, so unchanged data answers If-None-Match with 304 and repeat
+requests are served from the cache. Data that changes with every reading
+(statistics, last_reading_at) is not versioned: those responses pass a ttl
+and are cached for the rest of the current ttl-second period instead.
+Versions are per process: behind several workers, ETags only match
+when the same worker answers.
+"""
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import inspect
+import os
+import threading
+import time
+import uuid
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from utils.concurrency import run_io
+
+# Changes on restart, so ETags issued by an earlier process never match
+_EPOCH = uuid.uuid4().hex[:8]
+
+class ResponseCache:
+    """Scope versions plus an LRU of encoded bodies keyed by ETag"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._versions: Dict[str, int] = {}
+        self._entries: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'misses': 0, 'not_modified': 0, 'bumps': 0}
+
+    def bump(self, *scopes: str):
+        """Mark scopes as changed; ETags depending on them change too"""
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+            self._counts['bumps'] += len(scopes)
+
+    def etag(self, key: str, scopes: Iterable[str], ttl: Optional[float] = None) -> str:
+        """
+        ETag for key given its scopes. With a ttl it also rolls over every ttl
+        seconds, for responses that change with ingest or as time passes.
+        """
+        with self._lock:
+            versions = ','.join(f'{scope}={self._versions.get(scope, 0)}' for scope in sorted(scopes))
+        period = int(time.time() // ttl) if ttl else 0
+        digest = hashlib.blake2b(f'{key}|{versions}|{period}'.encode(), digest_size=8).hexdigest()
+        return f'"{_EPOCH}-{digest}"'
+
+    def get(self, etag: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(etag)
+            if body is not None:
+                self._entries.move_to_end(etag)
+            return body
+
+    def put(self, etag: str, body: bytes):
+        with self._lock:
+            self._entries[etag] = body
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Hit, miss and 304 counts, hit ratio and cache size"""
+        with self._lock:
+            counts = dict(self._counts)
+            entries = len(self._entries)
+        served = counts['hits'] + counts['misses'] + counts['not_modified']
+        return {
+            **counts,
+            'hit_ratio': round((counts['hits'] + counts['not_modified']) / served, 3) if served else None,
+            'entries': entries,
+        }
+
+response_cache = ResponseCache(int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 512)))
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+async def cached_response(
+    request: Request,
+    scopes: Iterable[str],
+    compute: Callable[..., Any],
+    *args: Any,
+    ttl: Optional[float] = None
+) -> Response:
+    """
+    JSON response for compute(*args) (awaited, or run on the I/O pool) with an ETag from scopes.
+    Answers 304 when the client already has it and reuses the encoded body while
+    the ETag is unchanged.
+    """
+    scopes = tuple(scopes)
+    etag = response_cache.etag(str(request.url.path) + '?' + str(request.url.query), scopes, ttl)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+    if _matches(request.headers.get('if-none-match'), etag):
+        response_cache.count('not_modified')
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(etag)
+    if body is not None:
+        response_cache.count('hits')
+    else:
+        response_cache.count('misses')
+        if inspect.iscoroutinefunction(compute):
+            data = await compute(*args)
+        else:
+            data = await run_io(compute, *args)
+        body = JSONResponse(jsonable_encoder(data)).body
+        response_cache.put(etag, body)
+    return Response(content=body, media_type='application/json', headers=headers)
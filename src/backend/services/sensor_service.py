@@ -1,13 +1,25 @@
 """
 Sensor management service
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable
 from models import Sensor, SensorCreate
-from services.firebase_service import FirebaseService
+from services.storage_service import get_storage
+from services.write_behind import WriteBehindBuffer
+from services.counter_service import CounterService
+from services.live_service import LiveService
+from services.hot_tier import hot_tier
+from services.response_cache import response_cache
 from datetime import datetime
+import os
 import uuid
 
-firebase_service = FirebaseService()
+storage = get_storage()
+
+# last_reading_at stamps are coalesced per sensor and flushed as one grouped update
+last_reading_buffer = WriteBehindBuffer(
+    storage.update_sensors,
+    interval_ms=int(os.getenv('LAST_READING_FLUSH_MS', 1000))
+)
 
 class SensorService:
     """Manage sensor operations"""
@@ -25,14 +37,18 @@ class SensorService:
             'created_at': datetime.now().isoformat(),
             'last_reading_at': None
         }
-        sensor_id = firebase_service.create_sensor(data)
+        sensor_id = storage.create_sensor(data)
         data['id'] = sensor_id
+        CounterService.record_sensor_created()
+        hot_tier.track(sensor_id)
+        response_cache.bump('sensors')
+        LiveService.publish_sensor(data)
         return data
     
     @staticmethod
     def get_sensor(sensor_id: str) -> Optional[Dict[str, Any]]:
         """Get sensor by ID"""
-        sensor = firebase_service.get_sensor(sensor_id)
+        sensor = last_reading_buffer.overlay(sensor_id, storage.get_sensor(sensor_id))
         if sensor:
             sensor['id'] = sensor_id
         return sensor
@@ -40,19 +56,32 @@ class SensorService:
     @staticmethod
     def list_sensors() -> List[Dict[str, Any]]:
         """List all sensors"""
-        return firebase_service.get_all_sensors()
+        return [
+            last_reading_buffer.overlay(sensor['id'], sensor)
+            for sensor in storage.get_all_sensors()
+        ]
     
     @staticmethod
     def update_sensor_status(sensor_id: str, status: str):
         """Update sensor status"""
-        firebase_service.update_sensor(sensor_id, {
+        update = {
             'status': status,
             'updated_at': datetime.now().isoformat()
-        })
+        }
+        storage.update_sensor(sensor_id, update)
+        response_cache.bump('sensors')
+        LiveService.publish_sensor({'id': sensor_id, **update})
     
     @staticmethod
     def update_sensor_last_reading(sensor_id: str):
-        """Update sensor's last reading timestamp"""
-        firebase_service.update_sensor(sensor_id, {
+        """Update sensor's last reading timestamp (buffered write-behind)"""
+        last_reading_buffer.put(sensor_id, {
             'last_reading_at': datetime.now().isoformat()
         })
+    
+    @staticmethod
+    def update_sensors_last_reading(sensor_ids: Iterable[str]):
+        """Update the last reading timestamp of several sensors (buffered write-behind)"""
+        now = datetime.now().isoformat()
+        for sensor_id in sensor_ids:
+            last_reading_buffer.put(sensor_id, {'last_reading_at': now})
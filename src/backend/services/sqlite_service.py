@@ -0,0 +1,547 @@
+"""
+Embedded SQLite storage engine
+"""
+import sqlite3
+import threading
+import uuid
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime
+from services.storage_service import StorageBackend
+from utils.aggregates import STAT_FIELDS, merge_aggregates
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sensors (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    location TEXT,
+    device_type TEXT,
+    latitude REAL,
+    longitude REAL,
+    status TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    last_reading_at TEXT
+);
+CREATE TABLE IF NOT EXISTS readings (
+    id TEXT PRIMARY KEY,
+    sensor_id TEXT NOT NULL,
+    ph_level REAL,
+    tds_level REAL,
+    turbidity REAL,
+    temperature REAL,
+    is_anomaly INTEGER NOT NULL DEFAULT 0,
+    anomaly_score REAL,
+    quality_status TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alerts (
+    id TEXT PRIMARY KEY,
+    sensor_id TEXT,
+    alert_type TEXT,
+    message TEXT,
+    severity TEXT,
+    reading_id TEXT,
+    is_acknowledged INTEGER NOT NULL DEFAULT 0,
+    acknowledged_at TEXT,
+    notified_via TEXT,
+    status TEXT,
+    reading_count INTEGER,
+    peak_value REAL,
+    last_seen_at TEXT,
+    closed_at TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_sensor_created
+    ON alerts (sensor_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_alerts_unacknowledged
+    ON alerts (created_at) WHERE is_acknowledged = 0;
+CREATE TABLE IF NOT EXISTS stat_buckets (
+    sensor_id TEXT NOT NULL,
+    resolution INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    anomaly_count INTEGER NOT NULL DEFAULT 0,
+    ph_level_sum REAL NOT NULL DEFAULT 0,
+    ph_level_sumsq REAL NOT NULL DEFAULT 0,
+    ph_level_min REAL,
+    ph_level_max REAL,
+    tds_level_sum REAL NOT NULL DEFAULT 0,
+    tds_level_sumsq REAL NOT NULL DEFAULT 0,
+    tds_level_min REAL,
+    tds_level_max REAL,
+    turbidity_sum REAL NOT NULL DEFAULT 0,
+    turbidity_sumsq REAL NOT NULL DEFAULT 0,
+    turbidity_min REAL,
+    turbidity_max REAL,
+    PRIMARY KEY (sensor_id, resolution, bucket)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    grp TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (grp, name)
+);
+"""
+
+SENSOR_COLUMNS = (
+    'name', 'location', 'device_type', 'latitude', 'longitude',
+    'status', 'created_at', 'updated_at', 'last_reading_at'
+)
+READING_COLUMNS = (
+    'sensor_id', 'ph_level', 'tds_level', 'turbidity', 'temperature',
+    'is_anomaly', 'anomaly_score', 'quality_status', 'created_at'
+)
+# Indexes on migrated columns or replacing older ones, created after _migrate
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_alerts_open
+    ON alerts (sensor_id, alert_type) WHERE status = 'open';
+DROP INDEX IF EXISTS idx_readings_sensor_created;
+CREATE INDEX IF NOT EXISTS idx_readings_sensor_created_id
+    ON readings (sensor_id, created_at, id);
+DROP INDEX IF EXISTS idx_alerts_created;
+CREATE INDEX IF NOT EXISTS idx_alerts_created_id
+    ON alerts (created_at, id);
+"""
+ALERT_COLUMNS = (
+    'sensor_id', 'alert_type', 'message', 'severity', 'reading_id',
+    'is_acknowledged', 'acknowledged_at', 'notified_via', 'status',
+    'reading_count', 'peak_value', 'last_seen_at', 'closed_at', 'created_at'
+)
+# Columns added after the first release, created on databases that predate them
+MIGRATIONS = {
+    'alerts': {
+        'status': 'TEXT',
+        'reading_count': 'INTEGER',
+        'peak_value': 'REAL',
+        'last_seen_at': 'TEXT',
+        'closed_at': 'TEXT',
+    },
+}
+BOOL_COLUMNS = ('is_anomaly', 'is_acknowledged')
+IN_CHUNK = 500  # stays under SQLite's bound-parameter limit
+BUCKET_COLUMNS = ('count', 'anomaly_count') + tuple(
+    f'{f}{suffix}' for f in STAT_FIELDS for suffix in ('_sum', '_sumsq', '_min', '_max')
+)
+
+def _bucket_merge_sql() -> str:
+    """UPSERT that adds counts and sums and combines min/max"""
+    assignments = []
+    for column in BUCKET_COLUMNS:
+        if column.endswith('_min') or column.endswith('_max'):
+            fn = 'MIN' if column.endswith('_min') else 'MAX'
+            assignments.append(
+                f'{column} = COALESCE({fn}({column}, excluded.{column}), {column}, excluded.{column})'
+            )
+        else:
+            assignments.append(f'{column} = {column} + excluded.{column}')
+    columns = ('sensor_id', 'resolution', 'bucket') + BUCKET_COLUMNS
+    return (
+        f"INSERT INTO stat_buckets ({', '.join(columns)}) "
+        f"VALUES ({', '.join(':' + c for c in columns)}) "
+        f"ON CONFLICT (sensor_id, resolution, bucket) DO UPDATE SET {', '.join(assignments)}"
+    )
+
+BUCKET_MERGE_SQL = _bucket_merge_sql()
+
+class SQLiteService(StorageBackend):
+    """Store sensors, readings and alerts in a local SQLite database (WAL mode)"""
+
+    def __init__(self, path: str = 'aquaguard.db'):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.executescript(INDEXES)
+
+    def _migrate(self):
+        """Add columns missing from an existing database"""
+        with self._lock, self._conn:
+            for table, columns in MIGRATIONS.items():
+                existing = {row['name'] for row in self._conn.execute(f'PRAGMA table_info({table})')}
+                for column, column_type in columns.items():
+                    if column not in existing:
+                        self._conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    # Helpers
+    @staticmethod
+    def _new_id() -> str:
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def _to_row(data: Dict[str, Any], columns: tuple) -> Dict[str, Any]:
+        """Keep known columns and encode values for SQLite"""
+        row = {}
+        for column in columns:
+            if column not in data:
+                continue
+            value = data[column]
+            if column in BOOL_COLUMNS:
+                value = int(bool(value))
+            elif column == 'notified_via':
+                value = ','.join(value or [])
+            row[column] = value
+        return row
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        """Decode a SQLite row into the dict shape used by the services"""
+        data = dict(row)
+        for column in BOOL_COLUMNS:
+            if column in data:
+                data[column] = bool(data[column])
+        if 'notified_via' in data:
+            data['notified_via'] = [c for c in (data['notified_via'] or '').split(',') if c]
+        return data
+
+    def _insert(self, table: str, row: Dict[str, Any]):
+        columns = ', '.join(row)
+        placeholders = ', '.join(f':{c}' for c in row)
+        with self._lock, self._conn:
+            self._conn.execute(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', row)
+
+    def _insert_many(self, table: str, rows: List[Dict[str, Any]], columns: tuple):
+        if not rows:
+            return
+        column_list = ', '.join(('id',) + columns)
+        placeholders = ', '.join(f':{c}' for c in ('id',) + columns)
+        params = [
+            {c: row.get(c, 0 if c in BOOL_COLUMNS else None) for c in ('id',) + columns}
+            for row in rows
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(f'INSERT INTO {table} ({column_list}) VALUES ({placeholders})', params)
+
+    def _update(self, table: str, record_id: str, row: Dict[str, Any]):
+        if not row:
+            return
+        assignments = ', '.join(f'{c} = :{c}' for c in row)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'UPDATE {table} SET {assignments} WHERE id = :id',
+                {**row, 'id': record_id}
+            )
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._from_row(r) for r in rows]
+
+    # Sensor operations
+    def create_sensor(self, sensor_data: Dict[str, Any]) -> str:
+        """Create a new sensor record"""
+        sensor_id = self._new_id()
+        sensor_data['created_at'] = datetime.now().isoformat()
+        self._insert('sensors', {'id': sensor_id, **self._to_row(sensor_data, SENSOR_COLUMNS)})
+        return sensor_id
+
+    def get_sensor(self, sensor_id: str) -> Optional[Dict]:
+        """Get sensor by ID"""
+        rows = self._query('SELECT * FROM sensors WHERE id = ?', (sensor_id,))
+        return rows[0] if rows else None
+
+    def get_all_sensors(self) -> List[Dict]:
+        """Get all sensors"""
+        return self._query('SELECT * FROM sensors ORDER BY created_at')
+
+    def update_sensor(self, sensor_id: str, data: Dict[str, Any]):
+        """Update sensor data"""
+        self._update('sensors', sensor_id, self._to_row(data, SENSOR_COLUMNS))
+
+    def update_sensors(self, updates: Dict[str, Dict[str, Any]]):
+        """Update several sensors in one transaction"""
+        with self._lock, self._conn:
+            for sensor_id, data in updates.items():
+                row = self._to_row(data, SENSOR_COLUMNS)
+                if row:
+                    assignments = ', '.join(f'{c} = :{c}' for c in row)
+                    self._conn.execute(
+                        f'UPDATE sensors SET {assignments} WHERE id = :id',
+                        {**row, 'id': sensor_id}
+                    )
+
+    # Reading operations
+    def save_reading(self, reading_data: Dict[str, Any]) -> str:
+        """Save sensor reading"""
+        reading_id = self._new_id()
+        reading_data['created_at'] = datetime.now().isoformat()
+        self._insert('readings', {'id': reading_id, **self._to_row(reading_data, READING_COLUMNS)})
+        return reading_id
+
+    def save_readings(self, readings: List[Dict[str, Any]]) -> List[str]:
+        """Save many readings in one transaction"""
+        now = datetime.now().isoformat()
+        ids = []
+        rows = []
+        for reading_data in readings:
+            reading_data.setdefault('created_at', now)
+            reading_id = self._new_id()
+            ids.append(reading_id)
+            rows.append({'id': reading_id, **self._to_row(reading_data, READING_COLUMNS)})
+        self._insert_many('readings', rows, READING_COLUMNS)
+        return ids
+
+    def get_readings(self, sensor_id: str, limit: int = 100) -> List[Dict]:
+        """Get readings for a sensor"""
+        return self._query(
+            'SELECT * FROM readings WHERE sensor_id = ? '
+            'ORDER BY created_at DESC LIMIT ?',
+            (sensor_id, limit)
+        )
+
+    def get_readings_range(
+        self,
+        sensor_id: str,
+        start: datetime,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        descending: bool = True
+    ) -> List[Dict]:
+        """Get readings within a time range using the (sensor_id, created_at) index"""
+        sql = 'SELECT * FROM readings WHERE sensor_id = ? AND created_at >= ?'
+        params = [sensor_id, start.isoformat()]
+        if end is not None:
+            sql += ' AND created_at <= ?'
+            params.append(end.isoformat())
+        sql += ' ORDER BY created_at DESC' if descending else ' ORDER BY created_at'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return self._query(sql, tuple(params))
+
+    def get_readings_page(
+        self,
+        sensor_id: str,
+        limit: int,
+        after: Optional[Tuple[str, str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        descending: bool = True
+    ) -> List[Dict]:
+        """Keyset page over the (sensor_id, created_at, id) index"""
+        sql = 'SELECT * FROM readings WHERE sensor_id = ?'
+        params: List[Any] = [sensor_id]
+        if start is not None:
+            sql += ' AND created_at >= ?'
+            params.append(start.isoformat())
+        if end is not None:
+            sql += ' AND created_at <= ?'
+            params.append(end.isoformat())
+        if after is not None:
+            sql += ' AND (created_at, id) < (?, ?)' if descending else ' AND (created_at, id) > (?, ?)'
+            params.extend(after)
+        sql += ' ORDER BY created_at DESC, id DESC' if descending else ' ORDER BY created_at, id'
+        sql += ' LIMIT ?'
+        params.append(limit)
+        return self._query(sql, tuple(params))
+
+    def get_readings_ranges(
+        self,
+        sensor_ids: List[str],
+        start: datetime,
+        end: Optional[datetime] = None
+    ) -> Dict[str, List[Dict]]:
+        """Readings of many sensors with one indexed IN query per chunk of sensors"""
+        windows: Dict[str, List[Dict]] = {sensor_id: [] for sensor_id in sensor_ids}
+        for i in range(0, len(sensor_ids), IN_CHUNK):
+            chunk = sensor_ids[i:i + IN_CHUNK]
+            sql = (
+                f'SELECT * FROM readings WHERE sensor_id IN ({",".join("?" * len(chunk))})'
+                ' AND created_at >= ?'
+            )
+            params = [*chunk, start.isoformat()]
+            if end is not None:
+                sql += ' AND created_at <= ?'
+                params.append(end.isoformat())
+            sql += ' ORDER BY sensor_id, created_at DESC'
+            for reading in self._query(sql, tuple(params)):
+                windows[reading['sensor_id']].append(reading)
+        return windows
+
+    def update_reading(self, sensor_id: str, reading_id: str, data: Dict[str, Any]):
+        """Update fields of a stored reading"""
+        self._update('readings', reading_id, self._to_row(data, READING_COLUMNS))
+
+    def update_readings(self, sensor_id: str, updates: Dict[str, Dict[str, Any]]):
+        """Update several readings in one transaction"""
+        with self._lock, self._conn:
+            for reading_id, data in updates.items():
+                row = self._to_row(data, READING_COLUMNS)
+                if row:
+                    assignments = ', '.join(f'{c} = :{c}' for c in row)
+                    self._conn.execute(
+                        f'UPDATE readings SET {assignments} WHERE id = :id',
+                        {**row, 'id': reading_id}
+                    )
+
+    def delete_readings(self, sensor_id: str, reading_ids: List[str]):
+        """Delete readings in one transaction"""
+        with self._lock, self._conn:
+            for i in range(0, len(reading_ids), IN_CHUNK):
+                chunk = reading_ids[i:i + IN_CHUNK]
+                self._conn.execute(
+                    f'DELETE FROM readings WHERE sensor_id = ? AND id IN ({",".join("?" * len(chunk))})',
+                    (sensor_id, *chunk)
+                )
+
+    # Alert operations
+    def save_alert(self, alert_data: Dict[str, Any]) -> str:
+        """Save alert"""
+        alert_id = self._new_id()
+        alert_data['created_at'] = datetime.now().isoformat()
+        self._insert('alerts', {'id': alert_id, **self._to_row(alert_data, ALERT_COLUMNS)})
+        return alert_id
+
+    def save_alerts(self, alerts: List[Dict[str, Any]]) -> List[str]:
+        """Save many alerts in one transaction"""
+        now = datetime.now().isoformat()
+        ids = []
+        rows = []
+        for alert_data in alerts:
+            alert_data['created_at'] = now
+            alert_id = self._new_id()
+            ids.append(alert_id)
+            rows.append({'id': alert_id, **self._to_row(alert_data, ALERT_COLUMNS)})
+        self._insert_many('alerts', rows, ALERT_COLUMNS)
+        return ids
+
+    def update_alerts(self, updates: Dict[str, Dict[str, Any]]):
+        """Update several alerts in one transaction"""
+        with self._lock, self._conn:
+            for alert_id, data in updates.items():
+                row = self._to_row(data, ALERT_COLUMNS)
+                if row:
+                    assignments = ', '.join(f'{c} = :{c}' for c in row)
+                    self._conn.execute(
+                        f'UPDATE alerts SET {assignments} WHERE id = :id',
+                        {**row, 'id': alert_id}
+                    )
+
+    def get_alerts(self, limit: int = 50) -> List[Dict]:
+        """Get recent alerts"""
+        return self._query(
+            'SELECT * FROM alerts ORDER BY created_at DESC LIMIT ?',
+            (limit,)
+        )
+
+    def get_alerts_page(self, limit: int, after: Optional[Tuple[str, str]] = None) -> List[Dict]:
+        """Keyset page over the (created_at, id) index"""
+        if after is None:
+            return self._query('SELECT * FROM alerts ORDER BY created_at DESC, id DESC LIMIT ?', (limit,))
+        return self._query(
+            'SELECT * FROM alerts WHERE (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?',
+            (*after, limit)
+        )
+
+    def get_alerts_by_sensor(self, sensor_id: str, limit: int = 50) -> List[Dict]:
+        """Get a sensor's recent alerts (idx_alerts_sensor_created)"""
+        return self._query(
+            'SELECT * FROM alerts WHERE sensor_id = ? ORDER BY created_at DESC LIMIT ?',
+            (sensor_id, limit)
+        )
+
+    def get_unacknowledged_alerts(self, limit: int = 50) -> List[Dict]:
+        """Get recent unacknowledged alerts (partial index idx_alerts_unacknowledged)"""
+        return self._query(
+            'SELECT * FROM alerts WHERE is_acknowledged = 0 ORDER BY created_at DESC LIMIT ?',
+            (limit,)
+        )
+
+    def get_open_alerts(self) -> List[Dict]:
+        """Alerts whose episode is still open"""
+        return self._query("SELECT * FROM alerts WHERE status = 'open'")
+
+    def acknowledge_alert(self, alert_id: str) -> Optional[Dict]:
+        """Mark alert as acknowledged"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT * FROM alerts WHERE id = ? AND is_acknowledged = 0',
+                (alert_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                'UPDATE alerts SET is_acknowledged = 1, acknowledged_at = ? WHERE id = ?',
+                (datetime.now().isoformat(), alert_id)
+            )
+        return self._from_row(row)
+
+    # Statistics buckets
+    def merge_stat_buckets(self, deltas: Dict[Tuple[str, int, str], Dict[str, Any]]):
+        """Merge aggregate deltas with one UPSERT per bucket in a single transaction"""
+        params = []
+        for (sensor_id, resolution, bucket), delta in deltas.items():
+            agg = merge_aggregates(None, delta)
+            params.append({
+                'sensor_id': sensor_id,
+                'resolution': resolution,
+                'bucket': bucket,
+                **{c: agg[c] for c in BUCKET_COLUMNS}
+            })
+        if not params:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(BUCKET_MERGE_SQL, params)
+
+    def get_stat_buckets(
+        self,
+        sensor_id: str,
+        resolution: int,
+        start_bucket: str,
+        end_bucket: str
+    ) -> List[Dict]:
+        """Get buckets within a range using the primary key"""
+        return self._query(
+            'SELECT * FROM stat_buckets WHERE sensor_id = ? AND resolution = ? '
+            'AND bucket >= ? AND bucket <= ? ORDER BY bucket',
+            (sensor_id, resolution, start_bucket, end_bucket)
+        )
+
+    def delete_stat_buckets(self, sensor_id: str):
+        """Remove every statistics bucket of a sensor"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM stat_buckets WHERE sensor_id = ?', (sensor_id,))
+
+    # Counters
+    def increment_counters(self, deltas: Dict[str, Dict[str, int]]):
+        """Add deltas to counters in one transaction"""
+        params = [
+            (group, name, delta)
+            for group, counters in deltas.items()
+            for name, delta in counters.items()
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO counters (grp, name, value) VALUES (?, ?, ?) '
+                'ON CONFLICT (grp, name) DO UPDATE SET value = value + excluded.value',
+                params
+            )
+
+    def set_counters(self, values: Dict[str, Dict[str, int]]):
+        """Overwrite counters in one transaction"""
+        params = [
+            (group, name, value)
+            for group, counters in values.items()
+            for name, value in counters.items()
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO counters (grp, name, value) VALUES (?, ?, ?)',
+                params
+            )
+
+    def get_counters(self, group: str) -> Dict[str, int]:
+        """Get every counter of a group"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT name, value FROM counters WHERE grp = ?', (group,)
+            ).fetchall()
+        return {row['name']: row['value'] for row in rows}
@@ -0,0 +1,230 @@
+"""
+Incrementally maintained reading statistics and rollups.
+Each sensor keeps running aggregates (count, sum, sum of squares, min, max,
+anomaly count) per 1-minute, 1-hour and 1-day bucket, updated on ingest, so
+window statistics and long-range charts combine a handful of buckets
+instead of scanning raw readings.
+"""
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+from datetime import datetime, timedelta
+import os
+from services.storage_service import get_storage
+from services.write_behind import WriteBehindBuffer
+from services.cold_storage import cold_storage, merge_cold
+from utils import to_local_naive
+from utils.aggregates import (
+    RESOLUTIONS,
+    empty_aggregate,
+    reading_aggregate,
+    merge_aggregates,
+    bucket_start,
+    bucket_key,
+    summarize,
+    rollup_point
+)
+
+storage = get_storage()
+
+MIN_RESOLUTION = RESOLUTIONS[0]
+
+# Bucket deltas are coalesced in memory and merged into storage together
+bucket_buffer = WriteBehindBuffer(
+    storage.merge_stat_buckets,
+    interval_ms=int(os.getenv('STATS_FLUSH_MS', 1000)),
+    merge_fn=merge_aggregates
+)
+
+def _ceil_bucket(moment: datetime, seconds: int) -> datetime:
+    start = bucket_start(moment, seconds)
+    return start if start == moment else start + timedelta(seconds=seconds)
+
+def _cover(start: datetime, end: datetime) -> List[Tuple[int, datetime, datetime]]:
+    """
+    Cover [start, end) (both minute-aligned) with the coarsest aligned buckets.
+    Returns runs of (resolution, first_bucket, last_bucket).
+    """
+    runs = []
+    cursor = start
+    while cursor < end:
+        for resolution in reversed(RESOLUTIONS):
+            step = timedelta(seconds=resolution)
+            if bucket_start(cursor, resolution) == cursor and cursor + step <= end:
+                if runs and runs[-1][0] == resolution and runs[-1][2] + step == cursor:
+                    runs[-1] = (resolution, runs[-1][1], cursor)
+                else:
+                    runs.append((resolution, cursor, cursor))
+                cursor += step
+                break
+    return runs
+
+class StatsService:
+    """Maintain and query per-sensor bucketed reading statistics"""
+
+    @staticmethod
+    def record_readings(readings: Iterable[Dict[str, Any]]):
+        """Add newly saved readings to their buckets at every resolution"""
+        for reading in readings:
+            agg = reading_aggregate(reading)
+            for resolution in RESOLUTIONS:
+                key = (reading['sensor_id'], resolution, bucket_key(reading['created_at'], resolution))
+                bucket_buffer.put(key, agg)
+
+    @staticmethod
+    def record_anomalies(sensor_id: str, created_ats: Iterable[str]):
+        """Count readings newly flagged as anomalous"""
+        for created_at in created_ats:
+            for resolution in RESOLUTIONS:
+                key = (sensor_id, resolution, bucket_key(created_at, resolution))
+                bucket_buffer.put(key, {'anomaly_count': 1})
+
+    @staticmethod
+    def get_buckets(
+        sensor_id: str,
+        resolution: int,
+        first: datetime,
+        last: datetime,
+        pending: Optional[Dict] = None
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """Stored buckets in [first, last] merged with pending deltas, as sorted (bucket, aggregate) pairs"""
+        start_key = bucket_start(first, resolution).isoformat()
+        end_key = bucket_start(last, resolution).isoformat()
+        if pending is None:
+            pending = bucket_buffer.pending()
+
+        buckets = {
+            b['bucket']: b
+            for b in storage.get_stat_buckets(sensor_id, resolution, start_key, end_key)
+        }
+        for (sid, res, bucket), delta in pending.items():
+            if sid == sensor_id and res == resolution and start_key <= bucket <= end_key:
+                buckets[bucket] = merge_aggregates(buckets.get(bucket), delta)
+        return sorted(buckets.items())
+
+    @staticmethod
+    def _scan(sensor_id: str, start: datetime, end: datetime) -> Dict[str, Any]:
+        total = empty_aggregate()
+        readings = merge_cold(
+            storage.get_readings_range(sensor_id, start, end),
+            cold_storage.read_range(sensor_id, start, end)
+        )
+        for reading in readings:
+            total = merge_aggregates(total, reading_aggregate(reading))
+        return total
+
+    @staticmethod
+    def get_window_aggregate(sensor_id: str, start: datetime, end: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Aggregate for readings in [start, end].
+        The aligned middle of the window comes from day, hour and minute
+        buckets; only the partial minutes at either edge are scanned raw.
+        """
+        start = to_local_naive(start)
+        end = to_local_naive(end) or datetime.now()
+        if end < start:
+            return empty_aggregate()
+        left = _ceil_bucket(start, MIN_RESOLUTION)
+        right = bucket_start(end, MIN_RESOLUTION)
+
+        if right <= left:
+            return StatsService._scan(sensor_id, start, end)
+
+        total = empty_aggregate()
+        if start < left:
+            total = merge_aggregates(
+                total,
+                StatsService._scan(sensor_id, start, left - timedelta(microseconds=1))
+            )
+        total = merge_aggregates(total, StatsService._scan(sensor_id, right, end))
+
+        pending = bucket_buffer.pending()
+        for resolution, first, last in _cover(left, right):
+            for _, agg in StatsService.get_buckets(sensor_id, resolution, first, last, pending):
+                total = merge_aggregates(total, agg)
+        return total
+
+    @staticmethod
+    def get_statistics(sensor_id: str, start: datetime, end: Optional[datetime] = None) -> Dict[str, Any]:
+        """Statistics for readings in [start, end]"""
+        return summarize(StatsService.get_window_aggregate(sensor_id, start, end))
+
+    @staticmethod
+    def choose_resolution(start: datetime, end: datetime, max_points: int) -> int:
+        """Finest rollup resolution that keeps the window within max_points buckets"""
+        span = (end - start).total_seconds()
+        for resolution in RESOLUTIONS:
+            if span / resolution <= max_points:
+                return resolution
+        return RESOLUTIONS[-1]
+
+    @staticmethod
+    def get_series(
+        sensor_id: str,
+        start: datetime,
+        end: Optional[datetime] = None,
+        resolution: int = MIN_RESOLUTION
+    ) -> List[Dict[str, Any]]:
+        """
+        Downsampled series (mean, min, max, count, anomaly count per field)
+        for the buckets overlapping [start, end], oldest first
+        """
+        start = to_local_naive(start)
+        end = to_local_naive(end) or datetime.now()
+        return [
+            rollup_point(bucket, resolution, agg)
+            for bucket, agg in StatsService.get_buckets(sensor_id, resolution, start, end)
+        ]
+
+    @staticmethod
+    def rebuild(sensor_id: str, page_size: int = 5000):
+        """
+        Recompute a sensor's buckets at every resolution from its raw readings (backfill).
+        Run while the sensor is not ingesting to avoid double counting.
+        """
+        bucket_buffer.flush()
+        storage.delete_stat_buckets(sensor_id)
+
+        buckets: Dict[Tuple[str, int, str], Dict[str, Any]] = {}
+        cursor = None
+        while True:
+            # Tiered readings live in the cold tier, so walk both in keyset order
+            page = merge_cold(
+                storage.get_readings_page(sensor_id, page_size, cursor, descending=False),
+                cold_storage.read_page(sensor_id, page_size, cursor, descending=False),
+                page_size,
+                descending=False
+            )
+            if not page:
+                break
+            for reading in page:
+                agg = reading_aggregate(reading)
+                for resolution in RESOLUTIONS:
+                    key = (sensor_id, resolution, bucket_key(reading['created_at'], resolution))
+                    buckets[key] = merge_aggregates(buckets.get(key), agg)
+            cursor = (page[-1]['created_at'], page[-1]['id'])
+
+            # Merges are additive, so partial buckets can be written early to bound memory
+            if len(buckets) > page_size:
+                storage.merge_stat_buckets(buckets)
+                buckets = {}
+
+        storage.merge_stat_buckets(buckets)
+
+    @staticmethod
+    def backfill_missing():
+        """Rebuild rollups for sensors that have readings but no buckets yet"""
+        from services.sensor_service import SensorService
+        for sensor in SensorService.list_sensors():
+            sensor_id = sensor['id']
+            has_buckets = storage.get_stat_buckets(sensor_id, RESOLUTIONS[-1], '', '~')
+            has_readings = storage.get_readings(sensor_id, limit=1) or cold_storage.manifest(sensor_id)['segments']
+            if not has_buckets and has_readings:
+                StatsService.rebuild(sensor_id)
+                print(f"Backfilled rollups for {sensor_id}")
+
+
+if __name__ == "__main__":
+    # Backfill: python -m services.stats_service
+    from services.sensor_service import SensorService
+    for sensor in SensorService.list_sensors():
+        StatsService.rebuild(sensor['id'])
+        print(f"Rebuilt statistics for {sensor['id']}")
@@ -0,0 +1,201 @@
+"""
+Storage backend interface and factory
+"""
+from abc import ABC, abstractmethod
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime
+import os
+import threading
+
+class StorageBackend(ABC):
+    """Operations every storage engine must provide"""
+
+    # Sensor operations
+    @abstractmethod
+    def create_sensor(self, sensor_data: Dict[str, Any]) -> str:
+        """Create a new sensor record"""
+
+    @abstractmethod
+    def get_sensor(self, sensor_id: str) -> Optional[Dict]:
+        """Get sensor by ID"""
+
+    @abstractmethod
+    def get_all_sensors(self) -> List[Dict]:
+        """Get all sensors"""
+
+    @abstractmethod
+    def update_sensor(self, sensor_id: str, data: Dict[str, Any]):
+        """Update sensor data"""
+
+    @abstractmethod
+    def update_sensors(self, updates: Dict[str, Dict[str, Any]]):
+        """Apply {sensor_id: fields} updates to several sensors in one write; raises on failure"""
+
+    # Reading operations
+    @abstractmethod
+    def save_reading(self, reading_data: Dict[str, Any]) -> str:
+        """Save sensor reading"""
+
+    @abstractmethod
+    def save_readings(self, readings: List[Dict[str, Any]]) -> List[str]:
+        """
+        Save many readings in one write and return their ids in order.
+        A created_at already present on a reading is kept.
+        """
+
+    @abstractmethod
+    def get_readings(self, sensor_id: str, limit: int = 100) -> List[Dict]:
+        """Get the newest readings for a sensor, newest first"""
+
+    @abstractmethod
+    def get_readings_range(
+        self,
+        sensor_id: str,
+        start: datetime,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        descending: bool = True
+    ) -> List[Dict]:
+        """
+        Get readings with start <= created_at <= end, ordered by created_at.
+        With a limit, the newest (descending) or oldest (ascending) rows are kept.
+        """
+
+    @abstractmethod
+    def get_readings_page(
+        self,
+        sensor_id: str,
+        limit: int,
+        after: Optional[Tuple[str, str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        descending: bool = True
+    ) -> List[Dict]:
+        """
+        One page of a sensor's readings in (created_at, id) order, continuing
+        after the (created_at, id) of the previous page's last reading.
+        """
+
+    @abstractmethod
+    def get_readings_ranges(
+        self,
+        sensor_ids: List[str],
+        start: datetime,
+        end: Optional[datetime] = None
+    ) -> Dict[str, List[Dict]]:
+        """Readings of many sensors with start <= created_at <= end, newest first per sensor"""
+
+    @abstractmethod
+    def update_reading(self, sensor_id: str, reading_id: str, data: Dict[str, Any]):
+        """Update fields of a stored reading"""
+
+    @abstractmethod
+    def update_readings(self, sensor_id: str, updates: Dict[str, Dict[str, Any]]):
+        """Update several readings of a sensor ({reading_id: fields}) in one write"""
+
+    @abstractmethod
+    def delete_readings(self, sensor_id: str, reading_ids: List[str]):
+        """Remove readings of a sensor (moved to the cold tier) in one write"""
+
+    # Alert operations
+    @abstractmethod
+    def save_alert(self, alert_data: Dict[str, Any]) -> str:
+        """Save alert"""
+
+    @abstractmethod
+    def save_alerts(self, alerts: List[Dict[str, Any]]) -> List[str]:
+        """Save many alerts in one write and return their ids in order"""
+
+    @abstractmethod
+    def update_alerts(self, updates: Dict[str, Dict[str, Any]]):
+        """Update several alerts ({alert_id: fields}) in one write; raises on failure"""
+
+    @abstractmethod
+    def get_alerts(self, limit: int = 50) -> List[Dict]:
+        """Get recent alerts, newest first"""
+
+    @abstractmethod
+    def get_alerts_page(self, limit: int, after: Optional[Tuple[str, str]] = None) -> List[Dict]:
+        """One page of alerts, newest first, continuing after the (created_at, id) of the previous page"""
+
+    @abstractmethod
+    def get_alerts_by_sensor(self, sensor_id: str, limit: int = 50) -> List[Dict]:
+        """Get a sensor's recent alerts, newest first"""
+
+    @abstractmethod
+    def get_unacknowledged_alerts(self, limit: int = 50) -> List[Dict]:
+        """Get recent unacknowledged alerts, newest first"""
+
+    @abstractmethod
+    def get_open_alerts(self) -> List[Dict]:
+        """Alerts whose episode is still open"""
+
+    @abstractmethod
+    def acknowledge_alert(self, alert_id: str) -> Optional[Dict]:
+        """
+        Mark alert as acknowledged.
+        Returns the alert if this call acknowledged it, None if it was
+        missing or already acknowledged.
+        """
+
+
+    # Statistics buckets
+    @abstractmethod
+    def merge_stat_buckets(self, deltas: Dict[Tuple[str, int, str], Dict[str, Any]]):
+        """
+        Merge aggregate deltas keyed by (sensor_id, resolution_seconds, bucket)
+        into the stored buckets (counts and sums add, min/max combine)
+        """
+
+    @abstractmethod
+    def get_stat_buckets(
+        self,
+        sensor_id: str,
+        resolution: int,
+        start_bucket: str,
+        end_bucket: str
+    ) -> List[Dict]:
+        """Get buckets with start_bucket <= bucket <= end_bucket, oldest first"""
+
+    @abstractmethod
+    def delete_stat_buckets(self, sensor_id: str):
+        """Remove every statistics bucket of a sensor"""
+
+
+    # Counters
+    @abstractmethod
+    def increment_counters(self, deltas: Dict[str, Dict[str, int]]):
+        """Atomically add {group: {name: delta}} to stored counters; raises on failure"""
+
+    @abstractmethod
+    def set_counters(self, values: Dict[str, Dict[str, int]]):
+        """Overwrite {group: {name: value}} counters"""
+
+    @abstractmethod
+    def get_counters(self, group: str) -> Dict[str, int]:
+        """Get every counter of a group as {name: value}"""
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+def get_storage() -> StorageBackend:
+    """
+    Return the shared storage backend, one client per process.
+    STORAGE_BACKEND selects the engine: 'firebase' (default) or 'sqlite'.
+    The Firebase client only connects on its first query.
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                backend = os.getenv('STORAGE_BACKEND', 'firebase').lower()
+                if backend == 'sqlite':
+                    from services.sqlite_service import SQLiteService
+                    _storage = SQLiteService(os.getenv('SQLITE_PATH', 'aquaguard.db'))
+                elif backend == 'firebase':
+                    from services.firebase_service import FirebaseService
+                    _storage = FirebaseService()
+                else:
+                    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    return _storage
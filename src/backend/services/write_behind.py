@@ -0,0 +1,121 @@
+"""
+Write-behind buffers that coalesce hot-path updates and flush them in groups
+"""
+import threading
+from typing import Callable, Dict, Any, Hashable, List, Optional
+
+_buffers: List['WriteBehindBuffer'] = []
+
+class WriteBehindBuffer:
+    """
+    Keep the latest fields per key in memory and hand them to flush_fn
+    as one {key: fields} mapping every interval_ms.
+    With a merge_fn, updates are combined (e.g. summed deltas) instead of overwritten.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[Dict[Hashable, Dict[str, Any]]], None],
+        interval_ms: int = 1000,
+        merge_fn: Optional[Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = None
+    ):
+        self.flush_fn = flush_fn
+        self.interval = interval_ms / 1000
+        self.merge_fn = merge_fn
+        self._pending: Dict[Hashable, Dict[str, Any]] = {}
+        self._inflight: Dict[Hashable, Dict[str, Any]] = {}  # being flushed, still visible to readers
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        _buffers.append(self)
+
+    def put(self, key: Hashable, fields: Dict[str, Any]):
+        """Merge fields into the pending update for key"""
+        with self._lock:
+            self._merge(key, fields)
+            if self._thread is None and self.interval > 0:
+                self._start()
+        if self.interval <= 0:
+            self.flush()
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Pending fields for key, so readers see their own recent writes"""
+        with self._lock:
+            return self._combined(key)
+
+    def overlay(self, key: Hashable, record: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Apply pending fields for key on top of a stored record"""
+        pending = self.get(key)
+        if record is None or not pending:
+            return record
+        return {**record, **pending}
+
+    def pending(self) -> Dict[Hashable, Dict[str, Any]]:
+        """Snapshot of all pending updates"""
+        with self._lock:
+            return {key: self._combined(key) for key in {**self._inflight, **self._pending}}
+
+    def flush(self):
+        """Write all pending updates with one flush_fn call"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return
+            try:
+                self.flush_fn(batch)
+            except Exception as e:
+                print(f"Error flushing write-behind buffer: {e}")
+                with self._lock:
+                    # Requeue without overwriting anything newer
+                    for key, fields in batch.items():
+                        newer = self._pending.pop(key, None)
+                        self._pending[key] = fields
+                        if newer:
+                            self._merge(key, newer)
+            finally:
+                with self._lock:
+                    self._inflight = {}
+
+    def stop(self):
+        """Stop the flush thread and write what is left"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _combined(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        inflight = self._inflight.get(key)
+        pending = self._pending.get(key)
+        if inflight is None or pending is None:
+            fields = inflight or pending
+            return dict(fields) if fields else None
+        if self.merge_fn is not None:
+            return self.merge_fn(dict(inflight), pending)
+        return {**inflight, **pending}
+
+    def _merge(self, key: Hashable, fields: Dict[str, Any]):
+        current = self._pending.get(key)
+        if current is None:
+            self._pending[key] = dict(fields)
+        elif self.merge_fn is not None:
+            self._pending[key] = self.merge_fn(current, fields)
+        else:
+            current.update(fields)
+
+    def _start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+def stop_all():
+    """Flush and stop every write-behind buffer (application shutdown)"""
+    for buffer in _buffers:
+        buffer.stop()
@@ -2,7 +2,7 @@
 Utility functions
 """
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
 def validate_ph_level(ph: float) -> bool:
     """Validate pH level (0-14)"""
@@ -30,6 +30,12 @@ def get_date_range(hours: int = 24) -> tuple:
     start = now - timedelta(hours=hours)
     return start, now
 
+def to_local_naive(moment: Optional[datetime]) -> Optional[datetime]:
+    """Naive local time for a timezone-aware datetime, as stored in created_at; others unchanged"""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone().replace(tzinfo=None)
+
 def format_reading_for_display(reading: Dict[str, Any]) -> Dict[str, Any]:
     """Format reading for API response"""
     return {
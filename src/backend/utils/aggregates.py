@@ -0,0 +1,117 @@
+"""
+Mergeable reading aggregates and time-bucket helpers
+"""
+from typing import Optional, Dict, Any
+from datetime import datetime, timedelta
+import math
+
+STAT_FIELDS = ('ph_level', 'tds_level', 'turbidity')
+BUCKET_SECONDS = 3600
+RESOLUTIONS = (60, 3600, 86400)  # 1 minute, 1 hour, 1 day rollups
+
+def empty_aggregate() -> Dict[str, Any]:
+    """Aggregate of zero readings"""
+    agg = {'count': 0, 'anomaly_count': 0}
+    for field in STAT_FIELDS:
+        agg[f'{field}_sum'] = 0.0
+        agg[f'{field}_sumsq'] = 0.0
+        agg[f'{field}_min'] = None
+        agg[f'{field}_max'] = None
+    return agg
+
+def reading_aggregate(reading: Dict[str, Any]) -> Dict[str, Any]:
+    """Aggregate of a single reading"""
+    agg = {'count': 1, 'anomaly_count': 1 if reading.get('is_anomaly') else 0}
+    for field in STAT_FIELDS:
+        value = reading.get(field)
+        if value is None:
+            agg[f'{field}_sum'] = 0.0
+            agg[f'{field}_sumsq'] = 0.0
+            agg[f'{field}_min'] = None
+            agg[f'{field}_max'] = None
+        else:
+            value = float(value)
+            agg[f'{field}_sum'] = value
+            agg[f'{field}_sumsq'] = value * value
+            agg[f'{field}_min'] = value
+            agg[f'{field}_max'] = value
+    return agg
+
+def merge_aggregates(a: Optional[Dict[str, Any]], b: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine two aggregates (missing keys count as empty)"""
+    a = a or {}
+    b = b or {}
+    merged = {
+        'count': a.get('count', 0) + b.get('count', 0),
+        'anomaly_count': a.get('anomaly_count', 0) + b.get('anomaly_count', 0),
+    }
+    for field in STAT_FIELDS:
+        for suffix in ('_sum', '_sumsq'):
+            key = field + suffix
+            merged[key] = a.get(key, 0.0) + b.get(key, 0.0)
+        mins = [v for v in (a.get(f'{field}_min'), b.get(f'{field}_min')) if v is not None]
+        maxs = [v for v in (a.get(f'{field}_max'), b.get(f'{field}_max')) if v is not None]
+        merged[f'{field}_min'] = min(mins) if mins else None
+        merged[f'{field}_max'] = max(maxs) if maxs else None
+    return merged
+
+def bucket_start(moment: datetime, seconds: int = BUCKET_SECONDS) -> datetime:
+    """Start of the bucket containing moment"""
+    midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    offset = int((moment - midnight).total_seconds()) // seconds * seconds
+    return midnight + timedelta(seconds=offset)
+
+def bucket_key(created_at: str, seconds: int = BUCKET_SECONDS) -> str:
+    """Bucket key (ISO start time) for a reading's created_at"""
+    return bucket_start(datetime.fromisoformat(created_at), seconds).isoformat()
+
+def summarize(agg: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn an aggregate into the statistics returned by the API"""
+    count = agg.get('count', 0)
+    if not count:
+        return {
+            'reading_count': 0,
+            'avg_ph': 0,
+            'avg_tds': 0,
+            'avg_turbidity': 0,
+            'anomaly_count': 0
+        }
+
+    def mean(field):
+        return agg[f'{field}_sum'] / count
+
+    def std(field):
+        variance = agg[f'{field}_sumsq'] / count - mean(field) ** 2
+        return math.sqrt(max(variance, 0.0))
+
+    return {
+        'reading_count': count,
+        'avg_ph': mean('ph_level'),
+        'avg_tds': mean('tds_level'),
+        'avg_turbidity': mean('turbidity'),
+        'anomaly_count': agg.get('anomaly_count', 0),
+        'min_ph': agg['ph_level_min'] if agg['ph_level_min'] is not None else 0,
+        'max_ph': agg['ph_level_max'] if agg['ph_level_max'] is not None else 14,
+        'min_tds': agg['tds_level_min'] if agg['tds_level_min'] is not None else 0,
+        'max_tds': agg['tds_level_max'] if agg['tds_level_max'] is not None else 0,
+        'min_turbidity': agg['turbidity_min'] if agg['turbidity_min'] is not None else 0,
+        'max_turbidity': agg['turbidity_max'] if agg['turbidity_max'] is not None else 0,
+        'std_ph': std('ph_level'),
+        'std_tds': std('tds_level'),
+        'std_turbidity': std('turbidity'),
+    }
+
+def rollup_point(bucket: str, resolution: int, agg: Dict[str, Any]) -> Dict[str, Any]:
+    """Downsampled series point (mean/min/max per field) for one bucket"""
+    count = agg.get('count', 0)
+    point = {
+        'bucket': bucket,
+        'resolution': resolution,
+        'count': count,
+        'anomaly_count': agg.get('anomaly_count', 0),
+    }
+    for field in STAT_FIELDS:
+        point[f'{field}_mean'] = agg[f'{field}_sum'] / count if count else None
+        point[f'{field}_min'] = agg.get(f'{field}_min')
+        point[f'{field}_max'] = agg.get(f'{field}_max')
+    return point
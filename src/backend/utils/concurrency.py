@@ -0,0 +1,80 @@
+"""
+Executors that keep blocking storage calls and ML training off the event loop
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+IO_POOL_SIZE = int(os.getenv('IO_POOL_SIZE', 32))
+ML_POOL_SIZE = int(os.getenv('ML_POOL_SIZE', os.cpu_count() or 1))  # 0 runs ML inline
+
+_lock = threading.Lock()
+_io_executor: Optional[ThreadPoolExecutor] = None
+_cpu_executor: Optional[ProcessPoolExecutor] = None
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Bounded thread pool for blocking storage and network calls"""
+    global _io_executor
+    with _lock:
+        if _io_executor is None:
+            _io_executor = ThreadPoolExecutor(max_workers=IO_POOL_SIZE, thread_name_prefix='io')
+        return _io_executor
+
+def get_cpu_executor() -> Optional[ProcessPoolExecutor]:
+    """Process pool for CPU-heavy model training, or None when disabled"""
+    global _cpu_executor
+    if ML_POOL_SIZE <= 0:
+        return None
+    with _lock:
+        if _cpu_executor is None:
+            # spawn avoids forking a process that holds storage locks and threads
+            _cpu_executor = ProcessPoolExecutor(
+                max_workers=ML_POOL_SIZE,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _cpu_executor
+
+async def run_io(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking call on the I/O thread pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), partial(func, *args, **kwargs))
+
+def run_cpu(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a picklable CPU-bound function on the process pool and wait for it.
+    Call from a worker thread (via run_io), never directly on the event loop.
+    """
+    executor = get_cpu_executor()
+    if executor is None:
+        return func(*args, **kwargs)
+    return executor.submit(func, *args, **kwargs).result()
+
+def submit_cpu(func: Callable, *args, **kwargs) -> Future:
+    """
+    Start a picklable CPU-bound function on the process pool without waiting,
+    so many fits can run at once. Runs inline when the pool is disabled.
+    """
+    executor = get_cpu_executor()
+    if executor is not None:
+        return executor.submit(func, *args, **kwargs)
+    future: Future = Future()
+    try:
+        future.set_result(func(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def shutdown_executors():
+    """Stop the pools on application shutdown"""
+    global _io_executor, _cpu_executor
+    with _lock:
+        if _io_executor is not None:
+            _io_executor.shutdown(wait=True)
+            _io_executor = None
+        if _cpu_executor is not None:
+            _cpu_executor.shutdown(wait=True)
+            _cpu_executor = None
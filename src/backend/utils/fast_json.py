@@ -0,0 +1,89 @@
+"""
+Opt-in fast JSON responses for large listings.
+With FAST_JSON_RESPONSES=True, routes return storage rows encoded directly
+(orjson when installed, else compact stdlib json) instead of letting FastAPI
+validate them against response_model and run jsonable_encoder over every
+field. Storage rows are already plain JSON types, so the output is the same.
+
+Benchmark (from src/backend): python -m utils.fast_json [readings] [rounds]
+"""
+import json
+import os
+from typing import Any, Optional
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+ENABLED = os.getenv('FAST_JSON_RESPONSES', 'False').lower() == 'true'
+
+def dumps(content: Any) -> bytes:
+    """Encode content to JSON bytes; anything that isn't a JSON type is sent as str"""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=str, separators=(',', ':'), ensure_ascii=False).encode()
+
+def json_response(content: Any, response: Optional[Response] = None) -> Any:
+    """
+    content as a pre-encoded JSON response when fast responses are enabled,
+    carrying over headers set on the route's response; otherwise content as is.
+    """
+    if not ENABLED:
+        return content
+    headers = {}
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != 'content-length'}
+    return Response(content=dumps(content), media_type='application/json', headers=headers)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from datetime import datetime, timedelta
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from routes import readings as readings_routes
+    from utils import fast_json  # the module the routes use, not this __main__
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    now = datetime.now()
+    rows = [
+        {
+            'id': f'reading-{i:06d}',
+            'sensor_id': 'sensor-1',
+            'ph_level': 7.0 + (i % 10) / 10,
+            'tds_level': 300.0 + i % 50,
+            'turbidity': 1.5 + (i % 7) / 10,
+            'temperature': 21.5,
+            'is_anomaly': i % 97 == 0,
+            'anomaly_score': -0.1,
+            'quality_status': 'good',
+            'created_at': (now - timedelta(seconds=i)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+    # Serve the real route from memory so only serialization differs
+    readings_routes.ReadingService.get_readings_page = staticmethod(lambda *args, **kwargs: (rows, None))
+    app = FastAPI()
+    app.include_router(readings_routes.router)
+    client = TestClient(app)
+    url = f'/api/readings/sensor/sensor-1?limit={min(count, 1000)}'
+
+    def timed(enabled: bool):
+        fast_json.ENABLED = enabled
+        body = client.get(url).content
+        started = time.perf_counter()
+        for _ in range(rounds):
+            client.get(url)
+        return (time.perf_counter() - started) / rounds * 1000, body
+
+    default_ms, default_body = timed(False)
+    fast_ms, fast_body = timed(True)
+    assert json.loads(default_body) == json.loads(fast_body)
+    print(f"GET {url} with {count} readings, {rounds} rounds, encoder: {'orjson' if orjson else 'json'}")
+    print(f"{'response_model + jsonable_encoder':<36}{default_ms:>8.2f} ms")
+    print(f"{'FAST_JSON_RESPONSES':<36}{fast_ms:>8.2f} ms  ({default_ms / fast_ms:.1f}x)")
@@ -0,0 +1,54 @@
+"""
+Feature extraction for anomaly detection straight from storage rows into numpy arrays
+"""
+from typing import Any, Dict, List, NamedTuple, Optional
+from datetime import datetime
+import numpy as np
+
+FEATURE_FIELDS = ('ph_level', 'tds_level', 'turbidity')
+FEATURE_DEFAULTS = (7.0, 0.0, 0.0)
+
+class Features(NamedTuple):
+    """Feature matrix (n, 3) plus the id and epoch-seconds of each row"""
+    X: np.ndarray
+    ids: List[str]
+    epochs: np.ndarray
+
+def _epoch(created_at: Optional[str]) -> float:
+    try:
+        return datetime.fromisoformat(created_at).timestamp()
+    except (TypeError, ValueError):
+        return np.nan
+
+class FeatureBuffer:
+    """
+    Preallocated float64 storage reused across extractions (e.g. a fleet run).
+    Arrays returned by extract are views that the next extract overwrites,
+    so copy them before handing them to another thread or process.
+    """
+
+    def __init__(self, capacity: int = 0):
+        self._X = np.empty((capacity, len(FEATURE_FIELDS)), dtype=np.float64)
+        self._epochs = np.empty(capacity, dtype=np.float64)
+
+    def extract(self, readings: List[Dict[str, Any]]) -> Features:
+        """Fill the buffer from readings and return views of the first len(readings) rows"""
+        n = len(readings)
+        if n > len(self._X):
+            capacity = max(n, 2 * len(self._X))
+            self._X = np.empty((capacity, len(FEATURE_FIELDS)), dtype=np.float64)
+            self._epochs = np.empty(capacity, dtype=np.float64)
+        X = self._X[:n]
+        for column, (field, default) in enumerate(zip(FEATURE_FIELDS, FEATURE_DEFAULTS)):
+            X[:, column] = np.fromiter(
+                (default if r.get(field) is None else r[field] for r in readings),
+                dtype=np.float64,
+                count=n
+            )
+        epochs = self._epochs[:n]
+        epochs[:] = np.fromiter((_epoch(r.get('created_at')) for r in readings), dtype=np.float64, count=n)
+        return Features(X, [r.get('id') for r in readings], epochs)
+
+def extract_features(readings: List[Dict[str, Any]], buffer: Optional[FeatureBuffer] = None) -> Features:
+    """Features of readings, into buffer if given, otherwise into new arrays"""
+    return (buffer or FeatureBuffer(len(readings))).extract(readings)
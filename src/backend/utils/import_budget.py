@@ -0,0 +1,62 @@
+"""
+Startup import-time budget check.
+Imports main in a fresh interpreter with `python -X importtime`, reports
+the slowest modules and fails when the total exceeds the budget.
+
+Usage (from src/backend): python -m utils.import_budget [budget_ms]
+"""
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = float(os.getenv('STARTUP_IMPORT_BUDGET_MS', 1500))
+
+# Dependencies that must only load on first use, never at startup
+LAZY_MODULES = ('sklearn', 'scipy', 'pandas', 'firebase_admin')
+
+def measure_imports(module: str = 'main') -> List[Tuple[str, float, float]]:
+    """(module, self_ms, cumulative_ms) for every module imported by module"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, 'PYTHONPATH': BACKEND_DIR}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return timings
+
+def report(budget_ms: float = DEFAULT_BUDGET_MS, top: int = 15) -> bool:
+    """Print import times per top-level package and check the budget"""
+    timings = measure_imports()
+    total = next(cumulative for name, _, cumulative in timings if name == 'main')
+
+    by_package: Dict[str, float] = {}
+    for name, self_ms, _ in timings:
+        package = name.split('.')[0]
+        by_package[package] = by_package.get(package, 0.0) + self_ms
+
+    print(f"{'package':<30}{'import ms':>10}")
+    for package, ms in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<30}{ms:>10.1f}")
+
+    eager = sorted({name.split('.')[0] for name, _, _ in timings} & set(LAZY_MODULES))
+    ok = total <= budget_ms and not eager
+    if eager:
+        print(f"Loaded at startup but should be lazy: {', '.join(eager)}")
+    print(f"Total: {total:.1f} ms (budget {budget_ms:.0f} ms) {'OK' if ok else 'OVER BUDGET'}")
+    return ok
+
+
+if __name__ == "__main__":
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS
+    sys.exit(0 if report(budget) else 1)
@@ -0,0 +1,50 @@
+"""
+Opaque keyset cursors for paginated listings
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import base64
+import json
+from fastapi import HTTPException, Query
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+def encode_cursor(record: Dict[str, Any]) -> str:
+    """Cursor pointing just past record (its created_at and id)"""
+    raw = json.dumps([record.get('created_at'), record['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(created_at, id) from a cursor; raises ValueError for anything not made by encode_cursor"""
+    if not cursor:
+        return None
+    try:
+        created_at, record_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(created_at, str) or not isinstance(record_id, str):
+        raise ValueError('Invalid cursor')
+    return created_at, record_id
+
+def cursor_query(
+    after: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header")
+) -> Optional[Tuple[str, str]]:
+    """Route dependency decoding ?after=, with 400 for a malformed cursor"""
+    try:
+        return decode_cursor(after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def paginate(
+    fetch: Callable[[int, Optional[Tuple[str, str]]], List[Dict[str, Any]]],
+    limit: int,
+    after: Optional[Tuple[str, str]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page from fetch(limit, after) plus the cursor of the next page,
+    or None on the last page. Fetches one extra row to tell the two apart.
+    """
+    rows = fetch(limit + 1, after)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1])
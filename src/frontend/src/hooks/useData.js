@@ -1,31 +1,51 @@
 // Custom hook for fetching sensor data
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useCallback } from 'react';
 import { sensorApi, readingApi } from '../services/apiService';
+import { subscribe } from '../services/streamService';
 
 export const useSensors = () => {
   const [sensors, setSensors] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loaded, setLoaded] = useState(false);
   const [error, setError] = useState(null);
 
-  useEffect(() => {
-    const fetchSensors = async () => {
-      try {
-        setLoading(true);
-        const data = await sensorApi.getAllSensors();
-        setSensors(data || []);
-      } catch (err) {
-        setError(err.message);
-        console.error('Error fetching sensors:', err);
-      } finally {
-        setLoading(false);
-      }
-    };
+  const fetchSensors = useCallback(async () => {
+    try {
+      setLoading(true);
+      const data = await sensorApi.getAllSensors();
+      setSensors(data || []);
+    } catch (err) {
+      setError(err.message);
+      console.error('Error fetching sensors:', err);
+    } finally {
+      setLoading(false);
+      setLoaded(true);
+    }
+  }, []);
 
+  useEffect(() => {
     fetchSensors();
-    // Refresh every 30 seconds
-    const interval = setInterval(fetchSensors, 30000);
-    return () => clearInterval(interval);
-  }, []);
+  }, [fetchSensors]);
+
+  // Live updates instead of polling, for the listed sensors only; new sensors
+  // arrive as sensor events and widen the subscription
+  const sensorIds = sensors.map(s => s.id).join(',');
+  useEffect(() => {
+    if (!loaded) return;
+    return subscribe(sensorIds ? sensorIds.split(',') : [], {
+      sensor: (sensor) => setSensors(current => {
+        const index = current.findIndex(s => s.id === sensor.id);
+        if (index === -1) return [...current, sensor];
+        const next = [...current];
+        next[index] = { ...current[index], ...sensor };
+        return next;
+      }),
+      readings: (readings, sensorId) => setSensors(current => current.map(s => (
+        s.id === sensorId ? { ...s, last_reading_at: readings[readings.length - 1].created_at } : s
+      ))),
+      resync: fetchSensors
+    });
+  }, [sensorIds, loaded, fetchSensors]);
 
   return { sensors, loading, error };
 };
@@ -53,15 +73,24 @@ export const useReadings = (sensorId, hours = 24) => {
     };
 
     fetchReadings();
-    // Refresh every 10 seconds
-    const interval = setInterval(fetchReadings, 10000);
-    return () => clearInterval(interval);
+    // New readings arrive newest last; the list is newest first and keeps only the window.
+    // created_at is the server's naive local time, so the window is measured from the
+    // newest reading rather than this browser's clock and timezone.
+    return subscribe(sensorId, {
+      readings: (incoming) => setReadings(current => {
+        const cutoff = Date.parse(incoming[incoming.length - 1].created_at) - hours * 3600 * 1000;
+        return [...incoming.slice().reverse(), ...current].filter(r => Date.parse(r.created_at) >= cutoff);
+      }),
+      resync: fetchReadings
+    });
   }, [sensorId, hours]);
 
   return { readings, loading, error };
 };
 
 // Custom hook for sensor stats
+const WINDOW_STATS_REFRESH_MS = 30000;
+
 export const useSensorStats = (sensorId, hours = 24) => {
   const [stats, setStats] = useState({});
   const [loading, setLoading] = useState(true);
@@ -83,8 +112,25 @@ export const useSensorStats = (sensorId, hours = 24) => {
     };
 
     fetchStats();
-    const interval = setInterval(fetchStats, 30000);
-    return () => clearInterval(interval);
+    // The stream publishes the last 24 hours' statistics; other windows are
+    // refetched when they change, at most once per WINDOW_STATS_REFRESH_MS
+    if (hours === 24) {
+      return subscribe(sensorId, { stats: (data) => setStats(data), resync: fetchStats });
+    }
+    let refresh = null;
+    const refreshLater = () => {
+      if (!refresh) {
+        refresh = setTimeout(() => {
+          refresh = null;
+          fetchStats();
+        }, WINDOW_STATS_REFRESH_MS);
+      }
+    };
+    const unsubscribe = subscribe(sensorId, { stats: refreshLater, resync: fetchStats });
+    return () => {
+      clearTimeout(refresh);
+      unsubscribe();
+    };
   }, [sensorId, hours]);
 
   return { stats, loading, error };
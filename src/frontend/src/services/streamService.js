@@ -0,0 +1,92 @@
+// Live updates from the backend stream (Server-Sent Events)
+// One EventSource per page is shared by every subscriber. It asks only for
+// the sensors subscribed to (all sensors only if a subscriber wants them),
+// and is reopened when that set changes; events are routed to the
+// subscribers of their sensor. Events without a sensor reach everyone.
+const API_BASE_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8000';
+
+const EVENT_TYPES = ['readings', 'alerts', 'stats', 'system', 'sensor'];
+const subscribers = new Set();
+let source = null;
+let sourceKey = null;
+let reconcileQueued = false;
+
+const wants = ({ sensorIds }, sensorId) => !sensorIds || sensorId === null || sensorIds.includes(sensorId);
+
+const dispatch = (type, payload) => {
+  subscribers.forEach(subscriber => {
+    const handler = subscriber.handlers[type];
+    if (handler && wants(subscriber, payload.sensor_id)) {
+      handler(payload.data, payload.sensor_id);
+    }
+  });
+};
+
+// Subscribers refetch over REST after a reconnect or when the server dropped events for us
+const resync = () => {
+  subscribers.forEach(({ handlers }) => handlers.resync && handlers.resync());
+};
+
+// Sorted sensor ids to stream, or '*' for all sensors
+const streamKey = () => {
+  const ids = new Set();
+  for (const { sensorIds } of subscribers) {
+    if (!sensorIds) return '*';
+    sensorIds.forEach(id => ids.add(id));
+  }
+  // Nothing to filter on yet (e.g. no sensors exist): stream everything
+  return ids.size ? [...ids].sort().join(',') : '*';
+};
+
+const open = (key, reopened) => {
+  const query = key === '*' ? '' : `?${key.split(',').map(id => `sensor_id=${encodeURIComponent(id)}`).join('&')}`;
+  source = new EventSource(`${API_BASE_URL}/api/stream${query}`);
+  sourceKey = key;
+  EVENT_TYPES.forEach(type => {
+    source.addEventListener(type, event => dispatch(type, JSON.parse(event.data)));
+  });
+  source.addEventListener('resync', resync);
+  // A reopened stream may have missed events while it was switching
+  let connected = reopened;
+  source.onopen = () => {
+    if (connected) resync();
+    connected = true;
+  };
+};
+
+// Batched so components subscribing in the same render open one stream
+const reconcile = () => {
+  reconcileQueued = false;
+  if (subscribers.size === 0) {
+    if (source) source.close();
+    source = null;
+    sourceKey = null;
+    return;
+  }
+  const key = streamKey();
+  if (key === sourceKey) return;
+  const reopened = source !== null;
+  if (source) source.close();
+  open(key, reopened);
+};
+
+const scheduleReconcile = () => {
+  if (reconcileQueued) return;
+  reconcileQueued = true;
+  Promise.resolve().then(reconcile);
+};
+
+// handlers: { readings, alerts, stats, system, sensor, resync }
+// sensorIds: one sensor id, a list of them, or null for all sensors
+export const subscribe = (sensorIds, handlers) => {
+  const subscriber = {
+    sensorIds: sensorIds === null || sensorIds === undefined ? null : [].concat(sensorIds),
+    handlers
+  };
+  subscribers.add(subscriber);
+  scheduleReconcile();
+  return () => {
+    subscribers.delete(subscriber);
+    scheduleReconcile();
+  };
+};
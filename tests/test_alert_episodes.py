@@ -0,0 +1,43 @@
+"""
+Unit tests for alert episodes
+"""
+import pytest
+from src.backend.services.alert_rules import DEFAULT_RULES, RuleEngine
+from src.backend.services.alert_episodes import EpisodeTracker
+
+engine = RuleEngine(DEFAULT_RULES)
+
+def _observe(tracker, ph_levels, now):
+    readings = [{'sensor_id': 's1', 'ph_level': ph} for ph in ph_levels]
+    return tracker.observe(readings, engine.fire(readings), now=now)
+
+def test_sustained_breach_is_one_episode():
+    """Test repeated breaches update one episode instead of opening new ones"""
+    tracker = EpisodeTracker(clear_seconds=60, escalate_seconds=0)
+    first = _observe(tracker, [9.0, 9.4, 9.1], now=0)
+    assert len(first.opened) == 1 and first.opened[0][0] == 0
+    second = _observe(tracker, [9.2] * 100, now=10)
+    assert not second.opened
+    episode = second.updated[0]
+    assert episode.reading_count == 103
+    assert episode.peak_value == 9.4
+    assert episode.message == 'High pH detected: 9.40 (safe range: 6.5-8.5)'
+
+def test_episode_closes_after_clear_period():
+    """Test an episode only closes once readings stay clear for clear_seconds"""
+    tracker = EpisodeTracker(clear_seconds=60, escalate_seconds=0)
+    _observe(tracker, [9.0], now=0)
+    assert not _observe(tracker, [7.0], now=10).closed
+    assert not _observe(tracker, [9.0, 7.0], now=50).closed
+    assert not _observe(tracker, [7.0], now=100).closed
+    closed = _observe(tracker, [7.0], now=111).closed
+    assert len(closed) == 1 and closed[0].fields()['status'] == 'closed'
+    assert _observe(tracker, [9.0], now=120).opened
+
+def test_long_episode_escalates_once_per_period():
+    """Test severity rises one level per escalation period up to critical"""
+    tracker = EpisodeTracker(clear_seconds=60, escalate_seconds=100)
+    _observe(tracker, [5.0], now=0)
+    assert not _observe(tracker, [5.0], now=50).escalated
+    assert _observe(tracker, [5.0], now=100).escalated[0].severity == 'critical'
+    assert not _observe(tracker, [5.0], now=300).escalated
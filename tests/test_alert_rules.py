@@ -0,0 +1,34 @@
+"""
+Unit tests for the alert rule engine
+"""
+import pytest
+from src.backend.services.alert_rules import DEFAULT_RULES, AlertRule, RuleEngine
+
+def test_default_rules_fire_in_order():
+    """Test breached thresholds produce the expected alerts and messages"""
+    engine = RuleEngine(DEFAULT_RULES)
+    readings = [
+        {'ph_level': 7.0, 'tds_level': 200, 'turbidity': 1.0},
+        {'ph_level': 9.5, 'tds_level': 650, 'turbidity': 1.0, 'is_anomaly': True, 'anomaly_score': -0.71},
+    ]
+    fired = engine.evaluate(readings)
+    assert [(row, rule.alert_type) for row, rule, _ in fired] == [(1, 'ph_high'), (1, 'tds_high'), (1, 'anomaly')]
+    assert fired[0][2] == 'High pH detected: 9.50 (safe range: 6.5-8.5)'
+    assert fired[2][2] == 'Anomalous reading detected (score: -0.710)'
+
+def test_device_type_rule_overrides_generic_rule():
+    """Test a device-specific threshold replaces the generic one for that device only"""
+    engine = RuleEngine(DEFAULT_RULES + [
+        AlertRule('tds_high', 'tds_level', '>', 300, 'high', 'High TDS: {value:.0f}', device_type='kitchen_tap')
+    ])
+    readings = [{'tds_level': 400}, {'tds_level': 400}, {'tds_level': 600}]
+    fired = engine.evaluate(readings, ['kitchen_tap', 'overhead_tank', 'kitchen_tap'])
+    assert [(row, rule.alert_type, message) for row, rule, message in fired] == [
+        (0, 'tds_high', 'High TDS: 400'),
+        (2, 'tds_high', 'High TDS: 600'),
+    ]
+
+def test_unknown_operator_is_rejected():
+    """Test rules are validated when compiled"""
+    with pytest.raises(ValueError):
+        RuleEngine([AlertRule('x', 'ph_level', '!=', 7, 'low', 'x')])
@@ -2,7 +2,9 @@
 Unit tests for anomaly detection service
 """
 import pytest
+import numpy as np
 from src.backend.services.anomaly_service import AnomalyDetectionService
+from src.backend.utils.features import FeatureBuffer, extract_features
 
 def test_anomaly_severity_determination():
     """Test severity determination"""
@@ -18,8 +20,8 @@ def test_anomaly_severity_determination():
     severity = AnomalyDetectionService._determine_severity(-0.05)
     assert severity == "low"
 
-def test_dataframe_preparation():
-    """Test dataframe preparation"""
+def test_feature_extraction():
+    """Test feature extraction"""
     readings = [
         {
             'id': 'r1',
@@ -36,8 +38,60 @@ def test_dataframe_preparation():
             'created_at': '2026-02-23T10:15:00'
         }
     ]
-    df = AnomalyDetectionService._prepare_dataframe(readings)
-    assert len(df) == 2
-    assert 'ph_level' in df.columns
-    assert 'tds_level' in df.columns
-    assert 'turbidity' in df.columns
+    features = extract_features(readings)
+    assert features.X.shape == (2, 3)
+    assert features.X.dtype == np.float64
+    assert list(features.X[1]) == [7.5, 250, 1.5]
+    assert features.ids == ['r1', 'r2']
+    assert features.epochs[1] - features.epochs[0] == 900
+
+def test_feature_buffer_is_reused():
+    """Test a shared buffer serves successive extractions without reallocating"""
+    buffer = FeatureBuffer(4)
+    first = buffer.extract([{'ph_level': 6.0, 'tds_level': None}])
+    second = buffer.extract([{'ph_level': 8.0}, {'ph_level': 9.0}])
+    assert np.shares_memory(first.X, second.X)
+    assert list(second.X[:, 0]) == [8.0, 9.0]
+    assert list(second.X[0, 1:]) == [0.0, 0.0]
+
+def test_compiled_forest_matches_sklearn():
+    """Test the ingest-time scorer reproduces Isolation Forest scores"""
+    import numpy as np
+    from src.backend.services.ml_models import CompiledForest, fit_isolation_forest
+    rng = np.random.default_rng(0)
+    X = np.c_[rng.normal(7, 0.3, 300), rng.normal(300, 20, 300), rng.normal(1, 0.2, 300)]
+    model = fit_isolation_forest(X, 0.1)
+    scorer = CompiledForest(model)
+    Y = np.r_[X, [[10.0, 900.0, 9.0]]]
+    np.testing.assert_allclose(scorer.score_samples(Y), model.score_samples(Y))
+    predictions, _ = scorer.predict(Y)
+    assert (predictions == model.predict(Y)).all()
+
+def test_zscore_fallback_flags_outliers():
+    """Test readings far from the sensor baseline are flagged without a model"""
+    import numpy as np
+    from src.backend.services.online_scoring import OnlineScoringService, Z_THRESHOLD
+    baseline = (np.array([7.0, 300.0, 1.0]), np.array([0.2, 20.0, 0.0]))
+    X = np.array([[7.1, 310.0, 1.0], [7.0, 300.0 + 20.0 * (Z_THRESHOLD + 1), 1.0]])
+    predictions, scores = OnlineScoringService._zscore(X, baseline)
+    assert list(predictions) == [1, -1]
+    assert scores[1] < -0.5 < scores[0]
+
+def test_missing_baseline_is_cached_briefly(monkeypatch):
+    """Test a sensor with too little history isn't re-queried on every ingest"""
+    from src.backend.services import online_scoring
+    calls = []
+
+    def get_statistics(sensor_id, start, end=None):
+        calls.append(sensor_id)
+        return {'reading_count': 3}
+
+    monkeypatch.setattr(online_scoring.StatsService, 'get_statistics', staticmethod(get_statistics))
+    monkeypatch.setattr(online_scoring, '_baselines', {})
+    for _ in range(5):
+        assert online_scoring.OnlineScoringService.get_baseline('sparse-sensor') is None
+    assert calls == ['sparse-sensor']
+
+    monkeypatch.setattr(online_scoring, 'BASELINE_MISS_TTL', 0)
+    online_scoring.OnlineScoringService.get_baseline('sparse-sensor')
+    assert len(calls) == 2
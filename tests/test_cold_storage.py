@@ -0,0 +1,132 @@
+"""
+Unit tests for the cold storage tier
+"""
+import pytest
+from datetime import datetime, timedelta
+from src.backend.services import cold_storage as cold_module
+from src.backend.services.cold_storage import ColdStorage
+from src.backend.services.hot_tier import to_columns
+from src.backend.services.sqlite_service import SQLiteService
+
+START = datetime(2024, 1, 1, 22, 0)
+
+def _readings(count, step_minutes=30, prefix='r'):
+    return [
+        {
+            'id': f'{prefix}{i:03d}',
+            'sensor_id': 's1',
+            'ph_level': round(6.5 + (i % 20) / 10, 2),
+            'tds_level': 200.0 + i,
+            'turbidity': 1.5,
+            'temperature': None,
+            'is_anomaly': i % 7 == 0,
+            'anomaly_score': 0.0,
+            'quality_status': 'good',
+            'created_at': (START + timedelta(minutes=i * step_minutes)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+def _keys(rows):
+    return [(r['created_at'], r['id'], r['ph_level'], r['tds_level'], r['is_anomaly']) for r in rows]
+
+def test_segments_answer_ranges_and_pages_in_keyset_order(tmp_path):
+    """Test overlapping segments read back merged, filtered, limited and paged"""
+    cold = ColdStorage(str(tmp_path))
+    readings = _readings(120)
+    cold.write('s1', to_columns(readings[::2]), 0)
+    cold.write('s1', to_columns(readings[1::2]), 0)
+    manifest = cold.manifest('s1')
+    assert sum(s['rows'] for s in manifest['segments']) == 120
+    assert all(s['min']['ph_level'] <= s['max']['ph_level'] for s in manifest['segments'])
+
+    assert _keys(cold.read_range('s1').rows()) == _keys(readings[::-1])
+    start, end = START + timedelta(hours=10), START + timedelta(hours=40)
+    window = cold.read_range('s1', start, end, limit=5, descending=False)
+    assert _keys(window.rows()) == _keys(readings[20:25])
+
+    pages, after = [], None
+    while True:
+        page = cold.read_page('s1', 7, after, descending=True)
+        if page is None or not len(page):
+            break
+        rows = page.rows()
+        pages += rows
+        after = (rows[-1]['created_at'], rows[-1]['id'])
+    assert _keys(pages) == _keys(readings[::-1])
+    assert cold.read_range('s1', START - timedelta(days=9), START - timedelta(days=8)) is None
+
+def test_tiering_moves_old_readings_once(tmp_path, monkeypatch):
+    """Test old readings move to segments, and an interrupted run is finished without duplicates"""
+    storage = SQLiteService(str(tmp_path / 'test.db'))
+    monkeypatch.setattr(cold_module, 'storage', storage)
+    readings = _readings(100)
+    ids = storage.save_readings([{k: v for k, v in r.items() if k != 'id'} for r in readings])
+    readings = [{**r, 'id': reading_id} for r, reading_id in zip(readings, ids)]
+    cutoff = START + timedelta(hours=30)
+    old = [r for r in readings if r['created_at'] < cutoff.isoformat()]
+
+    cold = ColdStorage(str(tmp_path / 'cold'))
+    deletes = storage.delete_readings
+    monkeypatch.setattr(storage, 'delete_readings', lambda sensor_id, reading_ids: None)
+    assert cold.tier_sensor('s1', cutoff, page_size=16) == len(old)  # "crashes" before deleting
+    monkeypatch.setattr(storage, 'delete_readings', deletes)
+    assert cold.tier_sensor('s1', cutoff, page_size=16) == 0
+
+    assert len(storage.get_readings_range('s1', START)) == len(readings) - len(old)
+    assert sorted(_keys(cold.read_range('s1').rows())) == sorted(_keys(old))
+
+def test_tiering_keeps_values_exact(tmp_path, monkeypatch):
+    """Test tiered readings read back bit-for-bit and unrepresentable ones stay in storage"""
+    storage = SQLiteService(str(tmp_path / 'test.db'))
+    monkeypatch.setattr(cold_module, 'storage', storage)
+    readings = _readings(3)
+    readings[0].update(ph_level=7.0123456, turbidity=0.123456789, anomaly_score=-0.0123456789)
+    readings[1]['quality_status'] = 'unknown'
+    ids = storage.save_readings([{k: v for k, v in r.items() if k != 'id'} for r in readings])
+
+    cold = ColdStorage(str(tmp_path / 'cold'))
+    assert cold.tier_sensor('s1', START + timedelta(days=1)) == 2
+    assert [r['id'] for r in storage.get_readings_range('s1', START)] == [ids[1]]
+    row = cold.read_range('s1', descending=False)[0]
+    assert (row['ph_level'], row['turbidity'], row['anomaly_score']) == (7.0123456, 0.123456789, -0.0123456789)
+
+def test_float32_segments_still_read(tmp_path):
+    """Test segments written with float32 columns decode by their stored width"""
+    columns = to_columns(_readings(4))
+    columns = {name: column.astype('float32') if column.dtype.kind == 'f' else column for name, column in columns.items()}
+    path = str(tmp_path / 'old.seg')
+    cold_module.write_segment(path, columns)
+    with cold_module.Segment(path) as segment:
+        assert segment.column('tds_level').tolist() == [200.0, 201.0, 202.0, 203.0]
+
+def test_aware_bounds_filter_segments(tmp_path):
+    """Test timezone-aware bounds are read as local time and bad bounds raise instead of going unbounded"""
+    from datetime import timezone
+    cold = ColdStorage(str(tmp_path))
+    readings = _readings(10, step_minutes=60 * 24)
+    cold.write('s1', to_columns(readings), 0)
+    start = (START + timedelta(days=6)).astimezone().astimezone(timezone.utc)
+    assert [r['id'] for r in cold.read_range('s1', start).rows()] == ['r009', 'r008', 'r007', 'r006']
+    assert [r['id'] for r in cold.read_page('s1', 10, start=start).rows()] == ['r009', 'r008', 'r007', 'r006']
+    with pytest.raises(ValueError):
+        cold.read_range('s1', 'yesterday')
+
+def test_rebuild_counts_tiered_readings(tmp_path, monkeypatch):
+    """Test statistics rebuilt after tiering still count the readings moved to segments"""
+    from src.backend.services import stats_service as stats_module
+    from src.backend.utils.aggregates import RESOLUTIONS
+    storage = SQLiteService(str(tmp_path / 'test.db'))
+    cold = ColdStorage(str(tmp_path / 'cold'))
+    monkeypatch.setattr(cold_module, 'storage', storage)
+    monkeypatch.setattr(stats_module, 'storage', storage)
+    monkeypatch.setattr(stats_module, 'cold_storage', cold)
+    readings = _readings(70, step_minutes=7)
+    storage.save_readings([{k: v for k, v in r.items() if k != 'id'} for r in readings])
+    assert cold.tier_sensor('s1', START + timedelta(minutes=7 * 50), page_size=16) == 50
+
+    stats_module.StatsService.rebuild('s1', page_size=16)
+    days = stats_module.StatsService.get_buckets('s1', RESOLUTIONS[-1], datetime.min, datetime.max)
+    assert sum(day['count'] for _, day in days) == 70  # what CounterService.rebuild sums
+    end = START + timedelta(minutes=7 * 69, seconds=30)
+    assert stats_module.StatsService.get_window_aggregate('s1', START + timedelta(seconds=30), end)['count'] == 69
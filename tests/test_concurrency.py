@@ -0,0 +1,19 @@
+"""
+Unit tests for executor helpers
+"""
+import asyncio
+import threading
+import pytest
+from src.backend.utils.concurrency import run_io, run_cpu
+
+def test_run_io_uses_worker_thread():
+    """Test blocking calls are moved off the event loop thread"""
+    async def main():
+        return await run_io(threading.current_thread)
+    worker = asyncio.run(main())
+    assert worker is not threading.current_thread()
+    assert worker.name.startswith('io')
+
+def test_run_cpu_returns_result():
+    """Test process pool execution returns the function result"""
+    assert run_cpu(pow, 2, 10) == 1024
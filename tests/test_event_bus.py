@@ -0,0 +1,55 @@
+"""
+Unit tests for the live event bus
+"""
+import asyncio
+import threading
+import pytest
+from src.backend.services.event_bus import EventBus, Subscription
+
+def test_events_reach_matching_subscribers():
+    """Test events published from another thread reach sensor and all-sensor subscribers"""
+    async def main():
+        bus = EventBus()
+        one, everything = bus.subscribe(['s1']), bus.subscribe()
+        worker = threading.Thread(target=lambda: [bus.publish('readings', s, [{'ph_level': 7}]) for s in ('s1', 's2')])
+        worker.start()
+        worker.join()
+        frames = [await one.next_frame(1), await one.next_frame(0.05)]
+        assert frames[0].startswith('event: readings\ndata: {"sensor_id":"s1"')
+        assert frames[1] is None
+        assert '"s2"' in await everything.next_frame(1) + await everything.next_frame(1)
+        bus.unsubscribe(one)
+        assert bus.has_subscribers('s1')
+        bus.unsubscribe(everything)
+        assert not bus.has_subscribers('s1')
+    asyncio.run(main())
+
+def test_slow_subscriber_drops_oldest_and_resyncs():
+    """Test a full queue keeps the newest events and tells the client to resync"""
+    async def main():
+        bus = EventBus()
+        subscription = bus.subscribe(['s1'])
+        subscription.queue = asyncio.Queue(maxsize=3)
+        for i in range(10):
+            bus.publish('stats', 's1', {'n': i})
+        await asyncio.sleep(0)
+        first = await subscription.next_frame(1)
+        assert first.startswith('event: resync\ndata: {"dropped":7}')
+        assert '"n":7' in first
+        assert '"n":9' in await subscription.next_frame(1) + await subscription.next_frame(1)
+    asyncio.run(main())
+
+def test_events_without_a_sensor_reach_every_subscriber():
+    """Test sensor list and system events reach streams filtered to other sensors"""
+    async def main():
+        bus = EventBus()
+        one = bus.subscribe(['s1'])
+        assert bus.has_subscribers() and not bus.has_subscribers('s2')
+        bus.publish('sensor', None, {'id': 's2'})
+        bus.publish('readings', 's2', [{'ph_level': 7}])
+        await asyncio.sleep(0)
+        assert (await one.next_frame(1)).startswith('event: sensor\n')
+        assert await one.next_frame(0.05) is None
+        bus.unsubscribe(one)
+        assert not bus.has_subscribers()
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+"""
+Unit tests for fast JSON responses
+"""
+import json
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+from typing import List
+from src.backend.utils import fast_json
+
+ROWS = [
+    {'id': 'r1', 'sensor_id': 's1', 'ph_level': 7.2, 'temperature': None, 'is_anomaly': False, 'created_at': '2024-01-01T00:00:00'},
+    {'id': 'r2', 'sensor_id': 's1', 'ph_level': 6.9, 'temperature': 21.5, 'is_anomaly': True, 'created_at': '2024-01-01T00:01:00'},
+]
+
+def test_dumps_matches_stdlib_output():
+    """Test the fast encoder produces the same JSON as the standard library"""
+    assert json.loads(fast_json.dumps(ROWS)) == ROWS
+    assert json.loads(fast_json.dumps({'n': 1, 'at': object}))['at'].startswith('<class')
+
+def test_fast_response_keeps_body_and_headers(monkeypatch):
+    """Test enabled fast responses match the default body and keep route headers"""
+    app = FastAPI()
+
+    @app.get('/rows', response_model=List[dict])
+    async def rows(response: Response):
+        response.headers['X-Next-Cursor'] = 'abc'
+        return fast_json.json_response(ROWS, response)
+
+    client = TestClient(app)
+    monkeypatch.setattr(fast_json, 'ENABLED', False)
+    default = client.get('/rows')
+    monkeypatch.setattr(fast_json, 'ENABLED', True)
+    fast = client.get('/rows')
+    assert fast.json() == default.json() == ROWS
+    assert fast.headers['x-next-cursor'] == default.headers['x-next-cursor'] == 'abc'
+    assert fast.headers['content-type'] == 'application/json'
+    assert int(fast.headers['content-length']) == len(fast.content)
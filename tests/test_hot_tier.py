@@ -0,0 +1,79 @@
+"""
+Unit tests for the in-memory hot tier of recent readings
+"""
+import pytest
+from datetime import datetime, timedelta
+from src.backend.services.hot_tier import HotTier
+
+def _readings(sensor_id, start, count, step_seconds=60, prefix='r'):
+    return [
+        {
+            'id': f'{prefix}{i}',
+            'sensor_id': sensor_id,
+            'ph_level': round(7.2 + i / 100, 2),
+            'tds_level': 220,
+            'turbidity': 1.25,
+            'temperature': None if i % 2 else 21.5,
+            'is_anomaly': i == 1,
+            'anomaly_score': 0.0,
+            'quality_status': 'fair',
+            'created_at': (start + timedelta(seconds=i * step_seconds)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+def test_window_returns_stored_rows_in_query_order():
+    """Test appended readings come back as the same rows, newest first, with ranges and limits"""
+    tier = HotTier()
+    start = datetime.now() - timedelta(hours=1)
+    readings = _readings('s1', start, 10)
+    tier.track('s1')
+    tier.append(readings[5:] + readings[:5][::-1])  # out of order
+    window = tier.window('s1', start)
+    assert window.rows() == [dict(r) for r in reversed(readings)]
+    assert window[0]['ph_level'] == 7.29 and window[-1]['temperature'] == 21.5
+    page = tier.window('s1', start + timedelta(minutes=2), start + timedelta(minutes=6), limit=3, descending=False)
+    assert [r['id'] for r in page.rows()] == ['r2', 'r3', 'r4']
+    assert page.feature_matrix().tolist()[0] == pytest.approx([7.22, 220, 1.25])
+    tier.update_flags('s1', {'r3': {'is_anomaly': True, 'anomaly_score': -0.5}})
+    assert tier.latest('s1', 10)[6]['is_anomaly'] is True
+
+def test_coverage_limits_what_the_tier_answers():
+    """Test windows older than what the tier is known to hold fall back to storage"""
+    tier = HotTier(max_readings=5)
+    start = datetime.now() - timedelta(hours=1)
+    tier.append(_readings('s1', start, 3))
+    assert tier.window('s1', start) is None  # first seen mid-stream
+    assert tier.latest('s1', 2) is None
+
+    tier.load('s1', _readings('s1', start, 8), start)
+    assert tier.window('s1', start) is None  # only the newest 5 kept
+    window = tier.window('s1', start + timedelta(minutes=3))
+    assert [r['id'] for r in window.rows()] == ['r7', 'r6', 'r5', 'r4', 'r3']
+    assert tier.latest('s1', 6) is None and len(tier.latest('s1', 5)) == 5
+
+def test_memory_budget_evicts_least_recently_used_sensors():
+    """Test sensors are evicted oldest use first once over the byte budget"""
+    tier = HotTier(max_bytes=20000)
+    start = datetime.now() - timedelta(hours=1)
+    for sensor_id in ('s1', 's2', 's3'):
+        tier.track(sensor_id)
+        tier.append(_readings(sensor_id, start, 60, prefix=sensor_id))
+        tier.window('s1', start)
+    metrics = tier.get_metrics()
+    assert metrics['bytes'] <= 20000 and metrics['evictions'] >= 1
+    assert tier.window('s1', start) is not None
+    assert tier.window('s2', start) is None
+
+def test_values_read_back_exactly():
+    """Test measurements and scores come back bit-for-bit, so unchanged flags aren't rewritten"""
+    tier = HotTier()
+    start = datetime.now() - timedelta(hours=1)
+    readings = _readings('s1', start, 3)
+    readings[0].update(ph_level=7.0123456, turbidity=0.123456789, anomaly_score=-0.0123456789)
+    tier.track('s1')
+    tier.append(readings)
+    row = tier.window('s1', start)[-1]
+    assert (row['ph_level'], row['turbidity'], row['anomaly_score']) == (7.0123456, 0.123456789, -0.0123456789)
+    tier.update_flags('s1', {'r1': {'anomaly_score': -0.61803398875}})
+    assert tier.latest('s1', 3)[1]['anomaly_score'] == -0.61803398875
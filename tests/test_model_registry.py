@@ -0,0 +1,46 @@
+"""
+Unit tests for the anomaly model registry
+"""
+import pytest
+from src.backend.services.model_registry import ModelEntry, ModelRegistry
+
+def _entry(name='m'):
+    return ModelEntry({'name': name}, n_samples=10, window_start='a', window_end='b')
+
+def test_cached_model_is_reused():
+    """Test a fresh model is trained once and then served from cache"""
+    registry = ModelRegistry()
+    trained = []
+    def train():
+        trained.append(1)
+        return _entry()
+    first = registry.get_or_train(('s1', 24), train)
+    second = registry.get_or_train(('s1', 24), train)
+    assert first is second
+    assert len(trained) == 1
+
+def test_new_readings_trigger_retrain():
+    """Test enough new readings make a model stale"""
+    registry = ModelRegistry(retrain_min_new=3)
+    registry.put(('s1', 24), _entry())
+    registry.note_readings('s1', 2)
+    assert registry.is_fresh(registry.get(('s1', 24)))
+    registry.note_readings('s1')
+    assert not registry.is_fresh(registry.get(('s1', 24)))
+
+def test_expired_model_is_stale():
+    """Test models older than max_age are retrained"""
+    registry = ModelRegistry(max_age=0)
+    registry.put(('s1', 24), _entry())
+    assert not registry.is_fresh(registry.get(('s1', 24)))
+
+def test_least_recently_used_model_is_evicted():
+    """Test the cache evicts by recency once full"""
+    registry = ModelRegistry(max_models=2)
+    registry.put(('s1', 24), _entry('1'))
+    registry.put(('s2', 24), _entry('2'))
+    registry.get(('s1', 24))
+    registry.put(('s3', 24), _entry('3'))
+    assert registry.get(('s2', 24)) is None
+    assert registry.get(('s1', 24)) is not None
+    assert registry.get(('s3', 24)) is not None
@@ -0,0 +1,95 @@
+"""
+Unit tests for the notification queue
+"""
+import time
+import pytest
+from src.backend.services.notification_queue import NotificationQueue
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_pending_alerts_are_sent_as_one_digest(tmp_path):
+    """Test alerts queued for one recipient are delivered together and reported"""
+    sent, delivered = [], {}
+    queue = NotificationQueue(
+        str(tmp_path / 'queue.db'),
+        senders={'email': lambda recipient, alerts: sent.append((recipient, alerts))},
+        on_delivered=delivered.update,
+        digest_seconds=0.2
+    )
+    queue.enqueue([('email', 'ops', {'id': str(i), 'message': f'alert {i}'}) for i in range(10)])
+    assert _wait_for(lambda: len(delivered) == 10)
+    queue.stop()
+    assert len(sent) == 1
+    assert sent[0][0] == 'ops'
+    assert [a['id'] for a in sent[0][1]] == [str(i) for i in range(10)]
+    assert delivered['3'] == ['email']
+    metrics = queue.get_metrics()['email']
+    assert metrics['delivered'] == 10
+    assert metrics['digests'] == 1
+    assert metrics['latency_ms']['max'] >= 200
+
+def test_failed_sends_are_retried_then_given_up(tmp_path):
+    """Test a failing channel is retried with backoff until max_attempts"""
+    calls = []
+    def fail(recipient, alerts):
+        calls.append(time.time())
+        raise RuntimeError('provider down')
+    queue = NotificationQueue(
+        str(tmp_path / 'queue.db'),
+        senders={'sms': fail},
+        digest_seconds=0,
+        max_attempts=3,
+        backoff_seconds=0.05
+    )
+    queue.enqueue([('sms', 'ops', {'id': '1', 'message': 'alert'})])
+    assert _wait_for(lambda: queue.get_metrics()['sms']['failed'] == 1)
+    queue.stop()
+    assert len(calls) == 3
+    assert calls[2] - calls[1] >= calls[1] - calls[0]
+    assert queue.get_metrics()['sms']['queued'] == {'failed': 1}
+
+def test_queued_jobs_survive_restart(tmp_path):
+    """Test jobs left in the queue file are delivered by the next process"""
+    path = str(tmp_path / 'queue.db')
+    first = NotificationQueue(path, senders={'push': lambda recipient, alerts: None}, digest_seconds=60)
+    first.enqueue([('push', 'ops', {'id': '1', 'message': 'alert'})])
+    first.stop()
+
+    sent = []
+    second = NotificationQueue(path, senders={'push': lambda recipient, alerts: sent.extend(alerts)})
+    second._connection().execute('UPDATE jobs SET next_attempt_at = 0')
+    second.start()
+    assert _wait_for(lambda: len(sent) == 1)
+    second.stop()
+    assert sent[0]['id'] == '1'
+
+def test_prune_forgets_old_deliveries_and_failed_jobs(tmp_path):
+    """Test pruning drops old delivery records and failed jobs but keeps pending ones"""
+    queue = NotificationQueue(str(tmp_path / 'queue.db'), senders={'push': lambda recipient, alerts: None})
+    conn = queue._connection()
+    conn.execute("INSERT INTO deliveries VALUES ('old', 'push', 0), ('new', 'push', ?)", (time.time(),))
+    queue.enqueue([('push', 'ops', {'id': 'a'}), ('push', 'ops', {'id': 'b'})])
+    conn.execute("UPDATE jobs SET created_at = 0, status = 'failed' WHERE alert_id = 'a'")
+    conn.execute("UPDATE jobs SET created_at = 0 WHERE alert_id = 'b'")
+    queue.prune(older_than_seconds=3600)
+    assert [row[0] for row in conn.execute('SELECT alert_id FROM deliveries')] == ['new']
+    assert [row[0] for row in conn.execute('SELECT alert_id FROM jobs')] == ['b']
+
+def test_only_stale_claims_are_retried(tmp_path):
+    """Test a second process on the same file leaves live claims alone and retries abandoned ones"""
+    path = str(tmp_path / 'queue.db')
+    first = NotificationQueue(path, senders={'push': lambda recipient, alerts: None}, digest_seconds=60)
+    first.enqueue([('push', 'ops', {'id': '1'})])
+    first.stop()
+    first._connection().execute('UPDATE jobs SET next_attempt_at = 0')
+    assert [job['alert_id'] for job in first._claim('push')] == ['1']
+
+    sent = []
+    second = NotificationQueue(path, senders={'push': lambda recipient, alerts: sent.extend(alerts)}, claim_timeout_seconds=60)
+    assert second._claim('push') == []  # still being sent by the first worker
+    second._connection().execute('UPDATE jobs SET claimed_at = claimed_at - 120')
+    assert [job['alert_id'] for job in second._claim('push')] == ['1']
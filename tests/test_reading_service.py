@@ -36,3 +36,89 @@ def test_statistics_calculation():
     # This would require actual data
     # Use fixtures and mocks in real tests
     pass
+
+def test_batch_reading_creation():
+    """Test batch reading creation across sensors"""
+    batch = [
+        ReadingCreate(sensor_id=f"sensor-{i % 3}", ph_level=7.0, tds_level=200, turbidity=1.0)
+        for i in range(10)
+    ]
+    results = ReadingService.save_readings_batch(batch)
+    assert len(results) == 10
+    assert len({r['id'] for r in results}) == 10
+    assert all(r['quality_status'] == 'good' for r in results)
+
+def test_time_range_accepts_timezone_aware_bounds(tmp_path, monkeypatch):
+    """Test an aware start (e.g. ...Z from a query string) is read as local time"""
+    from datetime import datetime, timedelta, timezone
+    from src.backend.services import reading_service as reading_module
+    from src.backend.services.hot_tier import HotTier
+    from src.backend.services.sqlite_service import SQLiteService
+    storage = SQLiteService(str(tmp_path / 'test.db'))
+    monkeypatch.setattr(reading_module, 'storage', storage)
+    monkeypatch.setattr(reading_module, 'hot_tier', HotTier(enabled=False))
+    now = datetime.now()
+    ids = storage.save_readings([
+        {'sensor_id': 's1', 'ph_level': 7.1, 'tds_level': 200, 'turbidity': 1.0, 'created_at': (now - timedelta(minutes=m)).isoformat()}
+        for m in (1, 30)
+    ])
+    start = datetime.now(timezone.utc) - timedelta(minutes=10)
+    readings = ReadingService.get_readings_by_time_range('s1', start=start)
+    assert [r['id'] for r in readings] == ids[:1]
+
+def test_newest_page_from_hot_tier_matches_storage(tmp_path, monkeypatch):
+    """Test the first listing page is served from memory and pages on like storage, ties included"""
+    from datetime import datetime, timedelta
+    from src.backend.services import reading_service as reading_module
+    from src.backend.services.hot_tier import HotTier
+    from src.backend.services.sqlite_service import SQLiteService
+    from src.backend.utils.pagination import decode_cursor
+    storage = SQLiteService(str(tmp_path / 'test.db'))
+    tier = HotTier()
+    monkeypatch.setattr(reading_module, 'storage', storage)
+    monkeypatch.setattr(reading_module, 'hot_tier', tier)
+    start = datetime.now() - timedelta(minutes=30)
+    readings = [
+        {'sensor_id': 's1', 'ph_level': 7.1, 'tds_level': 200.0, 'turbidity': 1.0, 'temperature': None,
+         'is_anomaly': False, 'anomaly_score': 0.0, 'quality_status': 'good',
+         'created_at': (start + timedelta(minutes=i // 2)).isoformat()}  # pairs share a timestamp
+        for i in range(12)
+    ]
+    ids = storage.save_readings([dict(r) for r in readings])
+    tier.track('s1')
+    tier.append([{**r, 'id': reading_id} for r, reading_id in zip(readings, ids)])
+
+    def walk(limit):
+        pages, after = [], None
+        while True:
+            page, cursor = ReadingService.get_readings_page('s1', limit, after)
+            pages.append([r['id'] for r in page])
+            if cursor is None:
+                return pages
+            after = decode_cursor(cursor)
+
+    hits = tier.get_metrics()['hits']
+    expected = [r['id'] for r in storage.get_readings_page('s1', 12)]
+    assert sum(walk(4), []) == expected and sum(walk(5), []) == expected
+    assert tier.get_metrics()['hits'] > hits
+
+def test_batch_with_utc_timestamps_reads_back_by_range(tmp_path, monkeypatch):
+    """Test device timestamps ending in Z are stored as local time and found by range queries"""
+    from datetime import datetime, timedelta, timezone
+    from src.backend.services import reading_service as reading_module
+    from src.backend.services.hot_tier import HotTier
+    from src.backend.services.sqlite_service import SQLiteService
+    monkeypatch.setattr(reading_module, 'storage', SQLiteService(str(tmp_path / 'test.db')))
+    monkeypatch.setattr(reading_module, 'hot_tier', HotTier(enabled=False))
+    now = datetime.now(timezone.utc)
+    batch = [
+        ReadingCreate.model_validate({
+            'sensor_id': 'utc-sensor', 'ph_level': 7.0, 'tds_level': 200, 'turbidity': 1.0,
+            'timestamp': (now - timedelta(minutes=i)).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        })
+        for i in range(1, 11)
+    ]
+    saved = ReadingService.save_readings_batch(batch)
+    assert all('+' not in r['created_at'] and not r['created_at'].endswith('Z') for r in saved)
+    readings = ReadingService.get_readings_by_time_range('utc-sensor', hours=1)
+    assert sorted(r['id'] for r in readings) == sorted(r['id'] for r in saved)
@@ -0,0 +1,65 @@
+"""
+Unit tests for ETags and the response cache
+"""
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from src.backend.services import response_cache as cache_module
+from src.backend.services.response_cache import ResponseCache, cached_response
+
+def test_etag_changes_only_with_its_scopes():
+    """Test bumping a scope changes the ETags that depend on it and no others"""
+    cache = ResponseCache()
+    sensors = cache.etag('/api/sensors', ['sensors'])
+    alerts = cache.etag('/api/alerts', ['alerts'])
+    assert cache.etag('/api/sensors', ['sensors']) == sensors
+    cache.bump('sensors')
+    assert cache.etag('/api/sensors', ['sensors']) != sensors
+    assert cache.etag('/api/alerts', ['alerts']) == alerts
+
+def test_conditional_get_returns_304_and_reuses_body(monkeypatch):
+    """Test If-None-Match gives 304, repeats hit the cache and writes invalidate"""
+    cache = ResponseCache(max_entries=2)
+    monkeypatch.setattr(cache_module, 'response_cache', cache)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [{'id': 'sensor-1', 'count': len(calls)}]
+
+    app = FastAPI()
+
+    @app.get('/items')
+    async def items(request: Request):
+        return await cached_response(request, ['sensors'], compute)
+
+    client = TestClient(app)
+    first = client.get('/items')
+    etag = first.headers['etag']
+    assert first.json() == [{'id': 'sensor-1', 'count': 1}]
+    assert client.get('/items').json() == first.json()
+    assert client.get('/items', headers={'If-None-Match': etag}).status_code == 304
+    assert len(calls) == 1
+
+    cache.bump('sensors')
+    changed = client.get('/items', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['etag'] != etag
+    assert changed.json() == [{'id': 'sensor-1', 'count': 2}]
+
+    metrics = cache.get_metrics()
+    assert (metrics['misses'], metrics['hits'], metrics['not_modified']) == (2, 1, 1)
+    assert metrics['hit_ratio'] == 0.5
+
+def test_ttl_responses_are_cached_for_their_period(monkeypatch):
+    """Test a ttl ETag holds for the whole period and only rolls over with it"""
+    from types import SimpleNamespace
+    now = [1000.0]
+    monkeypatch.setattr(cache_module, 'time', SimpleNamespace(time=lambda: now[0]))
+    cache = ResponseCache()
+    stats = cache.etag('/api/readings/stats/all', ['sensors'], ttl=10)
+    cache.bump('alerts')
+    now[0] = 1009.9
+    assert cache.etag('/api/readings/stats/all', ['sensors'], ttl=10) == stats
+    now[0] = 1010.0
+    assert cache.etag('/api/readings/stats/all', ['sensors'], ttl=10) != stats
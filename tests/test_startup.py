@@ -0,0 +1,12 @@
+"""
+Startup cost tests
+"""
+import pytest
+from src.backend.utils.import_budget import LAZY_MODULES, measure_imports
+
+def test_heavy_dependencies_load_lazily(monkeypatch):
+    """Test importing the app does not load ML or Firebase libraries"""
+    monkeypatch.setenv('STORAGE_BACKEND', 'firebase')
+    loaded = {name.split('.')[0] for name, _, _ in measure_imports('main')}
+    assert 'main' in loaded
+    assert not loaded & set(LAZY_MODULES)
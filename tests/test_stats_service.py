@@ -0,0 +1,71 @@
+"""
+Unit tests for incrementally maintained statistics
+"""
+import pytest
+from datetime import datetime
+from src.backend.utils.aggregates import (
+    empty_aggregate,
+    reading_aggregate,
+    merge_aggregates,
+    bucket_key,
+    summarize
+)
+
+READINGS = [
+    {'ph_level': 7.0, 'tds_level': 200, 'turbidity': 1.0, 'is_anomaly': False},
+    {'ph_level': 8.0, 'tds_level': 300, 'turbidity': 2.0, 'is_anomaly': True},
+    {'ph_level': 6.0, 'tds_level': 100, 'turbidity': 3.0, 'is_anomaly': False},
+]
+
+def test_merged_aggregate_matches_direct_statistics():
+    """Test merging per-reading aggregates gives the same stats as a full scan"""
+    agg = empty_aggregate()
+    for reading in READINGS:
+        agg = merge_aggregates(agg, reading_aggregate(reading))
+    stats = summarize(agg)
+    assert stats['reading_count'] == 3
+    assert stats['avg_ph'] == pytest.approx(7.0)
+    assert stats['avg_tds'] == pytest.approx(200)
+    assert stats['min_turbidity'] == 1.0
+    assert stats['max_ph'] == 8.0
+    assert stats['anomaly_count'] == 1
+    assert stats['std_ph'] == pytest.approx((2 / 3) ** 0.5)
+
+def test_partial_deltas_merge():
+    """Test anomaly-only deltas merge into full aggregates"""
+    agg = merge_aggregates(reading_aggregate(READINGS[0]), {'anomaly_count': 1})
+    assert agg['count'] == 1
+    assert agg['anomaly_count'] == 1
+    assert agg['ph_level_min'] == 7.0
+
+def test_empty_statistics():
+    """Test statistics of an empty window"""
+    assert summarize(empty_aggregate())['reading_count'] == 0
+
+def test_bucket_key():
+    """Test readings map to the start of their hour"""
+    assert bucket_key('2026-02-23T10:59:59.999') == '2026-02-23T10:00:00'
+    assert bucket_key('2026-02-23T10:00:00', seconds=60) == '2026-02-23T10:00:00'
+
+def test_window_cover_uses_coarsest_buckets():
+    """Test a window is covered by day, hour and minute runs without gaps"""
+    from src.backend.services.stats_service import _cover
+    start = datetime(2026, 1, 1, 22, 58)
+    end = datetime(2026, 1, 4, 1, 3)
+    runs = _cover(start, end)
+    assert [r[0] for r in runs] == [60, 3600, 86400, 3600, 60]
+    assert runs[2][1:] == (datetime(2026, 1, 2), datetime(2026, 1, 3))
+    covered = sum(
+        ((last - first).total_seconds() + res) for res, first, last in runs
+    )
+    assert covered == (end - start).total_seconds()
+
+def test_aware_bounds_become_local_naive():
+    """Test timezone-aware window bounds compare against naive local bucket times"""
+    from datetime import timezone
+    from src.backend.utils import to_local_naive
+    moment = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+    local = to_local_naive(moment)
+    assert local.tzinfo is None
+    assert local == moment.astimezone().replace(tzinfo=None)
+    assert to_local_naive(local) is local and to_local_naive(None) is None
@@ -0,0 +1,189 @@
+"""
+Unit tests for the embedded SQLite storage engine
+"""
+import pytest
+from src.backend.services.sqlite_service import SQLiteService
+
+@pytest.fixture
+def storage(tmp_path):
+    service = SQLiteService(str(tmp_path / 'test.db'))
+    yield service
+    service.close()
+
+def test_sensor_roundtrip(storage):
+    """Test sensor create, get and update"""
+    sensor_id = storage.create_sensor({'name': 'Tank', 'location': 'Roof', 'status': 'active'})
+    storage.update_sensor(sensor_id, {'status': 'inactive'})
+    sensor = storage.get_sensor(sensor_id)
+    assert sensor['name'] == 'Tank'
+    assert sensor['status'] == 'inactive'
+    assert [s['id'] for s in storage.get_all_sensors()] == [sensor_id]
+
+def test_readings_newest_first(storage):
+    """Test readings are returned newest first and limited"""
+    ids = [
+        storage.save_reading({'sensor_id': 's1', 'ph_level': 7.0 + i, 'is_anomaly': False})
+        for i in range(5)
+    ]
+    storage.save_reading({'sensor_id': 's2', 'ph_level': 7.0})
+    readings = storage.get_readings('s1', limit=3)
+    assert [r['id'] for r in readings] == ids[::-1][:3]
+    assert readings[0]['is_anomaly'] is False
+
+def test_update_reading(storage):
+    """Test anomaly flags are written back to a reading"""
+    reading_id = storage.save_reading({'sensor_id': 's1', 'ph_level': 7.0})
+    storage.update_reading('s1', reading_id, {'is_anomaly': True, 'anomaly_score': -0.6})
+    reading = storage.get_readings('s1')[0]
+    assert reading['is_anomaly'] is True
+    assert reading['anomaly_score'] == -0.6
+
+def test_update_readings_batch(storage):
+    """Test several readings are flagged in one call"""
+    ids = [storage.save_reading({'sensor_id': 's1', 'ph_level': 7.0}) for _ in range(3)]
+    storage.update_readings('s1', {
+        ids[0]: {'is_anomaly': True, 'anomaly_score': -0.7},
+        ids[2]: {'is_anomaly': True, 'anomaly_score': -0.6},
+    })
+    flagged = {r['id']: r['is_anomaly'] for r in storage.get_readings('s1')}
+    assert flagged == {ids[0]: True, ids[1]: False, ids[2]: True}
+
+def test_alert_acknowledgement(storage):
+    """Test alerts are stored and acknowledged"""
+    alert_id = storage.save_alert({'sensor_id': 's1', 'alert_type': 'ph_high', 'notified_via': ['email']})
+    storage.acknowledge_alert(alert_id)
+    alert = storage.get_alerts(limit=10)[0]
+    assert alert['is_acknowledged'] is True
+    assert alert['acknowledged_at'] is not None
+    assert alert['notified_via'] == ['email']
+
+def test_readings_range_query(storage):
+    """Test range queries honour bounds, order and limit"""
+    from datetime import datetime, timedelta
+    base = datetime(2026, 1, 1)
+    with storage._lock, storage._conn:
+        for i in range(10):
+            storage._conn.execute(
+                'INSERT INTO readings (id, sensor_id, ph_level, created_at) VALUES (?, ?, ?, ?)',
+                (f'r{i}', 's1', 7.0, (base + timedelta(hours=i)).isoformat())
+            )
+    window = storage.get_readings_range('s1', base + timedelta(hours=2), base + timedelta(hours=6))
+    assert [r['id'] for r in window] == ['r6', 'r5', 'r4', 'r3', 'r2']
+    oldest = storage.get_readings_range('s1', base, limit=2, descending=False)
+    assert [r['id'] for r in oldest] == ['r0', 'r1']
+    newest = storage.get_readings_range('s1', base, limit=2)
+    assert [r['id'] for r in newest] == ['r9', 'r8']
+
+def test_readings_ranges_for_many_sensors(storage):
+    """Test bulk window loads group readings per sensor, newest first"""
+    from datetime import datetime
+    storage.save_readings([
+        {'sensor_id': sid, 'ph_level': 7.0, 'created_at': f'2026-01-01T0{i}:00:00'}
+        for i in range(3) for sid in ('s1', 's2')
+    ])
+    windows = storage.get_readings_ranges(['s1', 's2', 's3'], datetime(2026, 1, 1, 1))
+    assert [r['created_at'] for r in windows['s1']] == ['2026-01-01T02:00:00', '2026-01-01T01:00:00']
+    assert len(windows['s2']) == 2
+    assert windows['s3'] == []
+
+def test_batch_writes(storage):
+    """Test batched readings, sensor updates and alerts"""
+    sensor_id = storage.create_sensor({'name': 'Tank'})
+    ids = storage.save_readings([
+        {'sensor_id': sensor_id, 'ph_level': 7.0, 'created_at': '2026-01-01T00:00:00'},
+        {'sensor_id': 'other', 'ph_level': 8.0},
+    ])
+    assert len(set(ids)) == 2
+    assert storage.get_readings(sensor_id)[0]['created_at'] == '2026-01-01T00:00:00'
+    storage.update_sensors({sensor_id: {'last_reading_at': '2026-01-01T00:00:00'}})
+    assert storage.get_sensor(sensor_id)['last_reading_at'] == '2026-01-01T00:00:00'
+    storage.save_alerts([{'sensor_id': sensor_id, 'alert_type': 'ph_high'}] * 3)
+    assert len(storage.get_alerts()) == 3
+
+def test_push_ids_are_ordered():
+    """Test locally generated Firebase push keys sort chronologically"""
+    from src.backend.services.firebase_service import generate_push_id
+    keys = [generate_push_id() for _ in range(1000)]
+    assert len(set(keys)) == 1000
+    assert keys == sorted(keys)
+
+def test_stat_bucket_merge(storage):
+    """Test bucket deltas add up and combine min/max"""
+    key = ('s1', 3600, '2026-01-01T00:00:00')
+    storage.merge_stat_buckets({key: {'count': 1, 'ph_level_sum': 7.0, 'ph_level_min': 7.0, 'ph_level_max': 7.0}})
+    storage.merge_stat_buckets({key: {'count': 1, 'ph_level_sum': 9.0, 'ph_level_min': 9.0, 'ph_level_max': 9.0}})
+    storage.merge_stat_buckets({key: {'anomaly_count': 1}})
+    bucket = storage.get_stat_buckets('s1', 3600, '2026-01-01T00:00:00', '2026-01-01T23:00:00')[0]
+    assert bucket['count'] == 2
+    assert bucket['anomaly_count'] == 1
+    assert bucket['ph_level_sum'] == 16.0
+    assert (bucket['ph_level_min'], bucket['ph_level_max']) == (7.0, 9.0)
+    storage.delete_stat_buckets('s1')
+    assert storage.get_stat_buckets('s1', 3600, '2026', '2027') == []
+
+def test_counters(storage):
+    """Test counter increments, overwrites and acknowledgement state"""
+    storage.increment_counters({'global': {'readings': 5, 'anomalies': 1}})
+    storage.increment_counters({'global': {'readings': 2}, 'sensors/s1': {'readings': 2}})
+    assert storage.get_counters('global') == {'readings': 7, 'anomalies': 1}
+    storage.set_counters({'global': {'readings': 0}})
+    assert storage.get_counters('global')['readings'] == 0
+    assert storage.get_counters('sensors/s1') == {'readings': 2}
+
+    alert_id = storage.save_alert({'sensor_id': 's1', 'alert_type': 'ph_high'})
+    assert storage.acknowledge_alert(alert_id)['sensor_id'] == 's1'
+    assert storage.acknowledge_alert(alert_id) is None
+
+def test_alert_indexes(storage):
+    """Test sensor and unacknowledged alert queries are exact and use their indexes"""
+    ids = storage.save_alerts([{'sensor_id': 's1', 'alert_type': 'ph_high'}] * 5)
+    storage.save_alerts([{'sensor_id': 's2', 'alert_type': 'ph_high'}] * 50)
+    for alert_id in ids[:4]:
+        storage.acknowledge_alert(alert_id)
+    assert len(storage.get_alerts_by_sensor('s1', limit=3)) == 3
+    assert {a['sensor_id'] for a in storage.get_alerts_by_sensor('s1', limit=100)} == {'s1'}
+    unacknowledged = storage.get_unacknowledged_alerts(limit=100)
+    assert len(unacknowledged) == 51
+    assert ids[4] in {a['id'] for a in unacknowledged}
+
+    plans = [
+        ' '.join(row[-1] for row in storage._conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+        for sql, params in (
+            ('SELECT * FROM alerts WHERE sensor_id = ? ORDER BY created_at DESC LIMIT 5', ('s1',)),
+            ('SELECT * FROM alerts WHERE is_acknowledged = 0 ORDER BY created_at DESC LIMIT 5', ()),
+        )
+    ]
+    assert 'idx_alerts_sensor_created' in plans[0]
+    assert 'idx_alerts_unacknowledged' in plans[1]
+
+def test_readings_pages_walk_full_history(storage):
+    """Test keyset pages cover every reading once, even when a batch shares one created_at"""
+    from datetime import datetime
+    from src.backend.utils.pagination import paginate
+    storage.save_readings([{'sensor_id': 's1', 'ph_level': i, 'created_at': '2026-01-01T00:00:00'} for i in range(25)])
+    storage.save_readings([{'sensor_id': 's1', 'ph_level': i, 'created_at': f'2026-01-02T00:00:{i:02d}'} for i in range(10)])
+    for descending in (True, False):
+        seen, after = [], None
+        while True:
+            page, cursor = paginate(
+                lambda n, c: storage.get_readings_page('s1', n, c, descending=descending), 7, after
+            )
+            seen.extend(page)
+            if cursor is None:
+                break
+            after = (page[-1]['created_at'], page[-1]['id'])
+        assert len({r['id'] for r in seen}) == 35
+        keys = [(r['created_at'], r['id']) for r in seen]
+        assert keys == sorted(keys, reverse=descending)
+
+    window = storage.get_readings_page('s1', 100, start=datetime(2026, 1, 2))
+    assert len(window) == 10
+
+def test_cursor_roundtrip():
+    """Test cursors are opaque, round-trip and reject tampering"""
+    from src.backend.utils.pagination import decode_cursor, encode_cursor
+    cursor = encode_cursor({'id': 'abc', 'created_at': '2026-01-01T00:00:00'})
+    assert decode_cursor(cursor) == ('2026-01-01T00:00:00', 'abc')
+    assert decode_cursor(None) is None
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor')
@@ -0,0 +1,55 @@
+"""
+Unit tests for write-behind buffers
+"""
+import pytest
+from src.backend.services.write_behind import WriteBehindBuffer
+
+def test_updates_are_coalesced():
+    """Test repeated updates per key flush as one grouped write"""
+    flushed = []
+    buffer = WriteBehindBuffer(flushed.append, interval_ms=60000)
+    for i in range(100):
+        buffer.put('s1', {'last_reading_at': f't{i}'})
+    buffer.put('s2', {'last_reading_at': 't0'})
+    assert buffer.get('s1') == {'last_reading_at': 't99'}
+    buffer.stop()
+    assert flushed == [{'s1': {'last_reading_at': 't99'}, 's2': {'last_reading_at': 't0'}}]
+    assert buffer.get('s1') is None
+
+def test_overlay_reads_own_writes():
+    """Test pending fields are applied on top of stored records"""
+    buffer = WriteBehindBuffer(lambda batch: None, interval_ms=60000)
+    buffer.put('s1', {'last_reading_at': 'new'})
+    record = buffer.overlay('s1', {'id': 's1', 'last_reading_at': 'old'})
+    assert record['last_reading_at'] == 'new'
+    assert buffer.overlay('s2', None) is None
+    buffer.stop()
+
+def test_failed_flush_is_requeued():
+    """Test pending updates survive a failed flush"""
+    def fail(batch):
+        raise RuntimeError('storage down')
+    buffer = WriteBehindBuffer(fail, interval_ms=60000)
+    buffer.put('s1', {'last_reading_at': 't1'})
+    buffer.flush()
+    assert buffer.get('s1') == {'last_reading_at': 't1'}
+
+def test_failing_firebase_write_stays_queued():
+    """Test a Firebase write error reaches the buffer, so stamps and deltas are kept"""
+    from src.backend.services.firebase_service import FirebaseService
+
+    class Down:
+        def reference(self, path=None):
+            raise ConnectionError('firebase unreachable')
+
+    backend = FirebaseService()
+    backend._db = Down()
+    stamps = WriteBehindBuffer(backend.update_sensors, interval_ms=60000)
+    counters = WriteBehindBuffer(backend.increment_counters, interval_ms=60000, merge_fn=lambda a, b: {k: a.get(k, 0) + b.get(k, 0) for k in {**a, **b}})
+    stamps.put('s1', {'last_reading_at': 't1'})
+    counters.put('system', {'readings': 2})
+    stamps.flush()
+    counters.flush()
+    counters.put('system', {'readings': 1})
+    assert stamps.get('s1') == {'last_reading_at': 't1'}
+    assert counters.get('system') == {'readings': 3}